@@ -0,0 +1,72 @@
+"""
+Measures how the cost of collision queries scales with the number of entities.
+Run from the repository root: python -m benchmarks.collision_queries
+"""
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+pygame.init()
+pygame.display.set_mode((1, 1))
+
+from entities.blocks import WallSegment
+from entities.laser import Zombie
+from entities.types import TickData
+from grid.grid import Grid
+from grid.position import Position
+
+grid = Grid()
+
+WORLD_WIDTH = 1200
+WORLD_HEIGHT = 720
+TICKS = 60
+
+
+def populate(zombie_count: int):
+    grid.clear()
+    rng = random.Random(zombie_count)
+    center = Position(WORLD_WIDTH // 2, WORLD_HEIGHT // 2)
+    target = WallSegment(center, center + Position(0, 50))
+    for x in range(0, WORLD_WIDTH, 100):
+        WallSegment(Position(x, 0), Position(x, 40))
+    for _ in range(zombie_count):
+        z = Zombie(Position(rng.randrange(WORLD_WIDTH), rng.randrange(WORLD_HEIGHT)))
+        z.set_target(target)
+
+
+def run(zombie_count: int):
+    populate(zombie_count)
+    hitbox_count = sum(len(e.get_hitboxes()) for e in grid.entities)
+    indexes = (grid.static_index, grid.dynamic_index)
+    for index in indexes:
+        index.queries = index.candidates_tested = 0
+
+    tick_data = TickData()
+    start = time.perf_counter()
+    for tick in range(TICKS):
+        tick_data.tick = tick
+        grid.process_dynamic_entities(tick_data)
+    elapsed = time.perf_counter() - start
+
+    queries = grid.dynamic_index.queries
+    tested = sum(index.candidates_tested for index in indexes)
+    print(f"{zombie_count:>6} {hitbox_count:>9} {queries / TICKS:>12.1f} {tested / max(queries, 1):>15.2f}"
+          f" {1e6 * elapsed / max(queries, 1):>12.2f} {1e3 * elapsed / TICKS:>10.2f}")
+
+
+def main():
+    for batch_movement in (False, True):
+        grid.batch_movement = batch_movement
+        print(f"batch_movement={batch_movement}")
+        print(f"{'movers':>6} {'hitboxes':>9} {'queries/tick':>12} {'tested/query':>15} {'us/query':>12}"
+              f" {'ms/tick':>10}")
+        for zombie_count in (25, 50, 100, 200, 400, 800):
+            run(zombie_count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compares Grid.raycast and Grid.nearest against linear scans over all entities as the world fills up.
+Run from the repository root: python -m benchmarks.spatial_queries
+"""
+import math
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+pygame.init()
+pygame.display.set_mode((1, 1))
+
+from entities.blocks import WallSegment
+from entities.laser import Zombie
+from entities.types import EntityType
+from grid import queries
+from grid.grid import Grid
+from grid.position import Position, Vector
+
+grid = Grid()
+
+WORLD_WIDTH = 1200
+WORLD_HEIGHT = 720
+# Rays cast per measurement, e.g. one hitscan laser per emitter
+RAYS = 50
+RAY_LENGTH = 800
+REPEATS = 20
+
+
+def populate(zombie_count: int, rng: random.Random):
+    grid.clear()
+    for x in range(100, WORLD_WIDTH, 200):
+        WallSegment(Position(x, 100), Position(x, WORLD_HEIGHT - 100))
+    for _ in range(zombie_count):
+        Zombie(Position(rng.randrange(WORLD_WIDTH), rng.randrange(WORLD_HEIGHT)))
+
+
+def raycast_linear(origin: Position, direction: Vector, max_distance: float):
+    length = math.hypot(direction.x, direction.y)
+    dx, dy = direction.x / length, direction.y / length
+    best = None
+    for entity in grid.entities:
+        distance = queries._ray_enters_rect(origin.x, origin.y, dx, dy, entity.main_hitbox)
+        if distance is not None and distance <= max_distance and (best is None or distance < best[0]):
+            best = (distance, entity)
+    return best
+
+
+def nearest_linear(position: Position, type_filter: EntityType):
+    return min((entity for entity in grid.entities if queries.matches(entity, type_filter)),
+               key=lambda entity: queries._distance_to_rect(position.x, position.y, entity.main_hitbox))
+
+
+def measure(function, arguments) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for args in arguments:
+            function(*args)
+    return 1e3 * (time.perf_counter() - start) / REPEATS
+
+
+def run(zombie_count: int):
+    rng = random.Random(zombie_count)
+    populate(zombie_count, rng)
+    rays = []
+    for _ in range(RAYS):
+        angle = rng.uniform(0, 2 * math.pi)
+        rays.append((Position(rng.uniform(0, WORLD_WIDTH), rng.uniform(0, WORLD_HEIGHT)),
+                     Vector(math.cos(angle), math.sin(angle)), RAY_LENGTH))
+    points = [(origin, EntityType.KILLABLE) for origin, _, _ in rays]
+
+    def nearest(position: Position, type_filter: EntityType):
+        return grid.nearest(position, type_filter=type_filter)
+
+    print(f"{zombie_count:>8} {measure(raycast_linear, rays):>14.2f} {measure(grid.raycast, rays):>14.2f}"
+          f" {measure(nearest_linear, points):>14.2f} {measure(nearest, points):>14.2f}")
+
+
+def main():
+    print(f"milliseconds for {RAYS} queries")
+    print(f"{'entities':>8} {'raycast scan':>14} {'raycast':>14} {'nearest scan':>14} {'nearest':>14}")
+    for zombie_count in (25, 100, 400, 1600):
+        run(zombie_count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares utils.tint_image against the original per-pixel implementation on every image in resources/.
+Run from the repository root: python -m benchmarks.tint_image
+"""
+import os
+import pathlib
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+pygame.init()
+pygame.display.set_mode((1, 1))
+
+from utils import tint_image
+
+TINT = "orange"
+TILE_SIZE = 70
+REPEATS = 3
+
+
+def tint_image_per_pixel(image: pygame.Surface, tint_color: str | tuple[int, int, int]) -> pygame.Surface:
+    if isinstance(tint_color, str):
+        rgb_color = pygame.Color(tint_color)
+    else:
+        rgb_color = pygame.Color(*tint_color)
+
+    tinted = pygame.Surface(image.get_size(), pygame.SRCALPHA)
+    for x in range(image.get_width()):
+        for y in range(image.get_height()):
+            color = image.get_at((x, y))
+            if color.a > 0:
+                tinted.set_at((x, y), pygame.Color(rgb_color.r, rgb_color.g, rgb_color.b, color.a))
+
+    return tinted
+
+
+def best_time(function, image) -> tuple[float, pygame.Surface]:
+    best = float("inf")
+    result = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = function(image, TINT)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    print(f"{'image':<28} {'size':>11} {'per-pixel ms':>13} {'vectorized ms':>14} {'speedup':>8} {'identical':>9}")
+    total_old = total_new = 0
+    for path in sorted(pathlib.Path("resources").glob("*.png")):
+        loaded = pygame.image.load(path).convert_alpha()
+        for image in (loaded, pygame.transform.scale(loaded, (TILE_SIZE, TILE_SIZE))):
+            old_time, old = best_time(tint_image_per_pixel, image)
+            new_time, new = best_time(tint_image, image)
+            identical = pygame.image.tobytes(old, "RGBA") == pygame.image.tobytes(new, "RGBA")
+            total_old += old_time
+            total_new += new_time
+            size = "{}x{}".format(*image.get_size())
+            print(f"{path.name:<28} {size:>11} {1e3 * old_time:>13.2f} {1e3 * new_time:>14.3f}"
+                  f" {old_time / new_time:>7.0f}x {str(identical):>9}")
+    print(f"{'total':<40} {1e3 * total_old:>13.2f} {1e3 * total_new:>14.3f} {total_old / total_new:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
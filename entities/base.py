@@ -1,4 +1,5 @@
 import inspect
+from bisect import insort
 from abc import ABC, abstractmethod
 from collections.abc import Callable
 
@@ -7,7 +8,8 @@ import pygame
 from entities.entity_library import EntityLibrary
 from grid.position import *
 from grid.grid import Grid
-from entities.types import EntityType, TickData, HitboxType, FRect
+from grid.timers import Timer
+from entities.types import EntityType, TickData, HitboxType, FRect, CollisionLayer, TickPhase, TypeMask
 from ui.hint_renderer import hint_renderer
 from hacking.hackable_method import HackableMethod, CallableMethod, ReadOnlyMethod
 from terminal.terminal import Terminal
@@ -34,6 +36,9 @@ class Hitbox(FRect, ABC):
     def __init__(self, *, owner: "Entity", x, y, width, height):
         super().__init__(x, y, width, height)
         self.owner = owner
+        # Plain ints, compared for every pair of overlapping hitboxes
+        self.collision_layer = int(owner.COLLISION_LAYER)
+        self.collision_mask = int(owner.COLLISION_MASK)
 
     def move(self, x, y) -> 'Hitbox':
         new_hitbox = type(self)(
@@ -45,10 +50,32 @@ class Hitbox(FRect, ABC):
         )
         return new_hitbox
 
+    def move_ip(self, x, y, /):
+        super().move_ip(x, y)
+        grid.on_hitbox_moved(self)
+
     @abstractmethod
     def on_collision_with(self, e: "Entity") -> None:
         pass
 
+    def on_collision_enter(self, e: "Entity") -> None:
+        """
+        Called once after the tick in which the entity has started touching this hitbox
+        """
+        pass
+
+    def on_collision_stay(self, e: "Entity") -> None:
+        """
+        Called after every further tick in which the entity has moved and still touches this hitbox
+        """
+        pass
+
+    def on_collision_exit(self, e: "Entity") -> None:
+        """
+        Called once after the tick in which the entity has moved away from this hitbox
+        """
+        pass
+
     @abstractmethod
     def is_passable_for(self, e: "Entity") -> bool:
         pass
@@ -62,6 +89,15 @@ class MainHitbox(Hitbox, ABC):
     def on_collision_with(self, e: "Entity") -> None:
         self.owner.on_collision_with(e)
 
+    def on_collision_enter(self, e: "Entity") -> None:
+        self.owner.on_collision_enter(e)
+
+    def on_collision_stay(self, e: "Entity") -> None:
+        self.owner.on_collision_stay(e)
+
+    def on_collision_exit(self, e: "Entity") -> None:
+        self.owner.on_collision_exit(e)
+
     def is_passable_for(self, e: "Entity") -> bool:
         return False
 
@@ -71,26 +107,56 @@ class PlayerInteractHitbox(Hitbox, ABC):
         super().__init__(**kwargs)
         assert isinstance(self.owner, InteractableEntity) or isinstance(self.owner, HackableEntity)
         self.type = HitboxType.OTHER
+        self.collision_layer = int(CollisionLayer.INTERACTION)
+        self.collision_mask = int(CollisionLayer.PLAYER)
 
     def on_collision_with(self, e: "Entity") -> None:
-        if EntityType.PLAYER in e.type:
+        pass
+
+    def on_collision_enter(self, e: "Entity") -> None:
+        if e.type_mask & TypeMask.PLAYER:
+            hint_renderer.clear_hint()
             hint_renderer.show_hint(self.owner.type)
             grid.current_interactable_entity = self.owner
 
+    def on_collision_stay(self, e: "Entity") -> None:
+        # Takes over once the player leaves the range of another interactable overlapping this one
+        if e.type_mask & TypeMask.PLAYER and grid.current_interactable_entity is None:
+            self.on_collision_enter(e)
+
+    def on_collision_exit(self, e: "Entity") -> None:
+        if e.type_mask & TypeMask.PLAYER and grid.current_interactable_entity is self.owner:
+            hint_renderer.clear_hint()
+
     def is_passable_for(self, e: "Entity") -> bool:
         return True
 
 
-@dataclass
 class Entity(ABC):
     """
-    A base class for all entities
+    A base class for all entities. Entities compare and hash by identity.
     """
-    type: EntityType = EntityType.DEFAULT
+    # Type of new instances, subclasses add their own flags in __init__
+    TYPE = EntityType.DEFAULT
+    # Layers the entity is on and layers it collides with, see CollisionLayer
+    COLLISION_LAYER = CollisionLayer.WORLD
+    COLLISION_MASK = CollisionLayer.ALL
+    # Whether chasers path around a dynamic entity, as they do around static ones, see Navigation.
+    # Meant for entities which stand still between changes, such as doors.
+    NAVIGATION_OBSTACLE = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        EntityLibrary.register_entity(cls.__name__, cls)
 
     def __init__(self, *, position=None, width=50, height=50, color="white", custom_image=None, **kwargs):
-        self.sprite: BaseSprite = None
-        self.main_hitbox = None
+        # Counts the reuses of a pooled entity, so EntityRefs taken before it was destroyed stop resolving
+        self.incarnation: int = self.__dict__.get("incarnation", 0)
+        # The type as a plain int, see TypeMask. Changed through the type property, which keeps the grid in sync.
+        self.type_mask: int = self.TYPE.value
+        # A pooled entity keeps its sprite and main hitbox objects, see reset()
+        self.sprite: BaseSprite = self.__dict__.get("sprite")
+        self.main_hitbox: MainHitbox = self.__dict__.get("main_hitbox")
         self.height = None
         self.width = None
         self.color = color
@@ -100,16 +166,29 @@ class Entity(ABC):
         self.hitboxes = []
         self.properties = {}
 
-        EntityLibrary.register_entity(self.__class__.__name__, self.__class__)
         self.set_sprite(color, custom_image)
         grid.register_entity(self)
 
 
+    @property
+    def type(self) -> EntityType:
+        return EntityType(self.type_mask)
+
+    @type.setter
+    def type(self, value: EntityType):
+        previous, self.type_mask = self.type_mask, value.value
+        grid.on_entity_type_changed(self, previous)
+
     def set_size(self, width, height, new_image=None):
         self.width = width
         self.height = height
-        self.main_hitbox = MainHitbox(owner=self, x=self.position.x, y=self.position.y, width=self.width,
-                                      height=self.height)
+        if self.main_hitbox is None:
+            self.main_hitbox = MainHitbox(owner=self, x=self.position.x, y=self.position.y, width=self.width,
+                                          height=self.height)
+        else:
+            grid.unregister_hitbox(self.main_hitbox)
+            self.main_hitbox.reposition(self.position.x, self.position.y, self.width, self.height)
+        grid.register_hitbox(self.main_hitbox)
 
         if new_image:
             self.custom_image = new_image
@@ -126,11 +205,17 @@ class Entity(ABC):
         else:
             image = pygame.Surface((self.width, self.height))
             image.fill(pygame.color.Color(color))
-        self.sprite = BaseSprite(
-            image=image,
-            rect=pygame.Rect(self.position.x, self.position.y, self.width, self.height)
-        )
+        if self.sprite is None:
+            self.sprite = BaseSprite(
+                image=image,
+                rect=pygame.Rect(self.position.x, self.position.y, self.width, self.height)
+            )
+        else:
+            self.sprite.image = image
+            self.sprite.rect.update(self.position.x, self.position.y, self.width, self.height)
         self.sprite.add(grid.sprites)
+        if not self.type_mask & TypeMask.DYNAMIC:
+            grid.static_version += 1
 
     def get_hitbox(self, hitbox_type: type):
         for hitbox in self.hitboxes:
@@ -140,10 +225,29 @@ class Entity(ABC):
     def get_hitboxes(self):
         return self.main_hitbox, *self.hitboxes
 
+    def add_hitbox(self, hitbox: Hitbox):
+        self.hitboxes.append(hitbox)
+        grid.register_hitbox(hitbox)
+
     def is_passable_for(self, entity: "Entity"):
         return False
 
     def on_collision_with(self, entity: "Entity"):
+        """
+        Called on every move of either entity onto the other, see on_collision_enter for reactions to run once
+        """
+        pass
+
+    def on_collision_enter(self, entity: "Entity"):
+        """
+        Called once the movement phase of the tick in which the entities have started touching is over
+        """
+        pass
+
+    def on_collision_stay(self, entity: "Entity"):
+        pass
+
+    def on_collision_exit(self, entity: "Entity"):
         pass
 
     def killed_by(self, killer: str):
@@ -155,9 +259,67 @@ class Entity(ABC):
     def set_property(self, prop: str, value):
         self.properties[prop] = value
 
+    def save_attributes(self) -> dict:
+        """
+        The state a save file keeps besides the position, size, image and properties, see savegame.
+        Subclasses extend it with their own scalar values. Timers and references to other entities are not saved.
+        """
+        return {}
+
+    def restore_attributes(self, attributes: dict):
+        """
+        Brings the entity to the state returned by save_attributes, going through the methods which keep
+        the grid in sync. Unknown names are ignored.
+        """
+        pass
+
     def destroy(self):
         grid.remove_entity(self)
 
+    def reset(self):
+        """
+        Called when the entity is returned to its pool. Drops all state except the sprite and the main hitbox,
+        which are recycled by the next __init__ on reuse, and invalidates all references to the entity.
+        """
+        sprite = self.sprite
+        main_hitbox = self.main_hitbox
+        incarnation = self.incarnation
+        if sprite is not None:
+            sprite.kill()
+        self.__dict__.clear()
+        self.sprite = sprite
+        self.main_hitbox = main_hitbox
+        self.incarnation = incarnation + 1
+
+
+class EntityRef:
+    """
+    A reference to an entity for other entities to keep. It stops resolving once the entity is destroyed
+    and never resolves to a different entity the pooled object has been reused for.
+    """
+    __slots__ = ("entity", "incarnation")
+
+    def __init__(self, entity: Entity):
+        self.entity = entity
+        self.incarnation = entity.incarnation
+
+    def get(self) -> Entity | None:
+        """
+        :return: The entity, or None if it has been destroyed
+        """
+        entity = self.entity
+        if entity.incarnation != self.incarnation or not grid.is_registered(entity):
+            return None
+        return entity
+
+    @staticmethod
+    def of(entity: Entity | None) -> "EntityRef | None":
+        return None if entity is None else EntityRef(entity)
+
+    @staticmethod
+    def resolve(ref: "EntityRef | None") -> Entity | None:
+        return None if ref is None else ref.get()
+
 
 @dataclass
 class GameTickAction:
@@ -169,60 +331,143 @@ class DynamicEntity(Entity, ABC):
     """
     An entity, which has a behavior which is performed every tick.
     """
-    type = EntityType.DYNAMIC
+    TYPE = EntityType.DYNAMIC
+    # (max distance from the player, interval) pairs in order of distance. Beyond each distance the entity
+    # only runs every interval ticks, see TickScheduler. Empty to run every tick.
+    UPDATE_INTERVALS: tuple[tuple[float, int], ...] = ()
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.game_tick_events: list[GameTickAction] = []
-
-    def on_game_tick(self, tick_data: TickData):
-        """
-        Runs all actions assigned to this entity in order of their priority
-        :param tick_data: Information about the current tick
-        """
-        for gta in self.game_tick_events:
-            gta.action(tick_data=tick_data)
+        self.sleeping = False
+        # Pending timers, rescheduled whenever the entity is registered again, e.g. from a snapshot
+        self.timers: list[Timer] = []
 
     def add_on_game_tick(self, action: Callable, priority: int) -> None:
         """
         Adds a behavior action to this entity's on-tick queue.
         :param action: The action
-        :param priority: How early should the action be executed (0 = earliest)
+        :param priority: How early should the action be executed (0 = earliest), usually a TickPhase
         :return: None
         """
-        index = 0
-        while index < len(self.game_tick_events) and self.game_tick_events[index].priority < priority:
-            index += 1
-        self.game_tick_events.insert(index, GameTickAction(priority, action))
+        insort(self.game_tick_events, GameTickAction(priority, action), key=lambda gta: gta.priority)
+        if grid.is_registered(self):
+            grid.scheduler.add_action(self, action, priority)
+
+    def sleep(self):
+        """
+        Stops running the tick actions of this entity until it is woken
+        """
+        self.sleeping = True
+        if grid.is_registered(self):
+            grid.scheduler.sleep(self)
+
+    def wake(self):
+        self.sleeping = False
+        grid.scheduler.wake(self)
+
+    def save_attributes(self) -> dict:
+        return super().save_attributes() | {"sleeping": self.sleeping}
+
+    def restore_attributes(self, attributes: dict):
+        super().restore_attributes(attributes)
+        if "sleeping" in attributes:
+            if attributes["sleeping"]:
+                self.sleep()
+            else:
+                self.wake()
+
+    def schedule_at(self, tick: int, callback: Callable[[], None]) -> Timer:
+        """
+        Calls back once the world clock reaches the given tick, see Grid.timers
+        :return: A timer which can be passed to cancel_timer
+        """
+        return self._add_timer(Timer(callback, tick, owner=EntityRef(self)))
+
+    def schedule_after(self, delay: int, callback: Callable[[], None]) -> Timer:
+        """
+        Calls back once the given number of ticks has passed
+        """
+        return self.schedule_at(grid.timers.now + delay, callback)
+
+    def schedule_every(self, period: int, callback: Callable[[], None], first: int = None) -> Timer:
+        """
+        Calls back every period ticks until cancelled
+        :param first: Tick of the first call, one period from now by default
+        """
+        first = grid.timers.now + period if first is None else first
+        return self._add_timer(Timer(callback, first, period, owner=EntityRef(self)))
+
+    def cancel_timer(self, timer: Timer):
+        if timer in self.timers:
+            self.timers.remove(timer)
+        grid.timers.cancel(timer)
+
+    def _add_timer(self, timer: Timer) -> Timer:
+        self.timers.append(timer)
+        if grid.is_registered(self):
+            grid.timers.add(timer)
+        return timer
 
 
 class MovableEntity(DynamicEntity, ABC):
+    # Whether moves requested during a tick may be deferred to the grid's batched movement phase
+    BATCHED_MOVEMENT = False
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.type = super().type | EntityType.MOVABLE
-        self.add_on_game_tick(self.__update_sprite_position, 1000)
+        # The position is updated in place, so it must not be shared with whoever passed it in
+        self.position = Position(self.position.x, self.position.y)
+        self.type |= EntityType.MOVABLE
+        self.add_on_game_tick(self.__update_sprite_position, TickPhase.SPRITE_SYNC)
 
     def move_to(self, position: Position):
         self.move(self.position.rel_vector(position))
 
     def move(self, vector: Vector):
-        new_main_hitbox = self.main_hitbox.move(vector.x, vector.y)
+        self.move_by(vector.x, vector.y)
+
+    def move_by(self, x: float, y: float):
+        if self.BATCHED_MOVEMENT and grid.queue_move(self, x, y):
+            return
 
-        for target_hb in grid.get_all_colliding_hitboxes(new_main_hitbox):
+        if self.resolve_collisions(grid.probe(self, x, y)):
+            self.apply_move(x, y)
+
+    def resolve_collisions(self, hitboxes) -> bool:
+        """
+        Runs collision callbacks against the hitboxes overlapping the destination of a move and reports the ones
+        it has run them for to the contact tracker. Hitboxes after an impassable one are not touched.
+        :param hitboxes: Colliding hitboxes in registration order
+        :return: Whether the move may proceed. Never when a callback has reset the world, e.g. restarted the level.
+        """
+        generation = grid.generation
+        for i, target_hb in enumerate(hitboxes):
             if target_hb.owner is self:
                 continue
 
             target_hb.on_collision_with(self)
+            if grid.generation != generation:
+                return False
             if target_hb.type == HitboxType.MAIN:
                 self.on_collision_with(target_hb.owner)
+                if grid.generation != generation:
+                    return False
                 if not target_hb.owner.is_passable_for(self):
-                    return
-
-        self.position = self.position + vector
-        self.main_hitbox.move_ip(vector.x, vector.y)
-        for i in range(len(self.hitboxes)):
-            self.hitboxes[i].move_ip(vector.x, vector.y)
+                    grid.contacts.report(self, hitboxes[:i + 1])
+                    return False
+        grid.contacts.report(self, hitboxes)
+        return True
 
+    def apply_move(self, x: float, y: float):
+        """
+        Shifts the entity and all its hitboxes without any collision checks
+        """
+        self.position.x += x
+        self.position.y += y
+        self.main_hitbox.move_ip(x, y)
+        for hitbox in self.hitboxes:
+            hitbox.move_ip(x, y)
 
     def __update_sprite_position(self, **kwargs):
         self.sprite.update_position(self.position)
@@ -240,7 +485,7 @@ class PlayerInteractionHitboxEntity(Entity, ABC):
         """
         Sets the range of the player interaction hitbox
         """
-        self.hitboxes.append(
+        self.add_hitbox(
             PlayerInteractHitbox(owner=self, x=self.position.x - range_offset, y=self.position.y - range_offset,
                                  width=self.width + 2 * range_offset, height=self.height + 2 * range_offset))
 
@@ -258,6 +503,13 @@ class InteractableEntity(PlayerInteractionHitboxEntity, ABC):
         """
         pass
 
+    def interact(self, tick_data: TickData):
+        """
+        Called by the grid when the player presses E while near this entity. Runs on_player_interaction,
+        subclasses add what has to follow it whatever its, possibly hacked, code has done.
+        """
+        self.on_player_interaction(tick_data)
+
 
 class HackableEntity(DynamicEntity, PlayerInteractionHitboxEntity, ABC):
     """
@@ -267,7 +519,6 @@ class HackableEntity(DynamicEntity, PlayerInteractionHitboxEntity, ABC):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.type |= EntityType.HACKABLE
-        self._terminal = Terminal()
         self._hackable_method_names = None
 
     def __getattribute__(self, name):
@@ -276,6 +527,10 @@ class HackableEntity(DynamicEntity, PlayerInteractionHitboxEntity, ABC):
         return object.__getattribute__(self, name)
 
 
+    @property
+    def _terminal(self) -> Terminal:
+        return Terminal()
+
     def get_hackable_method_names(self):
         if self._hackable_method_names is not None:
             return self._hackable_method_names
@@ -286,8 +541,10 @@ class HackableEntity(DynamicEntity, PlayerInteractionHitboxEntity, ABC):
     def display_special_methods(self):
         """
         Writes the current bodies of all decorated methods (Hackable, Callable, ReadOnly) of the inheriting class
-        onto the terminal
+        onto the terminal. Does nothing when running without a terminal, e.g. headless.
         """
+        if not Terminal.initialized:
+            return
         self._terminal.clear()
 
         code = ""
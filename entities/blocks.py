@@ -1,5 +1,4 @@
 import itertools
-from random import random, randint
 
 from entities.base import *
 from grid.position import Position
@@ -34,18 +33,19 @@ class WallSegment(Entity, ABC):
 class Button(InteractableEntity, ABC):
     def __init__(self, position: Position, **kwargs):
         super().__init__(position=position, width=30, height=30, color="orange", **kwargs)
-        self.target = None
+        self.target: EntityRef = None
         self.release_tick = -1
 
     def set_target(self, entity: Entity):
-        self.target = entity
+        self.target = EntityRef.of(entity)
 
     def click(self):
-        if self.target is not None:
+        target = EntityRef.resolve(self.target)
+        if target is not None:
             try:
-                self.target.trigger()
+                target.trigger()
             except AttributeError:
-                print(f"Can't trigger target: {self.target}")
+                print(f"Can't trigger target: {target}")
 
     def on_player_interaction(self, tick_data):
         self.click()
@@ -15,5 +15,5 @@ class Exit(Entity):
         super().__init__(position=position, width=width, height=height, color="cyan", custom_image=image)
         self.on_exit = on_exit
 
-    def on_collision_with(self, entity: "Entity"):
+    def on_collision_enter(self, entity: "Entity"):
         self.on_exit()
@@ -1,12 +1,14 @@
-from entities.base import DynamicEntity, InteractableEntity, HackableEntity, Entity
+from entities.base import DynamicEntity, InteractableEntity, HackableEntity, Entity, EntityRef
 from entities.types import TickData
 from grid.position import Position
+from grid.timers import Timer
 from hacking.hackable_method import HackableMethod
 from utils import load_icon, create_surface
 
 
 class BasicDoor(DynamicEntity):
     THICKNESS = 10
+    NAVIGATION_OBSTACLE = True
     ICON_PATH = "resources/wood.png"
 
     def __init__(self, position: Position, **kwargs):
@@ -30,6 +32,17 @@ class BasicDoor(DynamicEntity):
         self.set_size(self.height, self.width, door)
         self.is_open = False
 
+    def save_attributes(self) -> dict:
+        return super().save_attributes() | {"is_open": self.is_open}
+
+    def restore_attributes(self, attributes: dict):
+        super().restore_attributes(attributes)
+        if "is_open" in attributes:
+            if attributes["is_open"]:
+                self.open()
+            else:
+                self.close()
+
 
 class OpenableDoor(BasicDoor, InteractableEntity):
     def on_player_interaction(self, tick_data: TickData):
@@ -45,15 +58,18 @@ class DestroyButton(InteractableEntity):
         image = load_icon(width, height, "resources/lever.png", "orange")
 
         super().__init__(position=position, width=30, height=30, color="orange", custom_image=image, **kwargs)
-        self.target: Entity = None
+        self.target: EntityRef = None
 
     def set_target(self, entity: Entity):
-        self.target = entity
+        self.target = EntityRef.of(entity)
 
     def on_player_interaction(self, tick_data):
         image = load_icon(self.width, self.height, "resources/lever-mirror.png", "orange")
         self.set_sprite("orange", image)
-        self.target.destroy()
+        target = EntityRef.resolve(self.target)
+        if target is not None:
+            target.destroy()
+        self.target = None
 
 
 
@@ -62,32 +78,46 @@ class HackableDoorButton(InteractableEntity, HackableEntity):
         width=height=30
         image = load_icon(width, height, "resources/lever.png", "orange")
         super().__init__(position=position, width=width, height=height, color="orange", custom_image=image, **kwargs)
-        self.door: BasicDoor = None
+        self.door: EntityRef = None
         self.release_tick = -1
-        self.add_on_game_tick(self.on_tick, 600)
+        self.release_timer: Timer = None
 
     def set_target_door(self, door: BasicDoor):
-        self.door = door
+        self.door = EntityRef.of(door)
 
     def unclick(self):
         image = load_icon(self.width, self.height, "resources/lever.png", "orange")
         self.set_sprite("orange", image)
-        if self.door is not None:
-            self.door.close()
+        door = EntityRef.resolve(self.door)
+        if door is not None:
+            door.close()
 
     def click(self):
         image = load_icon(self.width, self.height, "resources/lever-mirror.png", "orange")
         self.set_sprite("orange", image)
-        if self.door is not None:
-            self.door.open()
+        door = EntityRef.resolve(self.door)
+        if door is not None:
+            door.open()
+
+    def interact(self, tick_data: TickData):
+        super().interact(tick_data)
+        self._schedule_release(tick_data.tick)
+
+    def _schedule_release(self, tick: int):
+        """
+        Unclicks the button at release_tick, as set by on_player_interaction, replacing any earlier release
+        :param tick: The current tick
+        """
+        if self.release_timer is not None:
+            self.cancel_timer(self.release_timer)
+            self.release_timer = None
+        if self.release_tick > tick:
+            # The player's input comes before the timers of the tick advance the clock, hence one more tick
+            self.release_timer = self.schedule_after(self.release_tick - tick + 1, self.unclick)
 
     @HackableMethod
     def on_player_interaction(self, tick_data):
         self.release_tick = tick_data.tick + 50
         self.click()
 
-    def on_tick(self, tick_data: TickData):
-        if tick_data.tick == self.release_tick:
-            self.unclick()
-
 
@@ -1,12 +1,64 @@
 
+
 class EntityLibrary:
     _entity_dict = {}
+    # Class name -> entities which have been destroyed and are waiting to be reused
+    _free_lists: dict[str, list] = {}
+    reused = 0
 
     @staticmethod
     def register_entity(name: str, cls: type):
         if EntityLibrary._entity_dict.get(name) is None:
             EntityLibrary._entity_dict[name] = cls
 
+    @staticmethod
+    def get_class(name: str) -> type | None:
+        """
+        :return: The entity class registered under the given name, or None
+        """
+        return EntityLibrary._entity_dict.get(name)
+
     @staticmethod
     def create_entity(name: str, **kwargs):
-        return EntityLibrary._entity_dict[name](**kwargs)
+        """
+        Creates an entity of the class registered under the given name. A destroyed entity of the class
+        is reused if its pool has one, constructing the class directly never reuses pooled entities.
+        """
+        entity = EntityLibrary.acquire(name)
+        if entity is None:
+            return EntityLibrary._entity_dict[name](**kwargs)
+        entity.__init__(**kwargs)
+        return entity
+
+    @staticmethod
+    def acquire(name: str):
+        """
+        Takes a destroyed entity of the given class out of its pool. It has to be initialized again before use.
+        :return: The entity or None if the pool is empty
+        """
+        free_list = EntityLibrary._free_lists.get(name)
+        if not free_list:
+            return None
+        EntityLibrary.reused += 1
+        return free_list.pop()
+
+    @staticmethod
+    def release(entity):
+        """
+        Resets a destroyed entity and puts it back into the pool of its class
+        """
+        entity.reset()
+        EntityLibrary._free_lists.setdefault(entity.__class__.__name__, []).append(entity)
+
+    @staticmethod
+    def withdraw(entity_ids: set[int]):
+        """
+        Takes the given entities out of the pools without reusing them, e.g. when they are restored from a snapshot
+        :param entity_ids: ids of the entities
+        """
+        for name, free_list in EntityLibrary._free_lists.items():
+            EntityLibrary._free_lists[name] = [entity for entity in free_list if id(entity) not in entity_ids]
+
+    @staticmethod
+    def pool_size(name: str) -> int:
+        return len(EntityLibrary._free_lists.get(name, ()))
@@ -1,69 +1,93 @@
+import math
+
 import pygame
 
-from entities.base import DynamicEntity, MovableEntity, Entity
-from entities.types import EntityType
+from entities.base import DynamicEntity, MovableEntity, Entity, EntityRef
+from entities.types import EntityType, CollisionLayer, TickPhase, TypeMask
+from grid.grid import Grid
 from grid.position import Vector, Position
+from grid.projectiles import Projectile
 from utils import load_icon
 
+grid = Grid()
+
 
 class LaserEmitter(DynamicEntity):
+    # Bullets fly out of the emitter, so they never collide with it
+    COLLISION_MASK = CollisionLayer.ALL & ~CollisionLayer.PROJECTILE
+
     def __init__(self, position: Position, delay: int = 50, **kwargs):
         width = height = 40
         image = load_icon(width, height, "resources/cannon.png", "grey")
 
         super().__init__(position=position, width=width, height=height, color="gray", custom_image=image, **kwargs)
         self.delay = delay
-        self.add_on_game_tick(self._decide_shoot_laser, 100)
-
-    def _decide_shoot_laser(self, tick_data):
-        if tick_data.tick % self.delay == 0:
-            self.shoot_laser()
+        self.schedule_every(delay, self.shoot_laser)
 
     def shoot_laser(self):
-        LaserBullet(position=self.position + Position(self.width - 10, self.height - 10))
-
-    def is_passable_for(self, entity: "Entity"):
-        if isinstance(entity, LaserBullet):
-            return True
-        return False
+        grid.spawn_projectile(LaserBullet, self.position + Position(self.width - 10, self.height - 10),
+                              LaserBullet.VELOCITY, source=self)
 
 
-class LaserBullet(MovableEntity):
-    def __init__(self, *, vector=Vector(4, 4), **kwargs):
-        super().__init__(color="cyan", width=5, height=5, **kwargs)
-        self.vector = vector
-        self.add_on_game_tick(self.__move, 100)
-
-    def __move(self, tick_data):
-        super().move(self.vector)
+class LaserBullet(Projectile):
+    WIDTH = 5
+    HEIGHT = 5
+    COLOR = "cyan"
+    VELOCITY = Vector(4, 4)
 
     def on_collision_with(self, entity: "Entity"):
-        if EntityType.KILLABLE in entity.type:
+        if entity.type_mask & TypeMask.KILLABLE:
             entity.killed_by("bullet")
 
 
 class NaiveChasingEntity(MovableEntity):
+    BATCHED_MOVEMENT = True
+    COLLISION_LAYER = CollisionLayer.ENEMY
+    UPDATE_INTERVALS = ((300, 1), (600, 2), (math.inf, 4))
+
     def __init__(self, speed: int = 3, **kwargs):
         super().__init__(**kwargs)
-        self.target_entity: Entity = None
+        self.target_entity: EntityRef = None
         self.vector = Vector(0, 0)
         self.speed = speed
-        self.add_on_game_tick(self.get_movement_vector, 10)
-        self.add_on_game_tick(self.__move, 100)
+        self.add_on_game_tick(self.get_movement_vector, TickPhase.STEERING)
+        self.add_on_game_tick(self.__move, TickPhase.MOVEMENT)
+        # Idle until there is something to chase
+        self.sleep()
 
     def set_target(self, entity: Entity):
-        self.target_entity = entity
+        self.target_entity = EntityRef.of(entity)
+        if entity is not None:
+            self.wake()
+
+    def save_attributes(self) -> dict:
+        return super().save_attributes() | {"speed": self.speed}
+
+    def restore_attributes(self, attributes: dict):
+        super().restore_attributes(attributes)
+        self.speed = attributes.get("speed", self.speed)
 
     def get_movement_vector(self, tick_data):
-        if self.target_entity is None:
+        target = EntityRef.resolve(self.target_entity)
+        if target is None:
             self.vector = Vector(0, 0)
+            self.sleep()
             return
-        dx = self.target_entity.position.x - self.position.x
-        dy = self.target_entity.position.y - self.position.y
-        self.vector = Vector(dx, dy).normalize().scale(self.speed)
+        # Walks around static obstacles, the way is shared with all chasers of the same target
+        self.vector = grid.navigation.direction(self, target).scale(self.speed)
 
     def __move(self, tick_data):
-        super().move(self.vector)
+        vector = self.vector
+        if tick_data.delta > 1:
+            # Makes up for the skipped ticks in steps no longer than its own size, so it can't pass walls
+            vector = vector.scale(tick_data.delta)
+            steps = math.ceil(max(abs(vector.x), abs(vector.y)) / min(self.width, self.height))
+            if steps > 1:
+                step = vector.scale(1 / steps)
+                for _ in range(steps):
+                    super().move(step)
+                return
+        super().move(vector)
 
 
 class Zombie(NaiveChasingEntity):
@@ -75,5 +99,5 @@ class Zombie(NaiveChasingEntity):
         self.type |= EntityType.KILLABLE
 
     def on_collision_with(self, entity: "Entity"):
-        if EntityType.PLAYER in entity.type:
+        if entity.type_mask & TypeMask.PLAYER:
             entity.killed_by("zombie")
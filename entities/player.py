@@ -5,18 +5,16 @@ from grid.grid import Grid
 from grid.position import *
 from utils import load_icon
 from levels.base import Level
-from ui.hint_renderer import GameHintRenderer
 from .base import MovableEntity
-from entities.types import EntityType, HitboxType
+from entities.types import EntityType, CollisionLayer, TickPhase
 import pygamepal as pp
 
 grid = Grid()
-hint_renderer = GameHintRenderer()
 
 
-@dataclass
 class Player(MovableEntity, ABC):
     speed = 4
+    COLLISION_LAYER = CollisionLayer.PLAYER
 
     def __init__(self, position=None):
         width = height = 30
@@ -24,8 +22,8 @@ class Player(MovableEntity, ABC):
 
         super().__init__(position=position, width=width, height=height, color="green", custom_image=image)
         self.type |= EntityType.PLAYER | EntityType.KILLABLE
-        self.add_on_game_tick(self.__get_movement_vector, 0)
-        self.add_on_game_tick(self.__move, 100)
+        self.add_on_game_tick(self.__get_movement_vector, TickPhase.INPUT)
+        self.add_on_game_tick(self.__move, TickPhase.MOVEMENT)
         self.current_movement_vector = Vector(0, 0)
 
     def __get_movement_vector(self, **data):
@@ -49,28 +47,8 @@ class Player(MovableEntity, ABC):
         self.move(self.current_movement_vector)
 
     def move(self, vector: Vector):
-        new_main_hitbox = self.main_hitbox.move(vector.x, vector.y)
-        interactable_found = False
-
-        for target_hb in grid.get_all_colliding_hitboxes(new_main_hitbox):
-            if target_hb.owner is self:
-                continue
-            target_hb.on_collision_with(self)
-            if target_hb.type == HitboxType.MAIN:
-                self.on_collision_with(target_hb.owner)
-                if not target_hb.owner.is_passable_for(self):
-                    return
-
-            if EntityType.INTERACTABLE in target_hb.owner.type or EntityType.HACKABLE in target_hb.owner.type:
-                interactable_found = True
-
-        self.position = self.position + vector
-        self.main_hitbox.move_ip(vector.x, vector.y)
-        for i in range(len(self.hitboxes)):
-            self.hitboxes[i].move_ip(vector.x, vector.y)
-
-        if not interactable_found:
-            hint_renderer.clear_hint()
+        if self.resolve_collisions(grid.probe(self, vector.x, vector.y)):
+            self.apply_move(vector.x, vector.y)
 
     def killed_by(self, killer: str):
         print(f"You have been killed by {killer}")
@@ -2,8 +2,8 @@ from collections.abc import Callable
 
 import pygame
 
-from entities.base import Entity, DynamicEntity, MovableEntity, HackableEntity
-from entities.types import EntityType
+from entities.base import Entity, EntityRef, DynamicEntity, MovableEntity, HackableEntity
+from entities.types import CollisionLayer, TypeMask
 from grid.grid import Grid
 from grid.position import Position
 from hacking.hackable_method import HackableMethod, CallableMethod, ReadOnlyMethod
@@ -13,6 +13,9 @@ TELEPORTER_IMAGE_PATH = "resources/teleport.png"
 
 
 class TeleporterTarget(Entity):
+    COLLISION_LAYER = CollisionLayer.MARKER
+    COLLISION_MASK = CollisionLayer.NONE
+
     def __init__(self, position: Position, **kwargs):
         width = height = 15
         image = load_icon(width, height, TELEPORTER_IMAGE_PATH, (200, 200, 0))
@@ -28,13 +31,21 @@ class Teleporter(Entity):
         image = load_icon(width, height, TELEPORTER_IMAGE_PATH, "magenta")
         super().__init__(position=position, width=width, height=height, color=pygame.Color("magenta"),
                          custom_image=image, **kwargs)
-        self.target: TeleporterTarget = None
+        self._target: EntityRef = None
+
+    @property
+    def target(self) -> TeleporterTarget | None:
+        return EntityRef.resolve(self._target)
+
+    @target.setter
+    def target(self, target: TeleporterTarget | None):
+        self._target = EntityRef.of(target)
 
     def set_target(self, target: TeleporterTarget):
         self.target = target
 
-    def on_collision_with(self, entity: "Entity"):
-        if self.target is not None and EntityType.PLAYER in entity.type:
+    def on_collision_enter(self, entity: "Entity"):
+        if self.target is not None and entity.type_mask & TypeMask.PLAYER:
             entity: MovableEntity
             entity.move_to(self.target.position)
 
@@ -42,8 +53,8 @@ class Teleporter(Entity):
 class HackableTeleporter(Teleporter, HackableEntity):
     def __init__(self, position: Position, targets: list[TeleporterTarget], teleporters: list[Teleporter], **kwargs):
         super().__init__(position=position, interaction_offset=15, **kwargs)
-        self.targets = targets
-        self.other_teleporters = teleporters
+        self.targets = [EntityRef(target) for target in targets]
+        self.other_teleporters = [EntityRef(teleporter) for teleporter in teleporters]
 
     @CallableMethod
     def set_target(self, target):
@@ -51,8 +62,8 @@ class HackableTeleporter(Teleporter, HackableEntity):
 
     @CallableMethod
     def get_valid_targets(self):
-        return self.targets
+        return [target for target in map(EntityRef.get, self.targets) if target is not None]
 
     @CallableMethod
     def get_other_teleporters(self):
-        return self.other_teleporters
+        return [teleporter for teleporter in map(EntityRef.get, self.other_teleporters) if teleporter is not None]
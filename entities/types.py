@@ -2,7 +2,7 @@ from dataclasses import dataclass
 
 import pygame
 import pygamepal as pp
-from enum import Flag, Enum
+from enum import Flag, Enum, IntEnum, IntFlag
 
 
 class EntityType(Flag):
@@ -15,6 +15,53 @@ class EntityType(Flag):
     KILLABLE = 32
 
 
+class TypeMask:
+    """
+    Integer values of the EntityType flags, for testing Entity.type_mask on hot paths without going through enum
+    operators, e.g. entity.type_mask & TypeMask.PLAYER
+    """
+    DEFAULT = EntityType.DEFAULT.value
+    DYNAMIC = EntityType.DYNAMIC.value
+    MOVABLE = EntityType.MOVABLE.value
+    PLAYER = EntityType.PLAYER.value
+    HACKABLE = EntityType.HACKABLE.value
+    INTERACTABLE = EntityType.INTERACTABLE.value
+    KILLABLE = EntityType.KILLABLE.value
+
+
+class CollisionLayer(IntFlag):
+    """
+    Layers of the collision system. Every hitbox is on some layers and has a mask of the layers it interacts with.
+    Two hitboxes are only tested against each other if each one's mask contains a layer of the other.
+    """
+    NONE = 0
+    # Walls, doors, buttons and other fixtures of a level
+    WORLD = 1
+    PLAYER = 2
+    ENEMY = 4
+    PROJECTILE = 8
+    # Entities nothing needs to collide with, e.g. teleporter targets
+    MARKER = 16
+    # Ranges in which the player can interact with an entity
+    INTERACTION = 32
+    ALL = 63
+
+
+class TickPhase(IntEnum):
+    """
+    Priorities of tick actions. Each phase runs for all entities before the next one starts,
+    any other priority makes a phase of its own.
+    """
+    # Reading the input
+    INPUT = 0
+    # Deciding where to go
+    STEERING = 10
+    # Moving, batched moves are resolved at the end of the phase
+    MOVEMENT = 100
+    # Drawing sprites at the new positions
+    SPRITE_SYNC = 1000
+
+
 class HitboxType(Enum):
     MAIN = 0
     OTHER = 1
@@ -24,6 +71,8 @@ class HitboxType(Enum):
 class TickData:
     tick: int = 0
     pp_input: pp.Input = None
+    # Ticks since the entity running the action was last updated, more than 1 for throttled entities
+    delta: int = 1
 
 
 class FRect(pygame.Rect):
@@ -38,4 +87,9 @@ class FRect(pygame.Rect):
         super().update(round(self.fx), round(self.fy), self.width, self.height)
 
     def move(self, x, y, /):
-        return FRect(self.fx + x, self.fy + y, self.width, self.height)
\ No newline at end of file
+        return FRect(self.fx + x, self.fy + y, self.width, self.height)
+
+    def reposition(self, fx, fy, w, h):
+        self.fx = fx
+        self.fy = fy
+        super().update(round(fx), round(fy), w, h)
\ No newline at end of file
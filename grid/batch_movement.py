@@ -0,0 +1,143 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pygame
+
+from .spatial_hash import overlap_pairs
+
+if TYPE_CHECKING:
+    from entities.base import MovableEntity
+    from .grid import Grid
+
+# Smaller batches are resolved one move at a time. The vectorized passes have a fixed cost of a few dozen numpy calls,
+# below about this many moves it's more than the spatial hash queries they replace.
+MIN_VECTORIZED_MOVES = 192
+
+
+def resolve_batched_moves(grid: "Grid", moves: list[tuple["MovableEntity", float, float]]):
+    """
+    Resolves moves deferred during a tick. The destinations of all movers are paired with the static and dynamic
+    hitboxes they may touch in vectorized passes over cell buckets, then every mover runs through
+    the collision callbacks in order, testing only its own candidates.
+    :param grid: The grid owning the movers
+    :param moves: (entity, x, y) tuples in the order the moves were requested
+    """
+    generation = grid.generation
+    if len(moves) < MIN_VECTORIZED_MOVES:
+        for entity, x, y in moves:
+            if grid.generation != generation:
+                return
+            if grid.is_registered(entity):
+                entity.move_by(x, y)
+        return
+
+    static_index = grid.static_index
+    dynamic_index = grid.dynamic_index
+    if static_index.dirty:
+        static_index.build()
+
+    entities, x, y = zip(*moves)
+    offsets = np.column_stack((x, y)).astype(np.float64)
+    slots = dynamic_index.slots([entity.main_hitbox for entity in entities])
+    known = slots >= 0
+    # Grid.probe offsets the rounded rectangle, so the probes are rounded the same way. Movers which aren't indexed
+    # any more are skipped by the resolution, they get empty probes.
+    rects = np.rint(dynamic_index.rects[slots]).astype(np.int64)
+    rects[:, :2] = np.rint(dynamic_index.rects[slots, :2] + offsets)
+    rects[~known] = 0
+    layers, masks = dynamic_index.layers[slots], dynamic_index.masks[slots]
+    mover_ids = np.where(known, dynamic_index.owner_ids[slots], -1)
+
+    # How far every mover can get through any subset of its moves, kept at the last move of the mover
+    by_id = np.argsort(mover_ids, kind="stable")
+    sorted_ids = mover_ids[by_id]
+    first = np.concatenate(([True], sorted_ids[1:] != sorted_ids[:-1]))
+    last = np.concatenate((first[1:], [True]))
+    movers = np.empty(len(moves), dtype=np.int64)
+    movers[by_id] = by_id[last][np.cumsum(first) - 1]
+    negative = np.column_stack([np.bincount(movers, np.minimum(column, 0), len(moves)) for column in offsets.T])
+    positive = np.column_stack([np.bincount(movers, np.maximum(column, 0), len(moves)) for column in offsets.T])
+
+    # Static pass, only movers the occupancy map can't place in free space are paired with static hitboxes
+    near_static = np.arange(len(moves))
+    if grid.occupancy is not None:
+        near_static = near_static[~grid.occupancy.free_mask(rects)]
+    static_i, static_j = static_index.overlap_pairs(rects[near_static])
+    static_i = near_static[static_i]
+    compatible = (((masks[static_i] & static_index.layers[static_j]) != 0)
+                  & ((static_index.masks[static_j] & layers[static_i]) != 0))
+    grid.pairs_pruned += int(np.count_nonzero(~compatible))
+    static_i, static_j = static_i[compatible], static_j[compatible]
+    grid.pairs_checked += len(static_i)
+
+    # Dynamic pass over all indexed hitboxes. Hitboxes of movers may have moved by the time a later mover
+    # is resolved, so they stand in for the whole area they can reach, the exact test is left to the resolution.
+    other_rects = dynamic_index.rects
+    found = np.minimum(np.searchsorted(mover_ids, dynamic_index.owner_ids, sorter=by_id), len(moves) - 1)
+    owners = np.where(mover_ids[by_id[found]] == dynamic_index.owner_ids, movers[by_id[found]], -1)
+    moving = (owners >= 0)[:, None]
+    # Whole pixels around the areas, so no candidate is lost to rounding
+    areas = np.empty(other_rects.shape, dtype=np.int64)
+    areas[:, :2] = np.floor(other_rects[:, :2] + np.where(moving, negative[owners], 0))
+    areas[:, 2:] = np.ceil(other_rects[:, :2] + other_rects[:, 2:] + np.where(moving, positive[owners], 0))
+    areas[:, 2:] -= areas[:, :2]
+    dynamic_i, dynamic_j = overlap_pairs(rects, areas, dynamic_index.cell_size)
+
+    if len(dynamic_i):
+        foreign = owners[dynamic_j] != movers[dynamic_i]
+        dynamic_i, dynamic_j = dynamic_i[foreign], dynamic_j[foreign]
+        compatible = (((masks[dynamic_i] & dynamic_index.layers[dynamic_j]) != 0)
+                      & ((dynamic_index.masks[dynamic_j] & layers[dynamic_i]) != 0))
+        grid.pairs_pruned += int(np.count_nonzero(~compatible))
+        dynamic_i, dynamic_j = dynamic_i[compatible], dynamic_j[compatible]
+
+    # Pairs are sorted by mover, so the candidates of each mover are a slice
+    steps = np.arange(len(moves) + 1)
+    static_bounds = np.searchsorted(static_i, steps).tolist()
+    dynamic_bounds = np.searchsorted(dynamic_i, steps).tolist()
+    static_j, dynamic_j = static_j.tolist(), dynamic_j.tolist()
+    static_entries = static_index.entries
+    candidates = dynamic_index.slot_entries
+    rects = rects.tolist()
+
+    probe = pygame.Rect(0, 0, 0, 0)
+    is_registered = grid.is_registered
+    # The dynamic index as left by the moves resolved so far, None once anything else has changed it
+    version = dynamic_index.version
+    resolved = set()
+    for i, (entity, x, y) in enumerate(moves):
+        if grid.generation != generation:
+            return
+        if not is_registered(entity):
+            continue
+        if static_index.dirty or version is None:
+            # A callback has changed the world, the precomputed candidates are stale
+            entity.move_by(x, y)
+            continue
+
+        if id(entity) in resolved:
+            # Later steps of a mover start from wherever the earlier ones have left it
+            hitboxes = grid.probe(entity, x, y)
+        else:
+            resolved.add(id(entity))
+            hits = []
+            start, end = dynamic_bounds[i], dynamic_bounds[i + 1]
+            if start != end:
+                probe.update(rects[i])
+                hits = [candidates[j] for j in dynamic_j[start:end] if probe.colliderect(candidates[j][1])]
+                grid.pairs_checked += len(hits)
+            start, end = static_bounds[i], static_bounds[i + 1]
+            if start != end:
+                hits += [static_entries[j] for j in static_j[start:end]]
+            if len(hits) > 1:
+                hits.sort(key=lambda entry: entry[0])
+            hitboxes = [hitbox for _, hitbox in hits]
+
+        passed = entity.resolve_collisions(hitboxes)
+        if dynamic_index.version != version:
+            # A callback has moved, added or removed a dynamic hitbox
+            version = None
+        if passed:
+            entity.apply_move(x, y)
+            if version is not None:
+                version = dynamic_index.version
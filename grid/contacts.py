@@ -0,0 +1,81 @@
+from typing import TYPE_CHECKING
+
+from entities.types import HitboxType
+
+if TYPE_CHECKING:
+    from entities.base import Entity, Hitbox
+    from .grid import Grid
+
+# (id(mover), id(hitbox))
+ContactKey = tuple[int, int]
+
+
+class ContactTracker:
+    """
+    Turns the hitboxes movers run into while moving into contacts which last across ticks.
+    Once the movement phase of a tick is over, every contact which has begun, gone on or ended gets
+    a single on_collision_enter, on_collision_stay or on_collision_exit call on both sides.
+    """
+
+    def __init__(self):
+        # Contacts as of the last dispatch
+        self._contacts: dict[ContactKey, tuple["Entity", "Hitbox"]] = {}
+        # Contacts reported since the last dispatch, and ids of the movers which reported them
+        self._touched: dict[ContactKey, tuple["Entity", "Hitbox"]] = {}
+        self._reported: set[int] = set()
+        self.events_dispatched = 0
+
+    def __len__(self):
+        return len(self._contacts)
+
+    def report(self, mover: "Entity", hitboxes: list["Hitbox"]):
+        """
+        Records the hitboxes a move has run into. Contacts of a mover which has tried to move
+        end unless reported again, contacts of movers which have not tried to move in a tick go on silently.
+        """
+        self._reported.add(id(mover))
+        touched = self._touched
+        for hitbox in hitboxes:
+            touched[(id(mover), id(hitbox))] = (mover, hitbox)
+
+    def clear(self):
+        self._contacts = {}
+        self._touched = {}
+        self._reported = set()
+
+    def dispatch(self, grid: "Grid"):
+        """
+        Calls the event handlers of all contacts which have changed since the last dispatch.
+        Contacts reported by the handlers themselves, e.g. while teleporting, are dispatched next time.
+        """
+        contacts, touched, reported = self._contacts, self._touched, self._reported
+        self._touched, self._reported = {}, set()
+
+        exited = []
+        kept = {}
+        for key, (mover, hitbox) in contacts.items():
+            if not grid.is_registered(mover) or not grid.is_registered(hitbox.owner):
+                # Removed entities have no contacts left to end
+                continue
+            if key in touched or key[0] not in reported:
+                kept[key] = (mover, hitbox)
+            else:
+                exited.append((mover, hitbox))
+        entered = [pair for key, pair in touched.items() if key not in kept]
+        stayed = [pair for key, pair in touched.items() if key in kept]
+        kept.update(touched)
+        self._contacts = kept
+
+        generation = grid.generation
+        for events, handler in ((exited, "exit"), (entered, "enter"), (stayed, "stay")):
+            for mover, hitbox in events:
+                if not grid.is_registered(mover) or not grid.is_registered(hitbox.owner):
+                    continue
+                self.events_dispatched += 1
+                getattr(hitbox, f"on_collision_{handler}")(mover)
+                if grid.generation != generation:
+                    return
+                if hitbox.type == HitboxType.MAIN:
+                    getattr(mover, f"on_collision_{handler}")(hitbox.owner)
+                    if grid.generation != generation:
+                        return
@@ -0,0 +1,44 @@
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from entities.base import Entity
+
+
+class EntityList:
+    """
+    An insertion-ordered container of entities with O(1) removal.
+    Removed entities leave a hole, which is skipped by iteration and dropped by the next compact().
+    Appending while iterating is allowed, the new entities are visited by the running iteration.
+    """
+
+    def __init__(self):
+        self._items: list["Entity | None"] = []
+        self._index: dict[int, int] = {}
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, entity: "Entity"):
+        return id(entity) in self._index
+
+    def __iter__(self) -> Iterator["Entity"]:
+        for entity in self._items:
+            if entity is not None:
+                yield entity
+
+    def append(self, entity: "Entity"):
+        self._index[id(entity)] = len(self._items)
+        self._items.append(entity)
+
+    def remove(self, entity: "Entity"):
+        self._items[self._index.pop(id(entity))] = None
+
+    def compact(self):
+        """
+        Drops holes left by removed entities once they make up at least half of the storage.
+        Must not be called while the list is being iterated.
+        """
+        if 2 * len(self._index) > len(self._items):
+            return
+        self._items = [entity for entity in self._items if entity is not None]
+        self._index = {id(entity): i for i, entity in enumerate(self._items)}
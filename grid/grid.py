@@ -5,38 +5,185 @@ import pygame
 import pygamepal as pp
 
 from entities.entity_library import EntityLibrary
-from .position import Position
-from entities.types import EntityType, TickData
+from .batch_movement import resolve_batched_moves
+from .contacts import ContactTracker
+from .entity_list import EntityList
+from .navigation import Navigation
+from .occupancy import OccupancyMap
+from .position import Position, Vector
+from .projectiles import Projectile, ProjectilePool
+from . import queries
+from .queries import RaycastHit, TypeFilter
+from .scheduler import TickScheduler
+from .snapshot import WorldSnapshot
+from .spatial_hash import SpatialHash, StaticIndex
+from .timers import TimerWheel
+from entities.types import EntityType, TickData, TypeMask
 
 if TYPE_CHECKING:
-    from entities.base import Entity, DynamicEntity, InteractableEntity, HackableEntity
+    from entities.base import Entity, DynamicEntity, MovableEntity, InteractableEntity, HackableEntity, Hitbox
 
 
 @dataclass
 class Grid:
     sprites = pygame.sprite.Group()
-    dynamic_entities: list["DynamicEntity"] = field(default_factory=list)
-    entities: list["Entity"] = field(default_factory=list)
+    dynamic_entities: EntityList = field(default_factory=EntityList)
+    entities: EntityList = field(default_factory=EntityList)
+    static_index: StaticIndex = field(default_factory=StaticIndex)
+    dynamic_index: SpatialHash = field(default_factory=SpatialHash)
+    # Cells covered by static hitboxes, lets most queries skip the static index. None when disabled.
+    occupancy: OccupancyMap = None
+    # Flow fields of chasing entities, kept up to date with the static hitboxes
+    navigation: Navigation = None
+    # Tick actions of all dynamic entities, run phase by phase
+    scheduler: TickScheduler = None
+    # Delayed and periodic callbacks of entities. Its clock counts the ticks since the world was loaded.
+    timers: TimerWheel = field(default_factory=TimerWheel)
+    # Contacts between movers and the hitboxes they run into, turned into enter, stay and exit events
+    contacts: ContactTracker = field(default_factory=ContactTracker)
 
     current_interactable_entity: "InteractableEntity" = None
 
+    projectile_pools: dict[str, ProjectilePool] = field(default_factory=dict)
+    # Projectiles leaving this area are recycled. Changed through set_world_size, which resizes the maps covering it.
+    world_size: tuple[int, int] = (1200, 720)
+
+    # Defer moves of entities with BATCHED_MOVEMENT to a vectorized phase at the end of each tick
+    batch_movement: bool = False
+    # Incremented on every clear, lets long-running loops notice that the world has been replaced
+    generation: int = 0
+    # Incremented whenever a static entity is added, removed or changes its sprite
+    static_version: int = 0
+    # Pairs of overlapping hitboxes passed on to collision callbacks, and ones skipped because of their collision layers
+    pairs_checked: int = 0
+    pairs_pruned: int = 0
+
     _instance = None
+    _entity_order: dict[int, int] = field(default_factory=dict)
+    # EntityType bit -> id(entity) -> entity, for every registered entity with that flag
+    _typed: dict[int, dict[int, "Entity"]] = field(default_factory=dict)
+    _next_order: int = 0
+    _pending_moves: list[tuple["MovableEntity", float, float]] = field(default_factory=list)
+    _collecting_moves: bool = False
+    # Entities removed during a tick are returned to their pools once the tick is over,
+    # as their code may still be running further up the stack
+    _released: list["Entity"] = field(default_factory=list)
+    _in_tick: bool = False
+    # id(entity) -> position of each dynamic entity at the start of the last tick, used for interpolation
+    _previous_positions: dict[int, tuple[float, float]] = field(default_factory=dict)
+    _snapshot: WorldSnapshot = None
+    # Reused by probe, so testing a move allocates no rectangle
+    _probe_rect: pygame.Rect = field(default_factory=lambda: pygame.Rect(0, 0, 0, 0))
+
+    # Sprites moving further than this within one tick are teleported rather than interpolated
+    INTERPOLATION_MAX_DISTANCE = 50
+    # Default resolution of the occupancy map, matching the thickness of walls
+    OCCUPANCY_CELL_SIZE = 10
 
     def __new__(cls, *args, **kwargs):
         if not isinstance(cls._instance, cls):
             cls._instance = object.__new__(cls, *args, **kwargs)
         return cls._instance
 
-    def register_entity(self, entity: "Entity"):
+    def __post_init__(self):
+        if self.occupancy is None:
+            self.occupancy = OccupancyMap(self.world_size, self.OCCUPANCY_CELL_SIZE)
+        if self.navigation is None:
+            self.navigation = Navigation(self)
+        if self.scheduler is None:
+            self.scheduler = TickScheduler(self)
+
+    def set_occupancy_resolution(self, cell_size: int | None):
+        """
+        Rebuilds the occupancy map with a different cell size
+        :param cell_size: Side of a cell in pixels, None to disable the map
+        """
+        if cell_size is None:
+            self.occupancy = None
+            return
+        self.occupancy = OccupancyMap(self.world_size, cell_size)
+        for hitbox in self.static_index.hitboxes():
+            self.occupancy.add(hitbox)
+
+    def set_world_size(self, width: int, height: int):
+        """
+        Resizes the world, rebuilding the occupancy map and dropping the navigation maps made for the old size
+        """
+        self.world_size = (width, height)
+        if self.occupancy is not None:
+            self.set_occupancy_resolution(self.occupancy.cell_size)
+        self.navigation.clear()
+
+    def register_entity(self, entity: "Entity", order: int = None):
         """
         Places a previously created entity on the map
         :param entity: The entity to be placed
-        :param position: Position on the map
+        :param order: Registration order to reuse, e.g. when restoring a snapshot. A new one is assigned by default.
         """
+        if self.is_registered(entity):
+            return
 
         self.entities.append(entity)
-        if EntityType.DYNAMIC in entity.type:
+        self._add_typed(entity, entity.type_mask)
+        if entity.type_mask & TypeMask.DYNAMIC:
             self.dynamic_entities.append(entity)
+            self.scheduler.add_entity(entity)
+            for timer in getattr(entity, "timers", ()):
+                self.timers.add(timer)
+
+        if order is None:
+            order = self._next_order
+        self._entity_order[id(entity)] = order
+        self._next_order = max(self._next_order, order + 1)
+        if not entity.type_mask & TypeMask.DYNAMIC:
+            self.static_version += 1
+        for hitbox in entity.get_hitboxes():
+            self.register_hitbox(hitbox)
+
+    def register_hitbox(self, hitbox: "Hitbox"):
+        """
+        Adds a hitbox to the collision index. Hitboxes of entities which are not registered yet are skipped,
+        they get indexed together with their owner.
+        Hitboxes of non-dynamic entities go to the static index, which is rebuilt lazily on the next query.
+        :param hitbox: The hitbox
+        """
+        order = self._entity_order.get(id(hitbox.owner))
+        if order is None:
+            return
+        slot = 0
+        if hitbox is not hitbox.owner.main_hitbox:
+            slot = 1 + next(i for i, hb in enumerate(hitbox.owner.hitboxes) if hb is hitbox)
+        if hitbox.owner.type_mask & TypeMask.DYNAMIC:
+            self.dynamic_index.insert(hitbox, (order, slot))
+            if hitbox.owner.NAVIGATION_OBSTACLE:
+                self.navigation.on_obstacle_added(hitbox)
+        else:
+            self.static_index.insert(hitbox, (order, slot))
+            if self.occupancy is not None:
+                self.occupancy.add(hitbox)
+            self.navigation.on_obstacle_added(hitbox)
+
+    def unregister_hitbox(self, hitbox: "Hitbox"):
+        self.dynamic_index.remove(hitbox)
+        self.static_index.remove(hitbox)
+        if self.occupancy is not None:
+            self.occupancy.remove(hitbox)
+        self.navigation.on_obstacle_removed(hitbox)
+
+    def on_hitbox_moved(self, hitbox: "Hitbox"):
+        """
+        Keeps the collision index in sync after a hitbox has been moved in place
+        :param hitbox: The moved hitbox
+        """
+        if hitbox in self.static_index:
+            self.static_index.dirty = True
+            if self.occupancy is not None:
+                self.occupancy.update(hitbox)
+            self.navigation.on_obstacle_moved(hitbox)
+        else:
+            self.dynamic_index.update(hitbox)
+            if hitbox.owner.NAVIGATION_OBSTACLE:
+                self.navigation.on_obstacle_moved(hitbox)
 
     def place_entity_by_name(self, entity_name: str, position: "Position" = None, **kwargs):
         """
@@ -47,51 +194,340 @@ class Grid:
         """
         entity = EntityLibrary.create_entity(entity_name, position=position, **kwargs)
         self.register_entity(entity)
+        return entity
 
     def clear(self):
         """
         Removes all entities
         """
+        self._released.extend(self.entities)
+        self._snapshot = None
+        self._reset_world()
+        # Entities created by a level load are numbered from 0, save files refer to them by this number
+        self._next_order = 0
+        if not self._in_tick:
+            self._release_removed()
+
+    def capture_snapshot(self):
+        """
+        Remembers the current state of all entities, so restore_snapshot can return to it later
+        """
+        self._snapshot = WorldSnapshot(self)
+
+    def restore_snapshot(self) -> bool:
+        """
+        Returns all entities to the state of the last captured snapshot. Entities created since then are removed,
+        destroyed ones are taken back from their pools.
+        :return: Whether there was a snapshot to restore
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return False
+
+        restored_ids = snapshot.entity_ids
+        self._released = [entity for entity in self._released if id(entity) not in restored_ids]
+        self._released.extend(entity for entity in self.entities if id(entity) not in restored_ids)
+        EntityLibrary.withdraw(restored_ids)
+        self._reset_world()
+        snapshot.restore(self)
+        if not self._in_tick:
+            self._release_removed()
+        return True
+
+    def _reset_world(self):
         self.sprites = pygame.sprite.Group()
-        self.dynamic_entities = []
-        self.entities = []
+        self.dynamic_entities = EntityList()
+        self.entities = EntityList()
+        self.static_index.clear()
+        self.dynamic_index.clear()
+        if self.occupancy is not None:
+            self.occupancy.clear()
+        self.navigation.clear()
+        self.scheduler.clear()
+        self.timers.clear()
+        self.contacts.clear()
+        self._entity_order = {}
+        self._typed = {}
+        self._pending_moves = []
+        self._previous_positions = {}
+        for pool in self.projectile_pools.values():
+            pool.clear()
         self.current_interactable_entity = None
+        self.generation += 1
+        self.static_version += 1
+
+    def on_entity_type_changed(self, entity: "Entity", previous_mask: int):
+        """
+        Keeps the lookups by type in sync with a changed type. Whether the entity is dynamic is decided
+        once it is registered and does not change.
+        """
+        if not self.is_registered(entity):
+            return
+        self._remove_typed(entity, previous_mask & ~entity.type_mask)
+        self._add_typed(entity, entity.type_mask & ~previous_mask)
+
+    def entities_of_type(self, entity_type: EntityType) -> list["Entity"]:
+        """
+        Finds registered entities by their type, in time proportional to the number found
+        :param entity_type: Flags all returned entities must have
+        """
+        mask = entity_type.value
+        if not mask:
+            return list(self.entities)
+        candidates = None
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            typed = self._typed.get(bit)
+            if not typed:
+                return []
+            if candidates is None or len(typed) < len(candidates):
+                candidates = typed
+        if mask & (mask - 1) == 0:
+            return list(candidates.values())
+        return [entity for entity in candidates.values() if entity.type_mask & mask == mask]
+
+    def _add_typed(self, entity: "Entity", mask: int):
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            self._typed.setdefault(bit, {})[id(entity)] = entity
+
+    def _remove_typed(self, entity: "Entity", mask: int):
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            self._typed.get(bit, {}).pop(id(entity), None)
+
+    def is_registered(self, entity: "Entity") -> bool:
+        return id(entity) in self._entity_order
+
+    def get_entity_order(self, entity: "Entity") -> int:
+        return self._entity_order[id(entity)]
 
     def process_dynamic_entities(self, tick_data: TickData):
         """
-        Calls all tick actions for all dynamic entities.
+        Runs the timers due and the tick actions of all dynamic entities, phase by phase.
         :param tick_data: Information about the current tick
         """
+        generation = self.generation
+        self._in_tick = True
+        self.dynamic_entities.compact()
+        self.entities.compact()
+        self._previous_positions = {id(entity): (entity.position.x, entity.position.y)
+                                    for entity in self.dynamic_entities}
+        self._collecting_moves = self.batch_movement
+        self.timers.advance()
+        if self.generation == generation:
+            self.scheduler.run(tick_data)
+        self._collecting_moves = False
+
+        if self.generation == generation:
+            self.contacts.dispatch(self)
+
+        for pool in self.projectile_pools.values():
+            if self.generation != generation:
+                break
+            pool.update(self)
+
+        self._in_tick = False
+        self._release_removed()
+
+    def resolve_pending_moves(self):
+        """
+        Resolves the moves queued so far, which must not be queued again while they are being resolved
+        """
+        moves, self._pending_moves = self._pending_moves, []
+        if not moves:
+            return
+        collecting, self._collecting_moves = self._collecting_moves, False
+        resolve_batched_moves(self, moves)
+        self._collecting_moves = collecting
+
+    def interpolate_sprites(self, alpha: float):
+        """
+        Places the sprites of dynamic entities between their positions from the previous and the current tick,
+        so the world can be drawn more often than it is updated.
+        :param alpha: Fraction of a tick elapsed since the current tick, between 0 and 1
+        """
+        previous_positions = self._previous_positions
+        max_distance = self.INTERPOLATION_MAX_DISTANCE
         for entity in self.dynamic_entities:
-            entity.on_game_tick(tick_data)
+            position = entity.position
+            previous = previous_positions.get(id(entity))
+            if previous is None:
+                continue
+            dx, dy = position.x - previous[0], position.y - previous[1]
+            if abs(dx) > max_distance or abs(dy) > max_distance:
+                continue
+            rect = entity.sprite.rect
+            rect.x = previous[0] + alpha * dx
+            rect.y = previous[1] + alpha * dy
+
+    def _release_removed(self):
+        released, self._released = self._released, []
+        for entity in released:
+            EntityLibrary.release(entity)
+
+    def spawn_projectile(self, projectile_type: type[Projectile], position: Position, velocity: Vector,
+                         source: "Entity" = None) -> Projectile:
+        """
+        Launches a projectile, which is moved and hit-tested together with all others of its type
+        :param projectile_type: Projectile subclass describing the look and behavior
+        :param position: Starting position
+        :param velocity: Movement per tick
+        :param source: The entity which has fired the projectile
+        """
+        pool = self.projectile_pools.get(projectile_type.__name__)
+        if pool is None:
+            pool = self.projectile_pools[projectile_type.__name__] = ProjectilePool(projectile_type)
+        return pool.spawn(position, velocity, source)
 
-    def get_all_colliding_hitboxes(self, hitbox):
+    def draw_projectiles(self, surface: pygame.Surface) -> list[pygame.Rect]:
         """
-        Iterates over all registered hitboxes of entities, which collide with the given one
+        :return: Areas of the surface drawn over
+        """
+        rects = []
+        for pool in self.projectile_pools.values():
+            rects += pool.draw(surface)
+        return rects
+
+    def queue_move(self, entity: "MovableEntity", x: float, y: float) -> bool:
+        """
+        Defers a move to the batched movement phase at the end of the current tick
+        :return: Whether the move has been queued. Outside of process_dynamic_entities moves are never queued.
+        """
+        if not self._collecting_moves:
+            return False
+        self._pending_moves.append((entity, x, y))
+        return True
+
+    def get_all_colliding_hitboxes(self, hitbox) -> list["Hitbox"]:
+        """
+        Finds all registered hitboxes of other entities, which collide with the given one
         :param hitbox: A hitbox of the origin
+        :return: Colliding hitboxes in registration order
+        """
+        return self._get_colliding(hitbox, hitbox.owner, hitbox.collision_layer, hitbox.collision_mask)
+
+    def probe(self, entity: "Entity", x: float, y: float) -> list["Hitbox"]:
+        """
+        Finds the hitboxes the main hitbox of an entity would collide with if it was shifted by the given offset,
+        the same way as get_all_colliding_hitboxes, without creating a shifted hitbox
+        :return: Colliding hitboxes in registration order
+        """
+        hitbox = entity.main_hitbox
+        # Offsets the rounded rectangle, like Hitbox.move
+        rect = self._probe_rect
+        rect.update(round(hitbox.x + x), round(hitbox.y + y), hitbox.width, hitbox.height)
+        return self._get_colliding(rect, entity, hitbox.collision_layer, hitbox.collision_mask)
+
+    def _get_colliding(self, rect, owner: "Entity", layer: int, mask: int) -> list["Hitbox"]:
+        if self.occupancy is not None and self.occupancy.is_free(rect):
+            static_hits = []
+        else:
+            static_hits = self.static_index.query(rect)
+        dynamic_hits = self.dynamic_index.query(rect)
+        if static_hits and dynamic_hits:
+            hits = static_hits + dynamic_hits
+            hits.sort(key=lambda entry: entry[0])
+        else:
+            hits = static_hits or dynamic_hits
+        colliding = []
+        for _, target_hb in hits:
+            if target_hb.owner is owner:
+                continue
+            # Pairs ruled out by collision layers never reach the callbacks
+            if target_hb.collision_layer & mask and target_hb.collision_mask & layer:
+                colliding.append(target_hb)
+            else:
+                self.pairs_pruned += 1
+        self.pairs_checked += len(colliding)
+        return colliding
+
+    def query_rect(self, rect, type_filter: TypeFilter = None) -> list["Entity"]:
+        """
+        :param rect: A pygame.Rect or an (x, y, width, height) tuple
+        :param type_filter: An EntityType the entities must have, or a class they must be instances of
+        :return: Entities overlapping the rectangle, in registration order
+        """
+        return queries.query_rect(self, rect, type_filter)
+
+    def query_radius(self, center: Position, radius: float, type_filter: TypeFilter = None) -> list["Entity"]:
+        """
+        :return: Entities with any part closer to the center than the radius, in registration order
+        """
+        return queries.query_radius(self, center, radius, type_filter)
+
+    def nearest(self, position: Position, k: int = 1, type_filter: TypeFilter = None,
+                max_distance: float = float("inf"), exclude=()) -> list["Entity"]:
+        """
+        :param exclude: Entities to skip, e.g. the one asking
+        :return: Up to k entities closest to the position, closest first
+        """
+        return queries.nearest(self, position, k, type_filter, max_distance, exclude)
+
+    def raycast(self, origin: Position, direction: Vector, max_distance: float, type_filter: TypeFilter = None,
+                ignore=(), include_dynamic: bool = True) -> RaycastHit | None:
+        """
+        Finds the first entity on a ray, visiting only the index cells along it
+        :param ignore: Entities the ray passes through, e.g. the one casting it
+        :return: The closest hit, None if there is none within max_distance
+        """
+        return queries.raycast(self, origin, direction, max_distance, type_filter, ignore, include_dynamic)
+
+    def has_line_of_sight(self, source: "Entity", target: "Entity") -> bool:
+        """
+        :return: Whether no static entity impassable for the source stands between the centers of both entities
         """
-        for e in self.entities:
-            for target_hb in e.get_hitboxes():
-                if hitbox.colliderect(target_hb):
-                    yield target_hb
+        return queries.has_line_of_sight(self, source, target)
+
+    def overlaps_static(self, rect) -> bool:
+        """
+        Tells whether any static hitbox collides with the given rectangle, answered from the occupancy map
+        without exact tests for most free areas
+        :param rect: The tested rectangle
+        """
+        if self.occupancy is not None and self.occupancy.is_free(rect):
+            return False
+        return bool(self.static_index.query(rect))
 
     def process_player_input(self, tick_data: TickData):
         """
         Responds to player actions other than movement
         """
+        self._in_tick = True
         if tick_data.pp_input.isKeyPressed(pygame.K_e):
             if (self.current_interactable_entity is not None
-                        and EntityType.INTERACTABLE in self.current_interactable_entity.type):
-                self.current_interactable_entity.on_player_interaction(tick_data)
+                        and self.current_interactable_entity.type_mask & TypeMask.INTERACTABLE):
+                self.current_interactable_entity.interact(tick_data)
 
         if tick_data.pp_input.isKeyPressed(pygame.K_t):
-            if EntityType.HACKABLE in self.current_interactable_entity.type:
+            if (self.current_interactable_entity is not None
+                    and self.current_interactable_entity.type_mask & TypeMask.HACKABLE):
                 self.current_interactable_entity: HackableEntity
                 self.current_interactable_entity.display_special_methods()
+        self._in_tick = False
+        self._release_removed()
 
     def remove_entity(self, entity):
+        if not self.is_registered(entity):
+            return
+        for hitbox in entity.get_hitboxes():
+            self.unregister_hitbox(hitbox)
+        self._entity_order.pop(id(entity), None)
+        self._previous_positions.pop(id(entity), None)
         self.sprites.remove(entity.sprite)
         self.entities.remove(entity)
-        if EntityType.DYNAMIC in entity.type:
+        self._remove_typed(entity, entity.type_mask)
+        if entity.type_mask & TypeMask.DYNAMIC:
             self.dynamic_entities.remove(entity)
-
+            self.scheduler.remove_entity(entity)
+            for timer in getattr(entity, "timers", ()):
+                self.timers.cancel(timer)
+        else:
+            self.static_version += 1
+        self._released.append(entity)
+        if not self._in_tick:
+            self._release_removed()
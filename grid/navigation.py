@@ -0,0 +1,289 @@
+"""
+Flow-field pathfinding shared by all entities chasing the same target.
+
+The world is divided into cells. A NavigationMap marks the cells a mover of a given class and size can't stand in,
+a FlowField holds the distances of cells to the cell of a target, found by a breadth-first search.
+All chasers of one target read their next step from the same field, so the cost of pathfinding grows with the size
+of the world rather than the number of chasers.
+
+Obstacles are the static hitboxes and the hitboxes of dynamic entities marked as Entity.NAVIGATION_OBSTACLE,
+such as doors. A door is re-registered whenever it opens or closes, which updates the maps and invalidates the fields.
+Other dynamic entities, e.g. chasers blocking each other, are not walked around.
+"""
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from entities.types import EntityType, HitboxType
+from .position import Vector
+
+if TYPE_CHECKING:
+    from entities.base import Entity, Hitbox
+    from .grid import Grid
+
+UNREACHED = -1
+
+
+@dataclass(frozen=True)
+class MoverProfile:
+    """
+    What a NavigationMap knows about the movers it is built for. Maps outlive the entity which made them,
+    so they keep these values instead. Obstacles receive the profile in place of a mover in is_passable_for,
+    the way they receive projectile handles.
+    """
+    cls: type
+    width: int
+    height: int
+    type_mask: int
+    collision_layer: int
+    collision_mask: int
+
+    @property
+    def type(self) -> EntityType:
+        return EntityType(self.type_mask)
+
+    @staticmethod
+    def of(mover: "Entity") -> "MoverProfile":
+        hitbox = mover.main_hitbox
+        return MoverProfile(type(mover), mover.width, mover.height, mover.type_mask,
+                            hitbox.collision_layer, hitbox.collision_mask)
+
+
+class NavigationMap:
+    """
+    Cells blocked for movers of one class and size. Obstacles are grown by half the size of the mover
+    and half a cell, so a mover whose center lies anywhere in a free cell touches no obstacle.
+    Every cell counts the obstacles covering it, so obstacles can be added and removed one by one.
+    """
+
+    def __init__(self, world_size: tuple[int, int], cell_size: int, mover: MoverProfile):
+        self.cell_size = cell_size
+        self.mover = mover
+        self.margin = math.ceil(max(mover.width, mover.height) / 2) + cell_size / 2
+        self.columns = -(-world_size[0] // cell_size)
+        self.rows = -(-world_size[1] // cell_size)
+        # Padded with a ring of blocked cells, so searches need no bounds checks
+        self.stride = self.columns + 2
+        self.counts = np.zeros((self.rows + 2, self.stride), dtype=np.uint16)
+        self.counts[0, :] = self.counts[-1, :] = self.counts[:, 0] = self.counts[:, -1] = 1
+        # id(hitbox) -> (x0, y0, x1, y1), the inclusive range of padded cells blocked by the hitbox
+        self._cells: dict[int, tuple[int, int, int, int]] = {}
+        self._blocked: bytes = None
+        # Incremented whenever an obstacle is added or removed, fields computed for older versions are stale
+        self.version = 0
+
+    def blocks(self, hitbox: "Hitbox") -> bool:
+        mover = self.mover
+        return (hitbox.type == HitboxType.MAIN and bool(hitbox.collision_layer & mover.collision_mask)
+                and bool(hitbox.collision_mask & mover.collision_layer)
+                and not hitbox.owner.is_passable_for(mover))
+
+    def add(self, hitbox: "Hitbox"):
+        if id(hitbox) in self._cells:
+            self.remove(hitbox)
+        if not self.blocks(hitbox):
+            return
+        cells = self._cell_range(hitbox)
+        if cells is None:
+            return
+        self._cells[id(hitbox)] = cells
+        x0, y0, x1, y1 = cells
+        self.counts[y0:y1 + 1, x0:x1 + 1] += 1
+        self._blocked = None
+        self.version += 1
+
+    def remove(self, hitbox: "Hitbox"):
+        cells = self._cells.pop(id(hitbox), None)
+        if cells is None:
+            return
+        x0, y0, x1, y1 = cells
+        self.counts[y0:y1 + 1, x0:x1 + 1] -= 1
+        self._blocked = None
+        self.version += 1
+
+    def update(self, hitbox: "Hitbox"):
+        if id(hitbox) in self._cells:
+            self.add(hitbox)
+
+    @property
+    def blocked(self) -> bytes:
+        """
+        Flattened padded cells, non-zero where blocked
+        """
+        if self._blocked is None:
+            self._blocked = (self.counts > 0).astype(np.uint8).tobytes()
+        return self._blocked
+
+    def cell_of(self, x: float, y: float) -> int:
+        """
+        :return: Index of the padded cell containing the point, clamped to the world
+        """
+        column = min(max(int(x // self.cell_size), 0), self.columns - 1)
+        row = min(max(int(y // self.cell_size), 0), self.rows - 1)
+        return (row + 1) * self.stride + column + 1
+
+    def cell_center(self, cell: int) -> tuple[float, float]:
+        row, column = divmod(cell, self.stride)
+        return (column - 0.5) * self.cell_size, (row - 0.5) * self.cell_size
+
+    def _cell_range(self, hitbox: "Hitbox"):
+        # A cell is blocked if its center lies within the grown obstacle
+        cs, margin = self.cell_size, self.margin
+        x0 = math.ceil((hitbox.x - margin) / cs - 0.5)
+        y0 = math.ceil((hitbox.y - margin) / cs - 0.5)
+        x1 = math.floor((hitbox.x + hitbox.width + margin) / cs - 0.5)
+        y1 = math.floor((hitbox.y + hitbox.height + margin) / cs - 0.5)
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.columns - 1), min(y1, self.rows - 1)
+        if x0 > x1 or y0 > y1:
+            return None
+        return x0 + 1, y0 + 1, x1 + 1, y1 + 1
+
+
+class FlowField:
+    """
+    Distances in steps between neighbouring cells from the cells of a map to a target cell.
+    The breadth-first search runs lazily, one layer at a time, only as far as the chasers asking for directions,
+    so chasers close to their target cost little no matter how large the world is.
+    """
+
+    def __init__(self, nav_map: NavigationMap, target_cell: int):
+        self.map = nav_map
+        self.target_cell = target_cell
+        self.version = nav_map.version
+        self.distances = [UNREACHED] * len(nav_map.blocked)
+        self.distances[target_cell] = 0
+        self._frontier = [target_cell]
+        self._distance = 0
+        # cell -> answer of next_cell, which never changes once the closest neighbour has been reached
+        self._next_cells: dict[int, int] = {}
+
+    def next_cell(self, cell: int) -> int:
+        """
+        :return: The neighbouring cell closest to the target, or the cell itself if no neighbour is closer
+        """
+        next_cell = self._next_cells.get(cell)
+        if next_cell is not None:
+            return next_cell
+
+        blocked = self.map.blocked
+        stride = self.map.stride
+        candidates = [cell, cell + 1, cell - 1, cell + stride, cell - stride]
+        # Diagonal steps only where both cells next to the corner are free, so the mover can't clip the corner
+        for dx, dy in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+            if not blocked[cell + dx] and not blocked[cell + dy * stride]:
+                candidates.append(cell + dx + dy * stride)
+
+        # Cells are reached in order of their distance, the first candidate reached is the closest one
+        distances = self.distances
+        while self._frontier and all(distances[candidate] == UNREACHED for candidate in candidates):
+            self._expand()
+
+        best, best_distance = cell, math.inf
+        for candidate in candidates:
+            distance = distances[candidate]
+            if distance != UNREACHED and distance < best_distance:
+                best, best_distance = candidate, distance
+        self._next_cells[cell] = best
+        return best
+
+    def _expand(self):
+        """
+        Reaches the next layer of cells
+        """
+        blocked = self.map.blocked
+        distances = self.distances
+        offsets = (1, -1, self.map.stride, -self.map.stride)
+        self._distance += 1
+        distance = self._distance
+        frontier = []
+        for cell in self._frontier:
+            for offset in offsets:
+                neighbour = cell + offset
+                if distances[neighbour] == UNREACHED and not blocked[neighbour]:
+                    distances[neighbour] = distance
+                    frontier.append(neighbour)
+        self._frontier = frontier
+
+
+class Navigation:
+    """
+    Keeps navigation maps and flow fields of the grid up to date with its obstacles
+    """
+    # Side of a navigation cell in pixels. Movers faster than half a cell per tick may clip walls.
+    CELL_SIZE = 10
+
+    def __init__(self, grid: "Grid"):
+        self.grid = grid
+        # (mover class, width, height) -> map
+        self.maps: dict[tuple[type, int, int], NavigationMap] = {}
+        # (map key, id(target)) -> field
+        self.fields: dict[tuple[tuple[type, int, int], int], FlowField] = {}
+        self.searches = 0
+
+    def clear(self):
+        self.maps = {}
+        self.fields = {}
+
+    def on_obstacle_added(self, hitbox: "Hitbox"):
+        for nav_map in self.maps.values():
+            nav_map.add(hitbox)
+
+    def on_obstacle_removed(self, hitbox: "Hitbox"):
+        for nav_map in self.maps.values():
+            nav_map.remove(hitbox)
+
+    def on_obstacle_moved(self, hitbox: "Hitbox"):
+        for nav_map in self.maps.values():
+            nav_map.update(hitbox)
+
+    def direction(self, mover: "Entity", target: "Entity") -> Vector:
+        """
+        :return: A unit vector in which the mover should go to reach the target, (0, 0) when it can't get closer
+        """
+        nav_map = self._get_map(mover)
+        mover_x, mover_y = _center(mover)
+        target_x, target_y = _center(target)
+        target_cell = nav_map.cell_of(target_x, target_y)
+
+        key = (type(mover), mover.width, mover.height), id(target)
+        field = self.fields.get(key)
+        if field is None or field.target_cell != target_cell or field.version != nav_map.version:
+            field = self.fields[key] = FlowField(nav_map, target_cell)
+            self.searches += 1
+
+        cell = nav_map.cell_of(mover_x, mover_y)
+        if cell == target_cell:
+            x, y = target_x, target_y
+        else:
+            next_cell = field.next_cell(cell)
+            if next_cell == cell:
+                # Walled off from the target, or outside the mapped world
+                x, y = target_x, target_y
+            else:
+                x, y = nav_map.cell_center(next_cell)
+
+        dx, dy = x - mover_x, y - mover_y
+        length = math.hypot(dx, dy)
+        if length == 0:
+            return Vector(0, 0)
+        return Vector(dx / length, dy / length)
+
+    def _get_map(self, mover: "Entity") -> NavigationMap:
+        key = (type(mover), mover.width, mover.height)
+        nav_map = self.maps.get(key)
+        if nav_map is None:
+            nav_map = self.maps[key] = NavigationMap(self.grid.world_size, self.CELL_SIZE, MoverProfile.of(mover))
+            for hitbox in self.grid.static_index.hitboxes():
+                nav_map.add(hitbox)
+            for entity in self.grid.dynamic_entities:
+                if entity.NAVIGATION_OBSTACLE:
+                    nav_map.add(entity.main_hitbox)
+        return nav_map
+
+
+def _center(entity: "Entity") -> tuple[float, float]:
+    return entity.position.x + entity.width / 2, entity.position.y + entity.height / 2
+
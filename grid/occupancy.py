@@ -0,0 +1,113 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from entities.base import Hitbox
+
+
+class OccupancyMap:
+    """
+    A coarse bitmap of the world telling which cells are covered by static hitboxes.
+    Every cell counts the hitboxes touching it, so hitboxes can be added and removed one by one.
+    Checking whether an area is free takes four lookups into a summed-area table, which is rebuilt lazily
+    after the counts have changed. Cells are marked generously, a free area is certainly free,
+    an occupied one still needs exact tests.
+    """
+
+    def __init__(self, world_size: tuple[int, int], cell_size: int = 10):
+        """
+        :param world_size: Width and height of the mapped area, anything outside of it counts as occupied
+        :param cell_size: Side of a cell in pixels
+        """
+        self.cell_size = cell_size
+        self.columns = -(-world_size[0] // cell_size)
+        self.rows = -(-world_size[1] // cell_size)
+        self.counts = np.zeros((self.rows, self.columns), dtype=np.uint16)
+        # id(hitbox) -> (x0, y0, x1, y1), the inclusive range of cells counting the hitbox
+        self._cells: dict[int, tuple[int, int, int, int]] = {}
+        # Summed-area table of the counts, as an array and as nested lists for fast scalar lookups
+        self._table: np.ndarray = None
+        self._table_rows: list[list[int]] = None
+
+    def __len__(self):
+        return len(self._cells)
+
+    def add(self, hitbox: "Hitbox"):
+        if id(hitbox) in self._cells:
+            self.remove(hitbox)
+        cells = self._cell_range(hitbox.x, hitbox.y, hitbox.width, hitbox.height)
+        self._cells[id(hitbox)] = cells
+        x0, y0, x1, y1 = cells
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.columns - 1), min(y1, self.rows - 1)
+        if x0 <= x1 and y0 <= y1:
+            self.counts[y0:y1 + 1, x0:x1 + 1] += 1
+            self._table = self._table_rows = None
+
+    def remove(self, hitbox: "Hitbox"):
+        cells = self._cells.pop(id(hitbox), None)
+        if cells is None:
+            return
+        x0, y0, x1, y1 = cells
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.columns - 1), min(y1, self.rows - 1)
+        if x0 <= x1 and y0 <= y1:
+            self.counts[y0:y1 + 1, x0:x1 + 1] -= 1
+            self._table = self._table_rows = None
+
+    def update(self, hitbox: "Hitbox"):
+        """
+        Moves a hitbox which has been moved or resized in place to its new cells
+        """
+        if id(hitbox) in self._cells:
+            self.add(hitbox)
+
+    def clear(self):
+        self.counts[:] = 0
+        self._cells = {}
+        self._table = self._table_rows = None
+
+    def is_free(self, rect) -> bool:
+        """
+        :return: True if no static hitbox can collide with the rectangle, False if exact tests are needed
+        """
+        x0, y0, x1, y1 = self._cell_range(rect.x, rect.y, rect.width, rect.height)
+        if x0 < 0 or y0 < 0 or x1 >= self.columns or y1 >= self.rows:
+            return False
+        table = self._table_rows
+        if table is None:
+            self._build_table()
+            table = self._table_rows
+        return table[y1 + 1][x1 + 1] - table[y0][x1 + 1] - table[y1 + 1][x0] + table[y0][x0] == 0
+
+    def free_mask(self, rects: np.ndarray) -> np.ndarray:
+        """
+        Vectorized is_free
+        :param rects: An (n, 4) array of x, y, width, height
+        :return: An (n,) boolean array
+        """
+        cs = self.cell_size
+        x0 = np.floor_divide(rects[:, 0], cs).astype(np.int64)
+        y0 = np.floor_divide(rects[:, 1], cs).astype(np.int64)
+        x1 = np.floor_divide(rects[:, 0] + rects[:, 2], cs).astype(np.int64)
+        y1 = np.floor_divide(rects[:, 1] + rects[:, 3], cs).astype(np.int64)
+        inside = (x0 >= 0) & (y0 >= 0) & (x1 < self.columns) & (y1 < self.rows)
+        if self._table is None:
+            self._build_table()
+        x0, x1 = np.clip(x0, 0, self.columns - 1), np.clip(x1, 0, self.columns - 1)
+        y0, y1 = np.clip(y0, 0, self.rows - 1), np.clip(y1, 0, self.rows - 1)
+        table = self._table
+        total = table[y1 + 1, x1 + 1] - table[y0, x1 + 1] - table[y1 + 1, x0] + table[y0, x0]
+        return inside & (total == 0)
+
+    def _build_table(self):
+        table = np.zeros((self.rows + 1, self.columns + 1), dtype=np.int64)
+        table[1:, 1:] = self.counts.cumsum(axis=0, dtype=np.int64).cumsum(axis=1)
+        self._table = table
+        self._table_rows = table.tolist()
+
+    def _cell_range(self, x, y, width, height) -> tuple[int, int, int, int]:
+        # The far edge is included, so rectangles sharing only an edge share a cell too
+        cs = self.cell_size
+        return int(x // cs), int(y // cs), int((x + width) // cs), int((y + height) // cs)
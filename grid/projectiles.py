@@ -0,0 +1,203 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pygame
+
+from entities.types import EntityType, HitboxType, CollisionLayer, TypeMask
+from .position import Position, Vector
+from .spatial_hash import overlap_pairs, collision_filters
+
+if TYPE_CHECKING:
+    from entities.base import Entity
+    from .grid import Grid
+
+
+class Projectile:
+    """
+    A handle to a single slot of a ProjectilePool. Projectiles are not entities, the handle is what entity
+    collision callbacks receive in place of one. Handles are created once per slot and reused.
+    """
+    type = EntityType.DEFAULT
+    type_mask = TypeMask.DEFAULT
+    COLLISION_LAYER = CollisionLayer.PROJECTILE
+    COLLISION_MASK = CollisionLayer.ALL
+    WIDTH = 5
+    HEIGHT = 5
+    COLOR = "white"
+
+    def __init__(self, pool: "ProjectilePool", slot: int):
+        self.pool = pool
+        self.slot = slot
+        self.source: "Entity" = None
+
+    @property
+    def position(self) -> Position:
+        x, y = self.pool.positions[self.slot].tolist()
+        return Position(x, y)
+
+    @property
+    def alive(self) -> bool:
+        return bool(self.pool.alive[self.slot])
+
+    def killed_by(self, killer: str):
+        self.pool.release(self.slot)
+
+    def is_passable_for(self, entity: "Entity"):
+        return True
+
+    def on_collision_with(self, entity: "Entity"):
+        pass
+
+
+class ProjectilePool:
+    """
+    Stores all projectiles of one type in contiguous arrays. Slots are recycled when a projectile hits something
+    or leaves the world, so memory stays bounded by the peak number of projectiles alive at once.
+    """
+
+    def __init__(self, projectile_type: type[Projectile], capacity: int = 32):
+        self.projectile_type = projectile_type
+        self.image = pygame.Surface((projectile_type.WIDTH, projectile_type.HEIGHT))
+        self.image.fill(pygame.color.Color(projectile_type.COLOR))
+
+        self.positions = np.zeros((0, 2), dtype=np.float64)
+        self.velocities = np.zeros((0, 2), dtype=np.float64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.handles: list[Projectile] = []
+        self._free: list[int] = []
+        self._grow(capacity)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    @property
+    def capacity(self):
+        return len(self.handles)
+
+    def _grow(self, capacity: int):
+        old_capacity = self.capacity
+        self.positions = np.resize(self.positions, (capacity, 2))
+        self.velocities = np.resize(self.velocities, (capacity, 2))
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - old_capacity, dtype=bool)])
+        self.handles.extend(self.projectile_type(self, slot) for slot in range(old_capacity, capacity))
+        self._free.extend(range(capacity - 1, old_capacity - 1, -1))
+
+    def spawn(self, position: Position, velocity: Vector, source: "Entity" = None) -> Projectile:
+        if not self._free:
+            self._grow(2 * self.capacity)
+        slot = self._free.pop()
+        self.positions[slot] = (position.x, position.y)
+        self.velocities[slot] = (velocity.x, velocity.y)
+        self.alive[slot] = True
+        handle = self.handles[slot]
+        handle.source = source
+        return handle
+
+    def release(self, slot: int):
+        if not self.alive[slot]:
+            return
+        self.alive[slot] = False
+        self.handles[slot].source = None
+        self._free.append(slot)
+
+    def clear(self):
+        for slot in np.flatnonzero(self.alive).tolist():
+            self.release(slot)
+
+    def update(self, grid: "Grid"):
+        """
+        Moves all projectiles by their velocities. Projectiles leaving the world are recycled, the ones
+        touching a hitbox go through the same callbacks a moving entity would trigger.
+        """
+        slots = np.flatnonzero(self.alive)
+        if len(slots) == 0:
+            return
+
+        destinations = self.positions[slots] + self.velocities[slots]
+        size = (self.projectile_type.WIDTH, self.projectile_type.HEIGHT)
+        rects = np.empty((len(slots), 4), dtype=np.int64)
+        rects[:, :2] = np.rint(destinations)
+        rects[:, 2:] = size
+
+        world_width, world_height = grid.world_size
+        outside = ((rects[:, 0] + rects[:, 2] <= 0) | (rects[:, 0] >= world_width)
+                   | (rects[:, 1] + rects[:, 3] <= 0) | (rects[:, 1] >= world_height))
+        for slot in slots[outside].tolist():
+            self.release(slot)
+
+        inside = np.flatnonzero(~outside)
+        # Static hitboxes are only looked for around projectiles the occupancy map can't place in free space
+        near_static = inside
+        if grid.occupancy is not None and len(inside):
+            near_static = inside[~grid.occupancy.free_mask(rects[inside])]
+        static_i, static_j = grid.static_index.overlap_pairs(rects[near_static])
+        static_i = near_static[static_i]
+        # Only dynamic hitboxes in the cells the projectiles cover are tested
+        dynamic_entries = grid.dynamic_index.near(rects[inside])
+        dynamic_rects = np.array([(hb.x, hb.y, hb.width, hb.height) for _, hb in dynamic_entries],
+                                 dtype=np.int64).reshape(-1, 4)
+        dynamic_i, dynamic_j = overlap_pairs(rects[inside], dynamic_rects, grid.dynamic_index.cell_size)
+        dynamic_i = inside[dynamic_i]
+
+        # Hitboxes a projectile can't collide with are dropped before any callback runs
+        layer = int(self.projectile_type.COLLISION_LAYER)
+        mask = int(self.projectile_type.COLLISION_MASK)
+        static_compatible = ((grid.static_index.layers[static_j] & mask) != 0) & ((grid.static_index.masks[static_j] & layer) != 0)
+        dynamic_layers, dynamic_masks = collision_filters(dynamic_entries)
+        dynamic_compatible = ((dynamic_layers[dynamic_j] & mask) != 0) & ((dynamic_masks[dynamic_j] & layer) != 0)
+        grid.pairs_pruned += int(np.count_nonzero(~static_compatible) + np.count_nonzero(~dynamic_compatible))
+        static_i, static_j = static_i[static_compatible], static_j[static_compatible]
+        dynamic_i, dynamic_j = dynamic_i[dynamic_compatible], dynamic_j[dynamic_compatible]
+        grid.pairs_checked += len(static_i) + len(dynamic_i)
+
+        touching = np.zeros(len(slots), dtype=bool)
+        touching[static_i] = True
+        touching[dynamic_i] = True
+
+        free_flying = ~outside & ~touching
+        self.positions[slots[free_flying]] = destinations[free_flying]
+
+        hits_of: dict[int, list] = {}
+        static_entries = grid.static_index.entries
+        for i, j in zip(static_i.tolist(), static_j.tolist()):
+            hits_of.setdefault(i, []).append(static_entries[j])
+        for i, j in zip(dynamic_i.tolist(), dynamic_j.tolist()):
+            hits_of.setdefault(i, []).append(dynamic_entries[j])
+        generation = grid.generation
+        for i in np.flatnonzero(touching).tolist():
+            hits = hits_of[i]
+            hits.sort(key=lambda entry: entry[0])
+            slot = int(slots[i])
+            if self._collide(grid, self.handles[slot], [hitbox for _, hitbox in hits]):
+                self.positions[slot] = destinations[i]
+            if grid.generation != generation:
+                return
+
+    def _collide(self, grid: "Grid", projectile: Projectile, hitboxes) -> bool:
+        """
+        :return: Whether the projectile survived and may move on
+        """
+        generation = grid.generation
+        for target_hb in hitboxes:
+            if not grid.is_registered(target_hb.owner):
+                continue
+            target_hb.on_collision_with(projectile)
+            if not projectile.alive or grid.generation != generation:
+                return False
+            if target_hb.type == HitboxType.MAIN:
+                projectile.on_collision_with(target_hb.owner)
+                if grid.generation != generation:
+                    return False
+                if not target_hb.owner.is_passable_for(projectile):
+                    self.release(projectile.slot)
+                    return False
+        return projectile.alive
+
+    def draw(self, surface: pygame.Surface) -> list[pygame.Rect]:
+        """
+        Draws all live projectiles with a single batched blit
+        :return: Areas of the surface drawn over
+        """
+        image = self.image
+        positions = np.rint(self.positions[self.alive]).tolist()
+        return surface.blits([(image, position) for position in positions])
@@ -0,0 +1,258 @@
+"""
+Spatial queries over the entities of a grid, answered from its collision indexes instead of scanning all entities.
+Entities are found by their main hitboxes.
+"""
+import math
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import pygame
+
+from entities.types import EntityType, HitboxType
+from .position import Position, Vector
+
+if TYPE_CHECKING:
+    from entities.base import Entity, Hitbox
+    from .grid import Grid
+
+# An EntityType which found entities must have, or a class they must be instances of
+TypeFilter = EntityType | type | None
+
+
+@dataclass
+class RaycastHit:
+    entity: "Entity"
+    hitbox: "Hitbox"
+    # Distance from the origin of the ray to the point where it enters the hitbox
+    distance: float
+    point: Position
+
+
+def matches(entity: "Entity", type_filter: TypeFilter) -> bool:
+    if type_filter is None:
+        return True
+    if isinstance(type_filter, type):
+        return isinstance(entity, type_filter)
+    mask = type_filter.value
+    return entity.type_mask & mask == mask
+
+
+def query_rect(grid: "Grid", rect, type_filter: TypeFilter = None) -> list["Entity"]:
+    """
+    :param rect: A pygame.Rect or an (x, y, width, height) tuple
+    :return: Entities overlapping the rectangle, in registration order
+    """
+    if not isinstance(rect, pygame.Rect):
+        rect = pygame.Rect(rect)
+    hits = _query_indexes(grid, rect)
+    return [hitbox.owner for _, hitbox in hits
+            if hitbox.type == HitboxType.MAIN and matches(hitbox.owner, type_filter)]
+
+
+def query_radius(grid: "Grid", center: Position, radius: float, type_filter: TypeFilter = None) -> list["Entity"]:
+    """
+    :return: Entities with any part closer to the center than the radius, in registration order
+    """
+    x, y = center.x, center.y
+    rect = _bounding_rect(x, y, radius)
+    return [hitbox.owner for _, hitbox in _query_indexes(grid, rect)
+            if hitbox.type == HitboxType.MAIN and _distance_to_rect(x, y, hitbox) <= radius
+            and matches(hitbox.owner, type_filter)]
+
+
+def nearest(grid: "Grid", position: Position, k: int = 1, type_filter: TypeFilter = None,
+            max_distance: float = math.inf, exclude: Iterable["Entity"] = ()) -> list["Entity"]:
+    """
+    Finds the entities closest to a position, measured to the nearest point of each entity.
+    The searched square grows until it holds enough entities, so far away entities are never looked at.
+    :param k: Number of entities to find
+    :param max_distance: Entities further away are not returned
+    :param exclude: Entities to skip, e.g. the one asking
+    :return: Up to k entities, closest first
+    """
+    x, y = position.x, position.y
+    excluded = {id(entity) for entity in exclude}
+    # Beyond this every entity inside the world has been seen, the rest are found by a scan
+    limit = math.hypot(*grid.world_size) + abs(x) + abs(y)
+    radius = float(grid.dynamic_index.cell_size)
+    while True:
+        radius = min(radius, max_distance)
+        found = []
+        for order, hitbox in _query_indexes(grid, _bounding_rect(x, y, radius)):
+            entity = hitbox.owner
+            if hitbox.type != HitboxType.MAIN or id(entity) in excluded or not matches(entity, type_filter):
+                continue
+            distance = _distance_to_rect(x, y, hitbox)
+            if distance <= radius:
+                found.append((distance, order, entity))
+        if len(found) >= k or radius >= max_distance:
+            break
+        if radius >= limit:
+            if isinstance(type_filter, EntityType):
+                candidates = grid.entities_of_type(type_filter)
+            else:
+                candidates = grid.entities
+            found = [(distance, grid.get_entity_order(entity), entity) for entity in candidates
+                     if id(entity) not in excluded and matches(entity, type_filter)
+                     and (distance := _distance_to_rect(x, y, entity.main_hitbox)) <= max_distance]
+            break
+        radius *= 2
+
+    found.sort(key=lambda item: item[:2])
+    return [entity for _, _, entity in found[:k]]
+
+
+def raycast(grid: "Grid", origin: Position, direction: Vector, max_distance: float,
+            type_filter: TypeFilter = None, ignore: Iterable["Entity"] = (),
+            include_dynamic: bool = True) -> RaycastHit | None:
+    """
+    Finds the first entity a ray runs into. Only the index cells along the ray are visited.
+    :param direction: Direction of the ray, of any length
+    :param max_distance: Length of the ray, must be finite. Only the part of the ray inside the world is searched.
+    :param ignore: Entities the ray passes through, e.g. the one casting it
+    :param include_dynamic: False to only look for static entities
+    :return: The closest hit, None if the ray hits nothing
+    """
+    ignored = {id(entity) for entity in ignore}
+    return _raycast(grid, origin, direction, max_distance, include_dynamic,
+                    lambda entity: id(entity) not in ignored and matches(entity, type_filter))
+
+
+def has_line_of_sight(grid: "Grid", source: "Entity", target: "Entity") -> bool:
+    """
+    :return: Whether no static entity impassable for the source stands between the centers of both entities
+    """
+    sx, sy = _center(source)
+    tx, ty = _center(target)
+    distance = math.hypot(tx - sx, ty - sy)
+    if distance == 0:
+        return True
+    hit = _raycast(grid, Position(sx, sy), Vector(tx - sx, ty - sy), distance, False,
+                   lambda entity: entity is not source and entity is not target
+                   and not entity.is_passable_for(source))
+    return hit is None
+
+
+def _query_indexes(grid: "Grid", rect) -> list[tuple[tuple[int, int], "Hitbox"]]:
+    static_hits = grid.static_index.query(rect)
+    dynamic_hits = grid.dynamic_index.query(rect)
+    if static_hits and dynamic_hits:
+        hits = static_hits + dynamic_hits
+        hits.sort(key=lambda entry: entry[0])
+        return hits
+    return static_hits or dynamic_hits
+
+
+def _raycast(grid: "Grid", origin: Position, direction: Vector, max_distance: float, include_dynamic: bool,
+             accept: Callable[["Entity"], bool]) -> RaycastHit | None:
+    if not math.isfinite(max_distance):
+        raise ValueError(f"Rays must have a finite length, got {max_distance}")
+    length = math.hypot(direction.x, direction.y)
+    if length == 0 or max_distance < 0:
+        return None
+    ox, oy = origin.x, origin.y
+    dx, dy = direction.x / length, direction.y / length
+    # The walk over the index cells ends where the ray leaves the world
+    width, height = grid.world_size
+    span = _ray_span(ox, oy, dx, dy, 0, 0, width, height)
+    if span is None:
+        return None
+    max_distance = min(max_distance, span[1])
+
+    indexes = (grid.static_index, grid.dynamic_index) if include_dynamic else (grid.static_index,)
+    best_distance, best_order, best_hitbox = math.inf, None, None
+    for index in indexes:
+        distance, order, hitbox = _raycast_index(index, ox, oy, dx, dy, min(max_distance, best_distance), accept)
+        if hitbox is not None and (best_hitbox is None or (distance, order) < (best_distance, best_order)):
+            best_distance, best_order, best_hitbox = distance, order, hitbox
+    if best_hitbox is None:
+        return None
+    return RaycastHit(best_hitbox.owner, best_hitbox, best_distance,
+                      Position(ox + dx * best_distance, oy + dy * best_distance))
+
+
+def _raycast_index(index, ox: float, oy: float, dx: float, dy: float, max_distance: float,
+                   accept: Callable[["Entity"], bool]) -> tuple[float, tuple[int, int], "Hitbox"]:
+    """
+    Walks the cells of an index along a ray, from the cell of the origin on, until no closer hit is possible
+    :return: Distance, order and hitbox of the closest hit, (inf, None, None) if there is none
+    """
+    cs = index.cell_size
+    cx, cy = int(ox // cs), int(oy // cs)
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    # Distances along the ray to the next vertical and horizontal cell border, and between two such borders
+    next_x = ((cx + (dx > 0)) * cs - ox) / dx if dx else math.inf
+    next_y = ((cy + (dy > 0)) * cs - oy) / dy if dy else math.inf
+    delta_x = cs / abs(dx) if dx else math.inf
+    delta_y = cs / abs(dy) if dy else math.inf
+
+    best_distance, best_order, best_hitbox = math.inf, None, None
+    tested = set()
+    entered = 0.0
+    while entered <= max_distance and entered <= best_distance:
+        for order, hitbox in index.cell_entries((cx, cy)):
+            if id(hitbox) in tested:
+                continue
+            tested.add(id(hitbox))
+            if hitbox.type != HitboxType.MAIN or not accept(hitbox.owner):
+                continue
+            distance = _ray_enters_rect(ox, oy, dx, dy, hitbox)
+            if distance is None or distance > max_distance:
+                continue
+            if distance < best_distance or (distance == best_distance and order < best_order):
+                best_distance, best_order, best_hitbox = distance, order, hitbox
+
+        if next_x < next_y:
+            entered = next_x
+            next_x += delta_x
+            cx += step_x
+        else:
+            entered = next_y
+            next_y += delta_y
+            cy += step_y
+    return best_distance, best_order, best_hitbox
+
+
+def _ray_enters_rect(ox: float, oy: float, dx: float, dy: float, rect) -> float | None:
+    """
+    :return: Distance along a ray of unit direction to where it enters the rectangle, 0 if it starts inside
+    """
+    span = _ray_span(ox, oy, dx, dy, rect.x, rect.y, rect.x + rect.width, rect.y + rect.height)
+    return None if span is None else span[0]
+
+
+def _ray_span(ox: float, oy: float, dx: float, dy: float, left: float, top: float, right: float,
+              bottom: float) -> tuple[float, float] | None:
+    """
+    :return: Distances along a ray of unit direction to where it enters and leaves the rectangle,
+        None if it misses it
+    """
+    near, far = 0.0, math.inf
+    if dx:
+        t1, t2 = (left - ox) / dx, (right - ox) / dx
+        near, far = max(near, min(t1, t2)), min(far, max(t1, t2))
+    elif not left <= ox <= right:
+        return None
+    if dy:
+        t1, t2 = (top - oy) / dy, (bottom - oy) / dy
+        near, far = max(near, min(t1, t2)), min(far, max(t1, t2))
+    elif not top <= oy <= bottom:
+        return None
+    return (near, far) if near <= far else None
+
+
+def _bounding_rect(x: float, y: float, radius: float) -> pygame.Rect:
+    left, top = math.floor(x - radius), math.floor(y - radius)
+    return pygame.Rect(left, top, math.ceil(x + radius) - left + 1, math.ceil(y + radius) - top + 1)
+
+
+def _distance_to_rect(x: float, y: float, rect) -> float:
+    dx = max(rect.x - x, 0, x - (rect.x + rect.width))
+    dy = max(rect.y - y, 0, y - (rect.y + rect.height))
+    return math.hypot(dx, dy)
+
+
+def _center(entity: "Entity") -> tuple[float, float]:
+    return entity.position.x + entity.width / 2, entity.position.y + entity.height / 2
@@ -0,0 +1,197 @@
+import math
+from bisect import bisect_right, insort
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from entities.types import EntityType, TickData
+
+if TYPE_CHECKING:
+    from entities.base import DynamicEntity
+    from .grid import Grid
+
+
+class _Phase:
+    """
+    Tick actions of one priority in the order they have been added, with holes left by removed entities
+    """
+
+    def __init__(self):
+        self.actions: list[tuple["DynamicEntity", Callable] | None] = []
+        # id(entity) -> indices of its actions
+        self.index: dict[int, list[int]] = {}
+        self.holes = 0
+
+    def add(self, entity: "DynamicEntity", action: Callable):
+        self.index.setdefault(id(entity), []).append(len(self.actions))
+        self.actions.append((entity, action))
+
+    def remove(self, entity: "DynamicEntity"):
+        for i in self.index.pop(id(entity), ()):
+            self.actions[i] = None
+            self.holes += 1
+
+    def compact(self):
+        if 2 * self.holes < len(self.actions):
+            return
+        self.actions = [entry for entry in self.actions if entry is not None]
+        self.index = {}
+        for i, (entity, _) in enumerate(self.actions):
+            self.index.setdefault(id(entity), []).append(i)
+        self.holes = 0
+
+
+class TickScheduler:
+    """
+    Runs the tick actions of all dynamic entities of the grid, grouped into phases by their priority.
+    Each phase runs across all entities before the next one starts, so e.g. every entity has steered before
+    any has moved. Within a phase actions run in the order they have been added.
+    Sleeping entities are skipped until they are woken.
+
+    Entities of classes with UPDATE_INTERVALS are throttled by their distance from the player:
+    they only run every few ticks, staggered by their registration order, and their actions get
+    the number of ticks since their last update as TickData.delta.
+    """
+
+    def __init__(self, grid: "Grid"):
+        self.grid = grid
+        self.phases: dict[int, _Phase] = {}
+        # Sorted priorities of all phases
+        self.priorities: list[int] = []
+        self.sleeping: set[int] = set()
+        # id(entity) -> entity, for entities throttled by distance
+        self.throttled: dict[int, "DynamicEntity"] = {}
+        # id(entity) -> clock of the last tick a throttled entity has run in
+        self._last_update: dict[int, int] = {}
+        # The entity distances are measured from, usually the player
+        self._focus: "DynamicEntity" = None
+        # Tick actions run and skipped by throttling in the last tick, and in all ticks so far
+        self.actions_run = 0
+        self.actions_skipped = 0
+        self.total_actions_run = 0
+        self.total_actions_skipped = 0
+
+    def clear(self):
+        self.phases = {}
+        self.priorities = []
+        self.sleeping = set()
+        self.throttled = {}
+        self._last_update = {}
+        self._focus = None
+
+    def add_entity(self, entity: "DynamicEntity"):
+        """
+        Schedules all actions of a newly registered entity
+        """
+        for gta in getattr(entity, "game_tick_events", ()):
+            self.add_action(entity, gta.action, gta.priority)
+        if getattr(entity, "sleeping", False):
+            self.sleeping.add(id(entity))
+        if type(entity).UPDATE_INTERVALS:
+            self.throttled[id(entity)] = entity
+
+    def add_action(self, entity: "DynamicEntity", action: Callable, priority: int):
+        phase = self.phases.get(priority)
+        if phase is None:
+            phase = self.phases[priority] = _Phase()
+            insort(self.priorities, priority)
+        phase.add(entity, action)
+
+    def remove_entity(self, entity: "DynamicEntity"):
+        for phase in self.phases.values():
+            phase.remove(entity)
+        self.sleeping.discard(id(entity))
+        self.throttled.pop(id(entity), None)
+        self._last_update.pop(id(entity), None)
+
+    def sleep(self, entity: "DynamicEntity"):
+        self.sleeping.add(id(entity))
+
+    def wake(self, entity: "DynamicEntity"):
+        self.sleeping.discard(id(entity))
+
+    def run(self, tick_data: TickData):
+        """
+        Runs all phases in order of their priority. Moves queued for batching are resolved at the end of each phase.
+        Actions added during a phase which has already run are first run in the next tick.
+        """
+        grid = self.grid
+        generation = grid.generation
+        for phase in self.phases.values():
+            phase.compact()
+        skipped, scaled = self._throttle(tick_data)
+        sleeping = self.sleeping
+        run = 0
+
+        priority = None
+        while True:
+            i = 0 if priority is None else bisect_right(self.priorities, priority)
+            if i == len(self.priorities):
+                break
+            priority = self.priorities[i]
+            actions = self.phases[priority].actions
+            # Indexed, so actions of entities registered during the phase are run as well
+            j = 0
+            while j < len(actions):
+                entry = actions[j]
+                j += 1
+                if entry is None or id(entry[0]) in sleeping:
+                    continue
+                if skipped and id(entry[0]) in skipped:
+                    self.actions_skipped += 1
+                    continue
+                run += 1
+                entry[1](tick_data=scaled.get(id(entry[0]), tick_data) if scaled else tick_data)
+                if grid.generation != generation:
+                    break
+            if grid.generation != generation:
+                break
+            grid.resolve_pending_moves()
+            if grid.generation != generation:
+                break
+        self.actions_run = run
+        self.total_actions_run += run
+        self.total_actions_skipped += self.actions_skipped
+
+    def update_interval(self, entity: "DynamicEntity", focus: "DynamicEntity") -> int:
+        """
+        :return: Every how many ticks the entity runs at its distance from the focus
+        """
+        distance = math.hypot(entity.position.x + entity.width / 2 - focus.position.x - focus.width / 2,
+                              entity.position.y + entity.height / 2 - focus.position.y - focus.height / 2)
+        for max_distance, interval in type(entity).UPDATE_INTERVALS:
+            if distance <= max_distance:
+                return interval
+        return 1
+
+    def _throttle(self, tick_data: TickData) -> tuple[set[int], dict[int, TickData]]:
+        """
+        :return: Ids of throttled entities skipped in this tick, and the tick data of those running late
+        """
+        self.actions_skipped = 0
+        focus = self._get_focus() if self.throttled else None
+        if focus is None:
+            self._last_update = {}
+            return set(), {}
+        now = self.grid.timers.now
+        skipped = set()
+        scaled = {}
+        for key, entity in self.throttled.items():
+            if key in self.sleeping:
+                # Time spent asleep is not caught up on
+                self._last_update.pop(key, None)
+                continue
+            interval = self.update_interval(entity, focus)
+            last = self._last_update.get(key, now - 1)
+            if interval > 1 and (now + self.grid.get_entity_order(entity)) % interval:
+                skipped.add(key)
+                continue
+            self._last_update[key] = now
+            if now - last > 1:
+                scaled[key] = TickData(tick_data.tick, tick_data.pp_input, now - last)
+        return skipped, scaled
+
+    def _get_focus(self) -> "DynamicEntity":
+        if self._focus is None or not self.grid.is_registered(self._focus):
+            players = self.grid.entities_of_type(EntityType.PLAYER)
+            self._focus = players[0] if players else None
+        return self._focus
@@ -0,0 +1,73 @@
+import copy
+from typing import TYPE_CHECKING
+
+from .position import I2D
+
+if TYPE_CHECKING:
+    from entities.base import Entity
+    from .grid import Grid
+
+
+class _EntityState:
+    """
+    Everything needed to put an entity back the way it was. Mutable containers and positions are copied,
+    other values, such as surfaces and references to other entities, are shared.
+    """
+
+    def __init__(self, entity: "Entity", order: int):
+        self.entity = entity
+        self.order = order
+        self.attributes = {name: _copy_value(value) for name, value in entity.__dict__.items()}
+        self.hitboxes = [(hitbox, hitbox.fx, hitbox.fy, hitbox.width, hitbox.height)
+                         for hitbox in entity.get_hitboxes()]
+        self.sprite_image = entity.sprite.image
+        self.sprite_rect = tuple(entity.sprite.rect)
+
+    def restore(self):
+        entity = self.entity
+        entity.__dict__.clear()
+        entity.__dict__.update({name: _copy_value(value) for name, value in self.attributes.items()})
+        for hitbox, fx, fy, width, height in self.hitboxes:
+            hitbox.reposition(fx, fy, width, height)
+        entity.sprite.image = self.sprite_image
+        entity.sprite.rect.update(self.sprite_rect)
+
+
+class WorldSnapshot:
+    """
+    The state of all entities of the grid at one point in time, usually right after a level has been loaded.
+    Restoring it resets the entities in place instead of constructing them again.
+    """
+
+    def __init__(self, grid: "Grid"):
+        from hacking.hackable_method import HackableMethod
+
+        self.entities = [_EntityState(entity, grid.get_entity_order(entity)) for entity in grid.entities]
+        self.entity_ids = {id(state.entity) for state in self.entities}
+        self.static_index = grid.static_index.save_state()
+        self.hacked_methods = {class_name: dict(methods) for class_name, methods in HackableMethod.meth_info.items()}
+        self.applied_code = {class_name: list(code) for class_name, code in HackableMethod.applied_code.items()}
+
+    def restore(self, grid: "Grid"):
+        """
+        Puts the entities back into an emptied grid
+        """
+        from hacking.hackable_method import HackableMethod
+
+        for state in self.entities:
+            state.restore()
+            grid.register_entity(state.entity, order=state.order)
+            grid.sprites.add(state.entity.sprite)
+        grid.static_index.restore_state(self.static_index)
+
+        HackableMethod.meth_info.clear()
+        HackableMethod.meth_info.update({class_name: dict(methods)
+                                         for class_name, methods in self.hacked_methods.items()})
+        HackableMethod.applied_code.clear()
+        HackableMethod.applied_code.update({class_name: list(code) for class_name, code in self.applied_code.items()})
+
+
+def _copy_value(value):
+    if isinstance(value, (list, dict, set, I2D)):
+        return copy.copy(value)
+    return value
@@ -0,0 +1,451 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from entities.base import Hitbox
+
+
+class SpatialHash:
+    """
+    A uniform grid which buckets hitboxes by the cells they overlap.
+    Queries only look at hitboxes sharing a cell with the queried rectangle.
+    """
+    DEFAULT_CELL_SIZE = 64
+
+    def __init__(self, cell_size: int = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], dict[int, "Hitbox"]] = {}
+        # id(hitbox) -> (hitbox, cell range, order key, slot)
+        self._entries: dict[int, tuple["Hitbox", tuple[int, int, int, int], tuple[int, int], int]] = {}
+        self._clear_slots()
+
+        # Incremented whenever a hitbox is added, moved or removed, so precomputed results can tell they are stale
+        self.version = 0
+
+        self.queries = 0
+        self.candidates_tested = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, hitbox: "Hitbox"):
+        return id(hitbox) in self._entries
+
+    def _clear_slots(self):
+        # Every hitbox keeps a slot in the arrays below while it's indexed, so batches of moves can be tested
+        # against all of them without touching the hitboxes. Free slots hold empty rectangles, which overlap nothing.
+        self.slot_entries: list[tuple[tuple[int, int], "Hitbox"] | None] = []
+        self.rects = np.zeros((0, 4), dtype=np.float64)
+        self.layers = np.zeros(0, dtype=np.int64)
+        self.masks = np.zeros(0, dtype=np.int64)
+        self.owner_ids = np.zeros(0, dtype=np.int64)
+        self._free_slots: list[int] = []
+
+    def slots(self, hitboxes) -> np.ndarray:
+        """
+        :return: The slots of the given hitboxes, -1 for unknown ones
+        """
+        entries = self._entries
+        return np.array([-1 if entry is None else entry[3] for entry in map(entries.get, map(id, hitboxes))],
+                        dtype=np.int64)
+
+    def _take_slot(self) -> int:
+        if not self._free_slots:
+            size = len(self.slot_entries)
+            grown = max(size * 2, 16)
+            self.slot_entries.extend([None] * (grown - size))
+            self.rects = np.concatenate((self.rects, np.zeros((grown - size, 4), dtype=np.float64)))
+            self.layers, self.masks, self.owner_ids = (
+                np.concatenate((array, np.zeros(grown - size, dtype=np.int64)))
+                for array in (self.layers, self.masks, self.owner_ids))
+            self._free_slots = list(range(grown - 1, size - 1, -1))
+        return self._free_slots.pop()
+
+    def _cell_range(self, rect) -> tuple[int, int, int, int]:
+        cs = self.cell_size
+        return (rect.x // cs, rect.y // cs,
+                (rect.x + max(rect.width - 1, 0)) // cs, (rect.y + max(rect.height - 1, 0)) // cs)
+
+    def _add_to_cells(self, hitbox: "Hitbox", cell_range):
+        x0, y0, x1, y1 = cell_range
+        key = id(hitbox)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self._cells.get((cx, cy))
+                if bucket is None:
+                    bucket = self._cells[(cx, cy)] = {}
+                bucket[key] = hitbox
+
+    def _remove_from_cells(self, hitbox: "Hitbox", cell_range):
+        x0, y0, x1, y1 = cell_range
+        key = id(hitbox)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self._cells[(cx, cy)]
+                del bucket[key]
+                if not bucket:
+                    del self._cells[(cx, cy)]
+
+    def insert(self, hitbox: "Hitbox", order: tuple[int, int]):
+        """
+        Adds a hitbox to the index
+        :param hitbox: The hitbox
+        :param order: Sort key used to return query results in a stable order
+        """
+        if id(hitbox) in self._entries:
+            self.remove(hitbox)
+        self.version += 1
+        cell_range = self._cell_range(hitbox)
+        slot = self._take_slot()
+        self._entries[id(hitbox)] = (hitbox, cell_range, order, slot)
+        self._add_to_cells(hitbox, cell_range)
+        self.slot_entries[slot] = (order, hitbox)
+        self.rects[slot] = (hitbox.x, hitbox.y, hitbox.width, hitbox.height)
+        self.layers[slot] = hitbox.collision_layer
+        self.masks[slot] = hitbox.collision_mask
+        self.owner_ids[slot] = id(hitbox.owner)
+
+    def update(self, hitbox: "Hitbox"):
+        """
+        Moves a hitbox to the cells matching its current rectangle. Does nothing for unknown hitboxes.
+        """
+        entry = self._entries.get(id(hitbox))
+        if entry is None:
+            return
+        self.version += 1
+        _, old_range, order, slot = entry
+        self.rects[slot] = (hitbox.x, hitbox.y, hitbox.width, hitbox.height)
+        new_range = self._cell_range(hitbox)
+        if new_range == old_range:
+            return
+        self._remove_from_cells(hitbox, old_range)
+        self._add_to_cells(hitbox, new_range)
+        self._entries[id(hitbox)] = (hitbox, new_range, order, slot)
+
+    def remove(self, hitbox: "Hitbox"):
+        entry = self._entries.pop(id(hitbox), None)
+        if entry is not None:
+            self.version += 1
+            self._remove_from_cells(hitbox, entry[1])
+            slot = entry[3]
+            self.slot_entries[slot] = None
+            self.rects[slot] = 0
+            self.owner_ids[slot] = 0
+            self._free_slots.append(slot)
+
+    def clear(self):
+        self._cells = {}
+        self._entries = {}
+        self._clear_slots()
+        self.version += 1
+
+    def cell_entries(self, cell: tuple[int, int]) -> list[tuple[tuple[int, int], "Hitbox"]]:
+        """
+        :return: (order, hitbox) pairs of the hitboxes overlapping a cell, in no particular order
+        """
+        bucket = self._cells.get(cell)
+        if not bucket:
+            return []
+        entries = self._entries
+        return [(entries[key][2], hitbox) for key, hitbox in bucket.items()]
+
+    def near(self, rects: np.ndarray) -> list[tuple[tuple[int, int], "Hitbox"]]:
+        """
+        Gathers the hitboxes sharing a cell with any of the given rectangles, so a batch of rectangles
+        can be tested against them at once without looking at the rest of the index
+        :param rects: Rectangles as an (n, 4) array
+        :return: (order, hitbox) pairs in no particular order
+        """
+        keys = np.sort(cell_keys(rects, self.cell_size)[0])
+        if len(keys):
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        cells = self._cells
+        candidates = {}
+        for cx, cy in zip(((keys >> 32) - _KEY_OFFSET).tolist(), ((keys & 0xFFFFFFFF) - _KEY_OFFSET).tolist()):
+            bucket = cells.get((cx, cy))
+            if bucket:
+                candidates.update(bucket)
+
+        self.queries += 1
+        self.candidates_tested += len(candidates)
+        entries = self._entries
+        return [(entries[key][2], hitbox) for key, hitbox in candidates.items()]
+
+    def query(self, rect) -> list[tuple[tuple[int, int], "Hitbox"]]:
+        """
+        Finds all indexed hitboxes colliding with the given rectangle
+        :param rect: The queried rectangle
+        :return: (order, hitbox) pairs sorted by order
+        """
+        self.queries += 1
+        x0, y0, x1, y1 = self._cell_range(rect)
+        cells = self._cells
+
+        candidates = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    candidates.update(bucket)
+
+        self.candidates_tested += len(candidates)
+        entries = self._entries
+        hits = [(entries[key][2], hitbox) for key, hitbox in candidates.items() if rect.colliderect(hitbox)]
+        hits.sort(key=_order_key)
+        return hits
+
+
+class StaticIndex:
+    """
+    A spatial index for hitboxes which never move. It is built in bulk from all static hitboxes
+    and rebuilt from scratch only after one of them is added or removed.
+    """
+
+    def __init__(self, cell_size: int = SpatialHash.DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._hitboxes: dict[int, tuple[tuple[int, int], "Hitbox"]] = {}
+        self._cells: dict[tuple[int, int], tuple[tuple[tuple[int, int], "Hitbox"], ...]] = {}
+        # All static (order, hitbox) entries sorted by order, and their rectangles as an (n, 4) array
+        self.entries: tuple[tuple[tuple[int, int], "Hitbox"], ...] = ()
+        self.rects = np.zeros((0, 4), dtype=np.int64)
+        # Collision layers and masks of the entries
+        self.layers, self.masks = collision_filters(())
+        # Cells of the entries as sorted keys and the entry index of each key, see cell_buckets
+        self._buckets = cell_buckets(self.rects, self.cell_size)
+        self.dirty = False
+
+        self.builds = 0
+        self.queries = 0
+        self.candidates_tested = 0
+
+    def __len__(self):
+        return len(self._hitboxes)
+
+    def __contains__(self, hitbox: "Hitbox"):
+        return id(hitbox) in self._hitboxes
+
+    def insert(self, hitbox: "Hitbox", order: tuple[int, int]):
+        self._hitboxes[id(hitbox)] = (order, hitbox)
+        self.dirty = True
+
+    def remove(self, hitbox: "Hitbox"):
+        if self._hitboxes.pop(id(hitbox), None) is not None:
+            self.dirty = True
+
+    def hitboxes(self):
+        """
+        Iterates over all indexed hitboxes, in no particular order
+        """
+        for _, hitbox in self._hitboxes.values():
+            yield hitbox
+
+    def cell_entries(self, cell: tuple[int, int]) -> tuple[tuple[tuple[int, int], "Hitbox"], ...]:
+        """
+        :return: (order, hitbox) pairs of the hitboxes overlapping a cell, sorted by order
+        """
+        if self.dirty:
+            self.build()
+        return self._cells.get(cell, ())
+
+    def clear(self):
+        self._hitboxes = {}
+        self._cells = {}
+        self.entries = ()
+        self.rects = np.zeros((0, 4), dtype=np.int64)
+        self.layers, self.masks = collision_filters(())
+        self._buckets = cell_buckets(self.rects, self.cell_size)
+        self.dirty = False
+
+    def save_state(self) -> tuple:
+        """
+        Builds the index if needed and returns its contents. All of them are immutable,
+        so the state can be kept and restored any number of times without copying.
+        """
+        if self.dirty:
+            self.build()
+        return dict(self._hitboxes), self._cells, self.entries, self.rects
+
+    def restore_state(self, state: tuple):
+        """
+        Replaces the contents with ones returned by save_state, skipping the rebuild
+        """
+        hitboxes, self._cells, self.entries, self.rects = state
+        self.layers, self.masks = collision_filters(self.entries)
+        self._buckets = cell_buckets(self.rects, self.cell_size)
+        self._hitboxes = dict(hitboxes)
+        self.dirty = False
+
+    def build(self):
+        """
+        Buckets all static hitboxes into cells. Every bucket is sorted by order, so queries touching a single
+        cell need no sorting.
+        """
+        cs = self.cell_size
+        cells: dict[tuple[int, int], list] = {}
+        self.entries = tuple(sorted(self._hitboxes.values(), key=_order_key))
+        self.layers, self.masks = collision_filters(self.entries)
+        self.rects = np.array([(hb.x, hb.y, hb.width, hb.height) for _, hb in self.entries],
+                              dtype=np.int64).reshape(-1, 4)
+        for entry in self.entries:
+            hitbox = entry[1]
+            for cx in range(hitbox.x // cs, (hitbox.x + max(hitbox.width - 1, 0)) // cs + 1):
+                for cy in range(hitbox.y // cs, (hitbox.y + max(hitbox.height - 1, 0)) // cs + 1):
+                    cells.setdefault((cx, cy), []).append(entry)
+        self._cells = {cell: tuple(bucket) for cell, bucket in cells.items()}
+        self._buckets = cell_buckets(self.rects, cs)
+        self.dirty = False
+        self.builds += 1
+
+    def overlaps(self, rects: np.ndarray) -> np.ndarray:
+        """
+        Tests many rectangles against all static hitboxes at once
+        :param rects: An (n, 4) array of x, y, width, height
+        :return: An (n, m) boolean matrix, column j corresponds to self.entries[j]
+        """
+        if self.dirty:
+            self.build()
+        return overlap_matrix(rects, self.rects)
+
+    def overlap_pairs(self, rects: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Tests many rectangles against the static hitboxes sharing a cell with them
+        :param rects: An (n, 4) array of x, y, width, height
+        :return: Indices into rects and into self.entries of the overlapping pairs, see overlap_pairs
+        """
+        if self.dirty:
+            self.build()
+        self.queries += 1
+        return overlap_pairs(rects, self.rects, self.cell_size, self._buckets)
+
+    def query(self, rect) -> list[tuple[tuple[int, int], "Hitbox"]]:
+        """
+        Finds all static hitboxes colliding with the given rectangle
+        :param rect: The queried rectangle
+        :return: (order, hitbox) pairs sorted by order
+        """
+        if self.dirty:
+            self.build()
+        self.queries += 1
+
+        cs = self.cell_size
+        x0, y0 = rect.x // cs, rect.y // cs
+        x1, y1 = (rect.x + max(rect.width - 1, 0)) // cs, (rect.y + max(rect.height - 1, 0)) // cs
+        cells = self._cells
+
+        if x0 == x1 and y0 == y1:
+            bucket = cells.get((x0, y0), ())
+            self.candidates_tested += len(bucket)
+            return [entry for entry in bucket if rect.colliderect(entry[1])]
+
+        candidates = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                for entry in cells.get((cx, cy), ()):
+                    candidates[id(entry[1])] = entry
+
+        self.candidates_tested += len(candidates)
+        hits = [entry for entry in candidates.values() if rect.colliderect(entry[1])]
+        hits.sort(key=_order_key)
+        return hits
+
+
+def overlap_matrix(rects: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """
+    Vectorized pygame.Rect.colliderect of every rectangle against every other one
+    :param rects: An (n, 4) array of x, y, width, height
+    :param others: An (m, 4) array of x, y, width, height
+    :return: An (n, m) boolean matrix
+    """
+    x, y, w, h = (rects[:, i, None] for i in range(4))
+    ox, oy, ow, oh = others.T
+    return ((x < ox + ow) & (ox < x + w) & (y < oy + oh) & (oy < y + h)
+            & (w > 0) & (h > 0) & (ow > 0) & (oh > 0))
+
+
+# Added to cell coordinates, so keys of negative cells pack into an int64 like any other
+_KEY_OFFSET = 1 << 30
+
+
+def cell_keys(rects: np.ndarray, cell_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lists the cells every rectangle overlaps, the way SpatialHash buckets hitboxes
+    :param rects: An (n, 4) array of x, y, width, height
+    :return: A key for every (rectangle, cell) pair and the index of its rectangle
+    """
+    x0 = np.floor_divide(rects[:, 0], cell_size).astype(np.int64)
+    y0 = np.floor_divide(rects[:, 1], cell_size).astype(np.int64)
+    x1 = np.floor_divide(rects[:, 0] + np.maximum(rects[:, 2] - 1, 0), cell_size).astype(np.int64)
+    y1 = np.floor_divide(rects[:, 1] + np.maximum(rects[:, 3] - 1, 0), cell_size).astype(np.int64)
+    columns = x1 - x0 + 1
+    counts = columns * (y1 - y0 + 1)
+    index = np.repeat(np.arange(len(rects)), counts)
+    local = np.arange(len(index)) - np.repeat(np.cumsum(counts) - counts, counts)
+    cx = x0[index] + local % columns[index]
+    cy = y0[index] + local // columns[index]
+    return ((cx + _KEY_OFFSET) << 32) | (cy + _KEY_OFFSET), index
+
+
+def cell_buckets(rects: np.ndarray, cell_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    :return: The cell keys of the rectangles sorted, and the index of the rectangle of each key
+    """
+    keys, index = cell_keys(rects, cell_size)
+    order = np.argsort(keys)
+    return keys[order], index[order]
+
+
+def overlap_pairs(rects: np.ndarray, others: np.ndarray, cell_size: int,
+                  buckets: tuple[np.ndarray, np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized pygame.Rect.colliderect of the rectangles against the others sharing a cell with them,
+    so the work grows with the number of nearby pairs rather than with n * m
+    :param rects: An (n, 4) array of x, y, width, height
+    :param others: An (m, 4) array of x, y, width, height
+    :param buckets: cell_buckets of the others, if they have been computed already
+    :return: Index arrays i and j of the overlapping pairs rects[i] and others[j], sorted by i, then by j
+    """
+    if buckets is None:
+        buckets = cell_buckets(others, cell_size)
+    other_keys, other_index = buckets
+    keys, index = cell_keys(rects, cell_size)
+    start = np.searchsorted(other_keys, keys, "left")
+    counts = np.searchsorted(other_keys, keys, "right") - start
+    i = np.repeat(index, counts)
+    local = np.arange(len(i)) - np.repeat(np.cumsum(counts) - counts, counts)
+    j = other_index[np.repeat(start, counts) + local]
+    x, y, w, h = rects.T
+    other_x, other_y, other_w, other_h = others.T
+    ax, ay, bx, by = x[i], y[i], other_x[j], other_y[j]
+    hit = np.flatnonzero((ax < bx + other_w[j]) & (bx < ax + w[i]) & (ay < by + other_h[j]) & (by < ay + h[i])
+                         & (w[i] > 0) & (h[i] > 0) & (other_w[j] > 0) & (other_h[j] > 0))
+    # Pairs sharing several cells are found once per cell, only the cell holding the corner of the intersection counts
+    corner_keys = ((np.floor_divide(np.maximum(ax[hit], bx[hit]), cell_size) + _KEY_OFFSET) << 32) | (
+        np.floor_divide(np.maximum(ay[hit], by[hit]), cell_size) + _KEY_OFFSET)
+    once = hit[corner_keys == np.repeat(keys, counts)[hit]]
+    i, j = i[once], j[once]
+    order = np.argsort(i * len(others) + j)
+    return i[order], j[order]
+
+
+def collision_filters(entries) -> tuple[np.ndarray, np.ndarray]:
+    """
+    :param entries: (order, hitbox) pairs
+    :return: Collision layers and masks of the hitboxes as arrays
+    """
+    layers = np.array([hitbox.collision_layer for _, hitbox in entries], dtype=np.int64)
+    masks = np.array([hitbox.collision_mask for _, hitbox in entries], dtype=np.int64)
+    return layers, masks
+
+
+def compatible_matrix(layers: np.ndarray, masks: np.ndarray, other_layers: np.ndarray,
+                      other_masks: np.ndarray) -> np.ndarray:
+    """
+    Vectorized collision filter, see CollisionLayer
+    :return: An (n, m) boolean matrix telling which of n hitboxes may collide with which of m others
+    """
+    return (((masks[:, None] & other_layers) != 0) & ((other_masks & layers[:, None]) != 0))
+
+
+def _order_key(entry):
+    return entry[0]
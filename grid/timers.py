@@ -0,0 +1,138 @@
+"""
+Callbacks run at a given tick of the world clock, once or periodically.
+
+Timers are kept in a hierarchical timer wheel. The first wheel has a slot for each of the next 64 ticks,
+every further wheel has slots 64 times as long as the previous one. A timer goes into the finest wheel
+its delay fits in and moves down to finer wheels as its tick comes closer, so adding, cancelling
+and firing a timer take constant time no matter how many are pending.
+"""
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from entities.base import EntityRef
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+WHEELS = 4
+
+
+@dataclass(frozen=True, eq=False)
+class Timer:
+    """
+    A handle of a scheduled callback. It never changes, so it can be kept in snapshots of its owner.
+    """
+    callback: Callable[[], None]
+    # Tick of the first call
+    tick: int
+    # Ticks between calls, 0 for a single call
+    period: int = 0
+    # Timers of an entity which has been destroyed since are dropped instead of called
+    owner: "EntityRef" = None
+
+    def next_tick(self, now: int) -> int:
+        """
+        :return: The first tick after now at which the timer is due
+        """
+        if self.tick > now or not self.period:
+            return max(self.tick, now + 1)
+        return self.tick + ((now - self.tick) // self.period + 1) * self.period
+
+
+class TimerWheel:
+    """
+    Timers of the grid, run on its clock
+    """
+
+    def __init__(self):
+        self.now = 0
+        # Entries are (tick, timer, token) tuples
+        self._wheels: list[list[list[tuple[int, Timer, int]]]] = [[[] for _ in range(SLOTS)] for _ in range(WHEELS)]
+        # Timers too far in the future for the coarsest wheel
+        self._overflow: list[tuple[int, Timer, int]] = []
+        # id(timer) -> token of its live entry. Entries of cancelled or rescheduled timers are skipped.
+        self._active: dict[int, int] = {}
+        self._next_token = 0
+        # Incremented on every clear, lets advance notice that a callback has replaced the world
+        self._generation = 0
+        self.fired = 0
+
+    def __len__(self):
+        return len(self._active)
+
+    def clear(self):
+        """
+        Drops all timers and starts the clock over
+        """
+        self.now = 0
+        self._wheels = [[[] for _ in range(SLOTS)] for _ in range(WHEELS)]
+        self._overflow = []
+        self._active = {}
+        self._generation += 1
+
+    def add(self, timer: Timer):
+        """
+        Schedules a timer. Ticks which have already passed are moved to the next tick,
+        periodic timers keep their phase.
+        """
+        self._next_token += 1
+        self._active[id(timer)] = self._next_token
+        self._insert(timer.next_tick(self.now), timer, self._next_token)
+
+    def cancel(self, timer: Timer):
+        # The entry is left in its slot and skipped once its tick comes
+        self._active.pop(id(timer), None)
+
+    def is_active(self, timer: Timer) -> bool:
+        return id(timer) in self._active
+
+    def advance(self):
+        """
+        Moves the clock on by one tick and runs the callbacks due
+        """
+        self.now += 1
+        now = self.now
+        # Timers of coarser wheels whose slot has come move down to finer ones
+        if now & ((1 << SLOT_BITS * WHEELS) - 1) == 0:
+            overflow, self._overflow = self._overflow, []
+            for entry in overflow:
+                self._insert(*entry)
+        for level in range(WHEELS - 1, 0, -1):
+            if now & ((1 << SLOT_BITS * level) - 1) == 0:
+                slots = self._wheels[level]
+                index = (now >> SLOT_BITS * level) & (SLOTS - 1)
+                entries, slots[index] = slots[index], []
+                for entry in entries:
+                    self._insert(*entry)
+
+        slots = self._wheels[0]
+        index = now & (SLOTS - 1)
+        due, slots[index] = slots[index], []
+        generation = self._generation
+        active = self._active
+        for _, timer, token in due:
+            if active.get(id(timer)) != token:
+                continue
+            owner = None if timer.owner is None else timer.owner.get()
+            if timer.owner is not None and owner is None:
+                del active[id(timer)]
+                continue
+            if timer.period:
+                self._insert(now + timer.period, timer, token)
+            else:
+                del active[id(timer)]
+                if owner is not None and timer in owner.timers:
+                    owner.timers.remove(timer)
+            self.fired += 1
+            timer.callback()
+            if self._generation != generation:
+                return
+
+    def _insert(self, tick: int, timer: Timer, token: int):
+        delay = tick - self.now
+        for level in range(WHEELS):
+            if delay < 1 << SLOT_BITS * (level + 1):
+                self._wheels[level][(tick >> SLOT_BITS * level) & (SLOTS - 1)].append((tick, timer, token))
+                return
+        self._overflow.append((tick, timer, token))
@@ -93,6 +93,8 @@ class HackableMethod(MethodInfoDict):
 
     # A static dictionary containing the overwritten methods
     meth_info = defaultdict(dict)
+    # Class name -> source code applied to the class so far, in order
+    applied_code = defaultdict(list)
     hacker_scope = False
 
     @staticmethod
@@ -146,4 +148,5 @@ class HackableMethod(MethodInfoDict):
 
         for var_name, var_value in scope.items():
             if var_name in hackable_method_names:
-                HackableMethod.meth_info[class_name][var_name] = var_value
\ No newline at end of file
+                HackableMethod.meth_info[class_name][var_name] = var_value
+        HackableMethod.applied_code[class_name].append(code)
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Runs a level without a window, as fast as possible, e.g. for CI or load tests.
+
+    python headless.py LevelLasers --ticks 10000 --hold d:1-200 --hold e:150-150
+
+Keys are given by their pygame names (K_d -> d) together with the range of ticks during which they are held.
+"""
+import argparse
+import os
+import time
+
+import pygame
+
+from entities.types import TickData
+from grid.grid import Grid
+# Imported for the levels it defines, which register themselves by name
+import levels.level
+from levels.base import Level
+
+grid = Grid()
+
+
+class ScriptedInput:
+    """
+    Stands in for pp.Input in headless runs. Keys are held down according to a script,
+    a key is pressed in the first tick it is held.
+    """
+
+    def __init__(self, script: list[tuple[int, int, int]] = ()):
+        """
+        :param script: (first tick, last tick, key) entries, both ticks inclusive
+        """
+        self.script = list(script)
+        self._down: set[int] = set()
+        self._pressed: set[int] = set()
+
+    def set_tick(self, tick: int):
+        down = {key for first, last, key in self.script if first <= tick <= last}
+        self._pressed = down - self._down
+        self._down = down
+
+    def isKeyDown(self, key: int) -> bool:
+        return key in self._down
+
+    def isKeyPressed(self, key: int) -> bool:
+        return key in self._pressed
+
+
+def run(level: type[Level], ticks: int, pp_input: ScriptedInput = None, batch_movement: bool = False) -> float:
+    """
+    Loads a level and steps the grid with no rendering and no frame rate limit
+    :param level: The level to load
+    :param ticks: Number of ticks to simulate
+    :param pp_input: Scripted player input, no keys are pressed if not given
+    :param batch_movement: Passed on to the grid, as main does
+    :return: Simulated ticks per second
+    """
+    pp_input = pp_input or ScriptedInput()
+    grid.batch_movement = batch_movement
+    level.load()
+
+    tick_data = TickData(0, pp_input)
+    start = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        tick_data.tick = tick
+        pp_input.set_tick(tick)
+        grid.process_player_input(tick_data)
+        grid.process_dynamic_entities(tick_data)
+    elapsed = time.perf_counter() - start
+    return ticks / elapsed if elapsed > 0 else float("inf")
+
+
+def find_level(name: str) -> type[Level]:
+    try:
+        return Level.by_name(name)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+def parse_hold(value: str) -> tuple[int, int, int]:
+    """
+    Parses KEY:FIRST-LAST, or KEY:TICK for a single tick
+    """
+    try:
+        key_name, ticks = value.split(":")
+        first, _, last = ticks.partition("-")
+        key = getattr(pygame, f"K_{key_name}")
+        return int(first), int(last or first), key
+    except (ValueError, AttributeError):
+        raise argparse.ArgumentTypeError(f"expected KEY:FIRST-LAST, got '{value}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a level without a window")
+    parser.add_argument("level", help="Name of a Level subclass from levels/level.py")
+    parser.add_argument("--ticks", type=int, default=10000, help="Number of ticks to simulate")
+    parser.add_argument("--hold", type=parse_hold, action="append", default=[], metavar="KEY:FIRST-LAST",
+                        help="Hold a key during a range of ticks, may be repeated")
+    parser.add_argument("--batch-movement", action="store_true",
+                        help="Resolve moves of chasing entities in a vectorized phase at the end of each tick")
+    args = parser.parse_args()
+
+    # No window is ever opened, but SDL still needs a video driver for surfaces
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    level = find_level(args.level)
+    tps = run(level, args.ticks, ScriptedInput(args.hold), batch_movement=args.batch_movement)
+    print(f"{level.__name__}: {args.ticks} ticks, {tps:.0f} ticks/s")
+    print(f"collision pairs: {grid.pairs_checked} checked, {grid.pairs_pruned} pruned by collision layers")
+    scheduler = grid.scheduler
+    print(f"tick actions: {scheduler.total_actions_run / args.ticks:.1f} run, "
+          f"{scheduler.total_actions_skipped / args.ticks:.1f} skipped by distance throttling per tick")
+
+
+if __name__ == "__main__":
+    main()
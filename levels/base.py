@@ -1,36 +1,124 @@
+import functools
+import random
 from abc import ABC, abstractmethod
 
 from entities.blocks import WallSegment
+from levels.walls import merge_wall_segments
 from grid.grid import Grid
 from grid.position import Position, Vector
 from terminal.terminal import Terminal
+from ui.hint_renderer import hint_renderer
 
 grid = Grid()
 
 
 class Level(ABC):
     _active_level = None
+    # Depth of nested load() calls, the world is captured once the outermost one returns
+    _loading = 0
+    # Level class name -> level class
+    _levels: dict[str, type["Level"]] = {}
+    # Seed of the random generator used by the last load, a level loaded with the same seed is generated the same way
+    seed: int = None
+    # The random generator of levels and entities. Seeding it once, e.g. from a trace, determines the seeds
+    # of all later loads, and no other use of the random module can change what happens in a level.
+    rng = random.Random()
+    # (start, end) of the walls added by the level being loaded, created merged once it has been loaded
+    _pending_walls: list[tuple[tuple[float, float], tuple[float, float]]] = []
+
+    def __init_subclass__(cls, register: bool = True, **kwargs):
+        """
+        Registers every level by name and wraps its load(), so a snapshot of the world is captured
+        as soon as it has been loaded
+        :param register: False for base classes of levels, which can't be loaded by name
+        """
+        super().__init_subclass__(**kwargs)
+        if register:
+            Level._levels[cls.__name__] = cls
+        load = cls.__dict__.get("load")
+        if load is None:
+            return
+
+        @functools.wraps(load.__func__)
+        def load_and_capture(level_cls, seed: int = None):
+            if Level._loading == 0:
+                Level.seed = Level.rng.getrandbits(32) if seed is None else seed
+                Level.rng.seed(Level.seed)
+            Level._loading += 1
+            try:
+                load.__func__(level_cls)
+            finally:
+                Level._loading -= 1
+            if Level._loading == 0:
+                Level._build_walls()
+                grid.capture_snapshot()
+
+        cls.load = classmethod(load_and_capture)
+
+    @staticmethod
+    def by_name(name: str) -> type["Level"]:
+        """
+        :param name: Class name of a level
+        :return: The level class
+        """
+        level = Level._levels.get(name)
+        if level is None:
+            raise ValueError(f"Unknown level '{name}', available: {', '.join(Level._levels)}")
+        return level
 
     @classmethod
     @abstractmethod
     def load(cls):
         grid.clear()
+        hint_renderer.clear_hint()
         if Terminal.initialized:
             Terminal().clear()
         Level._active_level = cls
+        Level._pending_walls = []
 
     @staticmethod
     def load_last():
+        """
+        Restarts the active level, from its snapshot if there is one
+        """
+        if grid.restore_snapshot():
+            hint_renderer.clear_hint()
+            if Terminal.initialized:
+                Terminal().clear()
+            return
         Level._active_level.load()
 
+    @staticmethod
+    def wall(start: Position, end: Position):
+        """
+        Adds a wall to the level being loaded. Walls lining up with each other are merged into a single
+        WallSegment once the level has been loaded, so they can't be referred to. Create a WallSegment
+        directly for a wall other entities need, e.g. a destroyable one.
+        """
+        Level._pending_walls.append(((start.x, start.y), (end.x, end.y)))
+        if Level._loading == 0:
+            Level._build_walls()
+
     @staticmethod
     def make_wall_cell(cell_type: str, cell_size: int, center: Position):
         half = cell_size // 2
         if "n" in cell_type:
-            WallSegment(center + Vector(-half, -half), center + Vector(half, -half))
+            Level.wall(center + Vector(-half, -half), center + Vector(half, -half))
         if "e" in cell_type:
-            WallSegment(center + Vector(half, -half), center + Vector(half, half))
+            Level.wall(center + Vector(half, -half), center + Vector(half, half))
         if "s" in cell_type:
-            WallSegment(center + Vector(-half, half), center + Vector(half, half))
+            Level.wall(center + Vector(-half, half), center + Vector(half, half))
         if "w" in cell_type:
-            WallSegment(center + Vector(-half, -half), center + Vector(-half, half))
+            Level.wall(center + Vector(-half, -half), center + Vector(-half, half))
+
+    @staticmethod
+    def _build_walls():
+        """
+        Creates the walls added by the level, merged where they overlap or touch
+        """
+        if not Level._pending_walls:
+            return
+        walls = merge_wall_segments(Level._pending_walls, WallSegment.THICKNESS)
+        Level._pending_walls = []
+        for start, end in walls:
+            WallSegment(Position(*start), Position(*end))
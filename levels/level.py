@@ -1,5 +1,4 @@
-import random
-from abc import ABC
+import os
 
 from entities.blocks import WallSegment, Trap
 from entities.common import Exit
@@ -9,21 +8,13 @@ from entities.player import Player
 from entities.teleporter import TeleporterTarget, Teleporter, HackableTeleporter
 from grid.position import Position, Vector
 from levels.base import Level
+from levels.level_file import level_from_file
 
 
+LEVEL_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
-class LevelTestDoor(Level):
-    @classmethod
-    def load(cls):
-        super().load()
-        WallSegment(Position(200, 0), Position(200, 100))
-        WallSegment(Position(200, 150), Position(200, 500))
-        WallSegment(Position(10, 500), Position(200, 500))
-        door = OpenableDoor(Position(200, 100))
-        button = HackableDoorButton(Position(100, 400))
-        button.set_target_door(door)
-        Player(Position(100, 100))
-        Exit(Position(300, 200), LevelTeleporter.load)
+LevelTestDoor = level_from_file(os.path.join(LEVEL_DATA_DIR, "LevelTestDoor.yaml"))
+LevelLasers = level_from_file(os.path.join(LEVEL_DATA_DIR, "LevelLasers.yaml"))
 
 
 class LevelTeleporter(Level):
@@ -77,7 +68,7 @@ self.set_target(exit_target)
         trap_tt = LevelTeleporter.make_trap_cell(Position(450, 350))
 
         mid_cell_positions = [0, 1, 2, 3]
-        exit_mid_cell_position = random.choice(mid_cell_positions)
+        exit_mid_cell_position = Level.rng.choice(mid_cell_positions)
         mid_cell_positions.remove(exit_mid_cell_position)
 
         trap_mid_tts = []
@@ -90,28 +81,9 @@ self.set_target(exit_target)
         exit_mid_tt, exit_mid_tp = LevelTeleporter.make_middle_cell(Position(300, 130*exit_mid_cell_position + 80), exit_tt)
 
         all_tts = [*trap_mid_tts, exit_mid_tt]
-        random.shuffle(all_tts)
+        Level.rng.shuffle(all_tts)
         other_teleporters.append(exit_mid_tp)
-        random.shuffle(other_teleporters)
+        Level.rng.shuffle(other_teleporters)
 
         tel = HackableTeleporter(Position(200, 200), all_tts, other_teleporters)
-        tel.set_target(random.choice(trap_mid_tts))
-
-
-class LevelLasers(Level, ABC):
-    @classmethod
-    def load(cls):
-        super().load()
-        p = Player(Position(100, 100))
-        LaserEmitter(Position(200, 150), delay=25)
-
-        w = WallSegment(Position(0, 550), Position(300, 550))
-        d = DestroyButton(Position(100, 150))
-        d.set_target(w)
-
-
-        for i in range(200, 300, 15):
-            z = Zombie(Position(i, 600))
-            z.set_target(p)
-
-        Exit(Position(50, 570), LevelLasers.load)
\ No newline at end of file
+        tel.set_target(Level.rng.choice(trap_mid_tts))
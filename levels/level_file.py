@@ -0,0 +1,275 @@
+"""
+Levels described by YAML files instead of Python code, e.g.:
+
+    walls:                        # anonymous walls, created first and merged where they line up
+      - [[200, 0], [200, 100]]
+    entities:                     # created in order after the walls
+      - type: Player              # a class name registered in EntityLibrary
+        id: player                # lets other entries refer to this entity as $player
+        position: [100, 100]
+      - type: Zombie
+        position: [200, 600]
+        repeat: 7                 # creates 7 zombies, each moved by step from the previous one
+        step: [15, 0]
+        call:                     # methods called once all entities exist, with a single argument each
+          set_target: $player
+      - type: Exit
+        position: [50, 570]
+        args:                     # further constructor arguments
+          on_exit: {level: LevelLasers}
+
+Argument values may be numbers and strings, [x, y] pairs which become Positions, $id references,
+lists of those, or {level: Name} for a function loading the named level.
+
+Each file is compiled once into a pickled CompiledLevel in levels/.cache. The compiled form is validated,
+has its walls merged and, after the first load, carries the layout of the static collision index,
+so later loads just create the entities.
+"""
+import inspect
+import os
+import pickle
+from dataclasses import dataclass
+
+import numpy as np
+import yaml
+
+from entities.blocks import WallSegment
+from entities.entity_library import EntityLibrary
+from grid.grid import Grid
+from grid.position import Position
+from levels.base import Level
+from levels.walls import merge_wall_segments
+
+grid = Grid()
+
+# Bump whenever CompiledLevel or the meaning of its fields changes, so stale caches are recompiled
+COMPILER_VERSION = 2
+CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache")
+
+
+@dataclass
+class CompiledLevel:
+    # Compiler version, modification time and size of the source file the level was compiled from
+    source_stamp: tuple[int, int, int]
+    walls: list[tuple[tuple[float, float], tuple[float, float]]]
+    # (class name, encoded constructor arguments) in creation order, after the walls
+    entities: list[tuple[str, dict]]
+    # (entity index, method name, encoded argument), entity indices count the walls too
+    calls: list[tuple[int, str, tuple]]
+    # (order, slot) keys, cell -> indices into the keys and the (n, 4) rectangles of the static collision index,
+    # captured on the first load
+    static_index: tuple[list[tuple[int, int]], dict[tuple[int, int], tuple[int, ...]], np.ndarray] = None
+
+
+class FileLevel(Level, register=False):
+    """
+    A level loaded from a YAML file. Use level_from_file to create one.
+    """
+    path: str = None
+
+    @classmethod
+    def load(cls):
+        super().load()
+        compiled = compile_level(cls.path)
+        instantiate(compiled)
+
+        if compiled.static_index is None or not _restore_static_index(compiled.static_index):
+            compiled.static_index = _capture_static_index()
+            _write_cache(cls.path, compiled)
+
+
+def level_from_file(path: str, name: str = None) -> type[FileLevel]:
+    """
+    Creates a level class for a level file. The level is registered under the given name,
+    or the file name without extension.
+    """
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    return type(name, (FileLevel,), {"path": path})
+
+
+def compile_level(path: str) -> CompiledLevel:
+    """
+    Returns the compiled form of a level file, from the cache if it is up to date
+    """
+    stamp = _source_stamp(path)
+    try:
+        with open(_cache_path(path), "rb") as file:
+            compiled = pickle.load(file)
+        if isinstance(compiled, CompiledLevel) and compiled.source_stamp == stamp:
+            return compiled
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    with open(path) as file:
+        spec = yaml.safe_load(file) or {}
+    compiled = _compile(spec, path, stamp)
+    _write_cache(path, compiled)
+    return compiled
+
+
+def instantiate(compiled: CompiledLevel):
+    """
+    Creates the entities of a compiled level
+    """
+    created = [WallSegment(Position(*start), Position(*end)) for start, end in compiled.walls]
+    for class_name, arguments in compiled.entities:
+        created.append(EntityLibrary.create_entity(
+            class_name, **{name: _decode(value, created) for name, value in arguments.items()}))
+    for index, method, argument in compiled.calls:
+        getattr(created[index], method)(_decode(argument, created))
+
+
+def _compile(spec: dict, path: str, stamp: tuple[int, int, int]) -> CompiledLevel:
+    walls = []
+    for wall in spec.get("walls", []):
+        try:
+            (x1, y1), (x2, y2) = wall
+        except (TypeError, ValueError):
+            raise ValueError(f"{path}: a wall must be [[x1, y1], [x2, y2]], got {wall}")
+        if x1 != x2 and y1 != y2:
+            raise ValueError(f"{path}: walls must be vertical or horizontal, got {wall}")
+        walls.append(((x1, y1), (x2, y2)))
+    walls = merge_wall_segments(walls, WallSegment.THICKNESS) if walls else []
+
+    # Expand repeats first, so references can be resolved to entity indices
+    entries = []
+    ids: dict[str, int | list[int]] = {}
+    for entry in spec.get("entities", []):
+        class_name = entry.get("type")
+        cls = EntityLibrary.get_class(class_name)
+        if cls is None:
+            raise ValueError(f"{path}: unknown entity type '{class_name}'")
+        count = entry.get("repeat", 1)
+        step = entry.get("step", [0, 0])
+        indices = []
+        for i in range(count):
+            indices.append(len(walls) + len(entries))
+            entries.append((cls, entry, i, step))
+        if "id" in entry:
+            if entry["id"] in ids:
+                raise ValueError(f"{path}: duplicate id '{entry['id']}'")
+            ids[entry["id"]] = indices if "repeat" in entry else indices[0]
+
+    entities = []
+    calls = []
+    for cls, entry, i, step in entries:
+        index = len(walls) + len(entities)
+        arguments = {name: _encode(value, ids, path) for name, value in entry.get("args", {}).items()}
+        if "position" in entry:
+            x, y = entry["position"]
+            arguments["position"] = ("pos", x + i * step[0], y + i * step[1])
+        try:
+            inspect.signature(cls).bind(**arguments)
+        except TypeError as e:
+            raise ValueError(f"{path}: invalid arguments for {cls.__name__}: {e}")
+        entities.append((cls.__name__, arguments))
+
+        for method, argument in entry.get("call", {}).items():
+            if not callable(getattr(cls, method, None)):
+                raise ValueError(f"{path}: {cls.__name__} has no method '{method}'")
+            calls.append((index, method, _encode(argument, ids, path)))
+
+    # Constructor arguments can only refer to entities created before
+    for index, (class_name, arguments) in enumerate(entities, start=len(walls)):
+        for value in arguments.values():
+            if any(referenced >= index for referenced in _references(value)):
+                raise ValueError(f"{path}: {class_name} refers to an entity created after it, use call instead")
+
+    return CompiledLevel(stamp, walls, entities, calls)
+
+
+def _encode(value, ids: dict, path: str) -> tuple:
+    if isinstance(value, str) and value.startswith("$"):
+        if value[1:] not in ids:
+            raise ValueError(f"{path}: unknown id '{value[1:]}'")
+        target = ids[value[1:]]
+        return ("refs", tuple(target)) if isinstance(target, list) else ("ref", target)
+    if isinstance(value, dict) and set(value) == {"level"}:
+        return "level", value["level"]
+    if isinstance(value, list):
+        if len(value) == 2 and all(isinstance(v, (int, float)) for v in value):
+            return "pos", value[0], value[1]
+        return "list", tuple(_encode(v, ids, path) for v in value)
+    return "value", value
+
+
+def _references(value: tuple) -> list[int]:
+    """
+    :return: Indices of all entities an encoded value refers to
+    """
+    kind = value[0]
+    if kind == "ref":
+        return [value[1]]
+    if kind == "refs":
+        return list(value[1])
+    if kind == "list":
+        return [index for v in value[1] for index in _references(v)]
+    return []
+
+
+def _decode(value: tuple, created: list):
+    kind = value[0]
+    if kind == "pos":
+        return Position(value[1], value[2])
+    if kind == "ref":
+        return created[value[1]]
+    if kind == "refs":
+        return [created[i] for i in value[1]]
+    if kind == "level":
+        return Level.by_name(value[1]).load
+    if kind == "list":
+        return [_decode(v, created) for v in value[1]]
+    return value[1]
+
+
+def _capture_static_index() -> tuple:
+    _, cells, entries, rects = grid.static_index.save_state()
+    keys = [key for key, _ in entries]
+    positions = {id(hitbox): i for i, (_, hitbox) in enumerate(entries)}
+    layout = {cell: tuple(positions[id(hitbox)] for _, hitbox in bucket) for cell, bucket in cells.items()}
+    return keys, layout, rects
+
+
+def _restore_static_index(static_index: tuple) -> bool:
+    """
+    Fills the static collision index from a captured layout instead of building it
+    :return: False if the layout does not match the created entities, e.g. because an entity class has changed
+    """
+    keys, layout, rects = static_index
+    entities = {grid.get_entity_order(entity): entity for entity in grid.entities}
+    entries = []
+    for order, slot in keys:
+        entity = entities.get(order)
+        if entity is None or slot > len(entity.hitboxes):
+            return False
+        hitbox = entity.main_hitbox if slot == 0 else entity.hitboxes[slot - 1]
+        if hitbox not in grid.static_index:
+            return False
+        entries.append(((order, slot), hitbox))
+
+    if len(entries) != len(grid.static_index):
+        return False
+    current = np.array([(hb.x, hb.y, hb.width, hb.height) for _, hb in entries], dtype=np.int64).reshape(-1, 4)
+    if not np.array_equal(current, rects):
+        return False
+
+    cells = {cell: tuple(entries[i] for i in bucket) for cell, bucket in layout.items()}
+    grid.static_index.restore_state(({id(entry[1]): entry for entry in entries}, cells, tuple(entries), rects))
+    return True
+
+
+def _source_stamp(path: str) -> tuple[int, int, int]:
+    stat = os.stat(path)
+    return COMPILER_VERSION, stat.st_mtime_ns, stat.st_size
+
+
+def _cache_path(path: str) -> str:
+    return os.path.join(CACHE_DIR, os.path.splitext(os.path.basename(path))[0] + ".pickle")
+
+
+def _write_cache(path: str, compiled: CompiledLevel):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = _cache_path(path)
+    with open(cache_path + ".tmp", "wb") as file:
+        pickle.dump(compiled, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(cache_path + ".tmp", cache_path)
@@ -0,0 +1,39 @@
+Point = tuple[float, float]
+
+
+def merge_wall_segments(segments: list[tuple[Point, Point]], gap: float = 0) -> list[tuple[Point, Point]]:
+    """
+    Joins horizontal and vertical wall segments lying on the same line which overlap or touch,
+    so a run of walls becomes a single entity
+    :param segments: (start, end) pairs
+    :param gap: Segments this far apart are joined too, walls are drawn thicker than their segments
+    :return: The merged (start, end) pairs, horizontal ones first, each with start <= end
+    """
+    horizontal: dict[float, list[tuple[float, float]]] = {}
+    vertical: dict[float, list[tuple[float, float]]] = {}
+    for (x1, y1), (x2, y2) in segments:
+        if y1 == y2:
+            horizontal.setdefault(y1, []).append((min(x1, x2), max(x1, x2)))
+        elif x1 == x2:
+            vertical.setdefault(x1, []).append((min(y1, y2), max(y1, y2)))
+        else:
+            raise NotImplementedError("Walls must be vertical or horizontal for now")
+
+    merged = []
+    for y, spans in horizontal.items():
+        merged += [((start, y), (end, y)) for start, end in _merge_spans(spans, gap)]
+    for x, spans in vertical.items():
+        merged += [((x, start), (x, end)) for start, end in _merge_spans(spans, gap)]
+    return merged
+
+
+def _merge_spans(spans: list[tuple[float, float]], gap: float) -> list[tuple[float, float]]:
+    spans = sorted(spans)
+    result = [spans[0]]
+    for start, end in spans[1:]:
+        last_start, last_end = result[-1]
+        if start <= last_end + gap:
+            result[-1] = (last_start, max(last_end, end))
+        else:
+            result.append((start, end))
+    return result
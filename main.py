@@ -1,17 +1,42 @@
+import argparse
+import os
+import random
+
 import pygame
 import pygamepal as pp
 from entities.types import TickData
 
+from levels.base import Level
 from levels.level import LevelTestDoor, LevelTeleporter, LevelLasers
 
 from ui.hint_renderer import hint_renderer
+from ui.world_renderer import WorldRenderer
 from terminal.terminal import Terminal
 from grid.grid import Grid
+from recording import TraceRecorder
+from savegame import SaveJournal
+from timing import FixedTimestep, TickInput
 from utils import create_background
 
 SCREEN_WIDTH = 1200
 SCREEN_HEIGHT = 720
 TILE_SIZE = 70
+# Game logic always runs at this rate, frames are drawn as often as FRAME_RATE allows
+TICK_RATE = 30
+FRAME_RATE = 60
+# F5 saves here, --continue loads from here
+SAVE_PATH = "quicksave.sav"
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--record", metavar="PATH", help="Record the session to a trace file, see recording.py")
+parser.add_argument("--seed", type=int, help="Seed for level generation, random by default")
+parser.add_argument("--batch-movement", action="store_true",
+                    help="Resolve moves of chasing entities in a vectorized phase at the end of each tick")
+parser.add_argument("--continue", dest="continue_game", action="store_true",
+                    help=f"Continue from {SAVE_PATH} if it exists")
+args = parser.parse_args()
+if args.record and args.continue_game:
+    parser.error("sessions continued from a save can't be recorded")
 
 pygame.init()
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -25,43 +50,71 @@ terminal = Terminal(pp_input)
 background_surface = create_background("resources/StoneFloorTexture.png", TILE_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT)
 
 grid = Grid()
-
-LevelTestDoor.load()
-
-
-tick_data = TickData(0, pp_input)
+grid.batch_movement = args.batch_movement
+grid.set_world_size(SCREEN_WIDTH, SCREEN_HEIGHT)
+renderer = WorldRenderer(screen, background_surface)
+
+seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+Level.rng.seed(seed)
+recorder = TraceRecorder(args.record, LevelTestDoor.__name__, seed, grid.batch_movement) if args.record else None
+journal = SaveJournal(SAVE_PATH)
+start_tick = 0
+if args.continue_game and os.path.exists(SAVE_PATH):
+    start_tick = journal.load()
+else:
+    LevelTestDoor.load()
+
+tick_input = TickInput(pp_input)
+tick_data = TickData(start_tick, tick_input)
+timestep = FixedTimestep(TICK_RATE)
+last_terminal_state = None
 
 while True:
-    tick_data.tick += 1
     # Process player inputs.
     pygame_events = pygame.event.get()
     pressed_keys = pygame.key.get_pressed()
 
     for event in pygame_events:
         if event.type == pygame.QUIT:
+            if recorder:
+                recorder.close()
             pygame.quit()
             raise SystemExit
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            renderer.debug = not renderer.debug
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+            print(f"Saved {journal.save(tick_data.tick)} bytes to {SAVE_PATH}")
 
     # Do logical updates here.
     # ...
-    if not terminal.is_enabled():
-        grid.process_player_input(tick_data)
-        grid.process_dynamic_entities(tick_data)
-    else:
-        grid.process_dynamic_entities(TickData())
-
+    for _ in range(timestep.advance()):
+        tick_data.tick += 1
+        if recorder:
+            recorder.record(tick_input, terminal.is_enabled())
+        if not terminal.is_enabled():
+            grid.process_player_input(tick_data)
+            grid.process_dynamic_entities(tick_data)
+        else:
+            grid.process_dynamic_entities(TickData())
+        tick_input.consume()
 
     # Render the graphics here.
     # ...
-    screen.blit(background_surface, (0, 0))
     grid.sprites.update()
-    grid.sprites.draw(screen)
+    grid.interpolate_sprites(timestep.alpha)
+    dirty_rects = renderer.render([hint_renderer.get_rect()])
 
     hint_renderer.render()
 
     # displays editor functionality once per loop
     terminal.display_terminal(pygame_events, pressed_keys)
     terminal.on_tick()
-
-    pygame.display.flip()  # Refresh on-screen display
-    clock.tick(30)  # wait until next frame (at 30 FPS)
+    tick_input.latch()
+    # The terminal is drawn over the world every frame, the display only needs it when it looks different
+    terminal_state = terminal.visible_state()
+    if terminal_state != last_terminal_state:
+        dirty_rects.append(terminal.get_screen_rect())
+        last_terminal_state = terminal_state
+
+    pygame.display.update(dirty_rects)  # Refresh the changed parts of the on-screen display
+    clock.tick(FRAME_RATE)  # wait until next frame
@@ -0,0 +1,209 @@
+"""
+Records play sessions to compact trace files and replays them headlessly at full speed.
+
+    python main.py --record session.trace
+    python recording.py replay session.trace --timings new.npy
+    python recording.py compare old.npy new.npy
+
+A trace stores the RNG seed, the starting level and, for every tick, which keys were held and pressed.
+Replays are deterministic, so per-tick timings of the same trace can be compared between builds.
+Code applied through the terminal is not recorded, sessions which hack entities do not replay faithfully.
+"""
+import argparse
+import hashlib
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+import pygame
+
+from entities.types import TickData
+from grid.grid import Grid
+from headless import find_level
+from levels.base import Level
+
+grid = Grid()
+
+MAGIC = b"TGKT"
+VERSION = 1
+# magic, version, flags, seed, level name length
+HEADER = struct.Struct("<4sBBQH")
+# tick count, compressed tick data length
+BODY = struct.Struct("<II")
+FLAG_BATCH_MOVEMENT = 1
+
+# Bit i of a key mask stands for TRACE_KEYS[i]
+TRACE_KEYS = (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d, pygame.K_e, pygame.K_t)
+# Set in the pressed mask of ticks run while the terminal was open, which get no input at all
+TERMINAL_BIT = 0x80
+
+
+def state_digest() -> bytes:
+    """
+    :return: A hash of the positions of all entities and projectiles, used to check that a replay matched its recording
+    """
+    digest = hashlib.sha1()
+    for entity in grid.entities:
+        digest.update(f"{type(entity).__name__} {entity.position.x!r} {entity.position.y!r};".encode())
+    for name, pool in sorted(grid.projectile_pools.items()):
+        if len(pool):
+            digest.update(name.encode())
+            digest.update(pool.positions[pool.alive].tobytes())
+    return digest.digest()
+
+
+class TraceRecorder:
+    """
+    Collects the input of every tick, the trace is written to disk by close()
+    """
+
+    def __init__(self, path: str, level_name: str, seed: int, batch_movement: bool):
+        self.path = path
+        self.level_name = level_name
+        self.seed = seed
+        self.batch_movement = batch_movement
+        self._ticks = bytearray()
+
+    def record(self, pp_input, terminal_enabled: bool):
+        """
+        Stores the input of one tick. Call once per tick, before the tick is processed.
+        :param pp_input: Input passed to the tick
+        :param terminal_enabled: Whether the tick is run with the terminal open
+        """
+        if terminal_enabled:
+            self._ticks += bytes((0, TERMINAL_BIT))
+            return
+        down = pressed = 0
+        for bit, key in enumerate(TRACE_KEYS):
+            if pp_input.isKeyDown(key):
+                down |= 1 << bit
+            if pp_input.isKeyPressed(key):
+                pressed |= 1 << bit
+        self._ticks += bytes((down, pressed))
+
+    def close(self):
+        name = self.level_name.encode()
+        flags = FLAG_BATCH_MOVEMENT if self.batch_movement else 0
+        payload = zlib.compress(bytes(self._ticks), 9)
+        with open(self.path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, flags, self.seed, len(name)))
+            file.write(name)
+            file.write(BODY.pack(len(self._ticks) // 2, len(payload)))
+            file.write(payload)
+            file.write(state_digest())
+
+
+class Trace:
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            data = file.read()
+
+        magic, version, flags, self.seed, name_length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a version {VERSION} trace file")
+        offset = HEADER.size
+        self.level_name = data[offset:offset + name_length].decode()
+        offset += name_length
+        self.tick_count, payload_length = BODY.unpack_from(data, offset)
+        offset += BODY.size
+        ticks = zlib.decompress(data[offset:offset + payload_length])
+        # (down, pressed) masks of every tick
+        self.masks = np.frombuffer(ticks, dtype=np.uint8).reshape(-1, 2)
+        self.digest = data[offset + payload_length:]
+        self.batch_movement = bool(flags & FLAG_BATCH_MOVEMENT)
+
+
+class ReplayInput:
+    """
+    Stands in for pp.Input, reporting the keys stored in a trace for the current tick
+    """
+
+    def __init__(self):
+        self.down = 0
+        self.pressed = 0
+
+    def isKeyDown(self, key: int) -> bool:
+        return key in TRACE_KEYS and bool(self.down & (1 << TRACE_KEYS.index(key)))
+
+    def isKeyPressed(self, key: int) -> bool:
+        return key in TRACE_KEYS and bool(self.pressed & (1 << TRACE_KEYS.index(key)))
+
+
+def replay(trace: Trace) -> np.ndarray:
+    """
+    Plays a trace back the way main would have, with no rendering and no frame rate limit
+    :return: Duration of every tick in seconds
+    """
+    Level.rng.seed(trace.seed)
+    grid.batch_movement = trace.batch_movement
+    find_level(trace.level_name).load()
+
+    pp_input = ReplayInput()
+    tick_data = TickData(0, pp_input)
+    no_input = TickData()
+    timings = np.empty(trace.tick_count, dtype=np.float64)
+    clock = time.perf_counter
+
+    for i, (down, pressed) in enumerate(trace.masks.tolist()):
+        start = clock()
+        tick_data.tick += 1
+        if pressed & TERMINAL_BIT:
+            grid.process_dynamic_entities(no_input)
+        else:
+            pp_input.down, pp_input.pressed = down, pressed
+            grid.process_player_input(tick_data)
+            grid.process_dynamic_entities(tick_data)
+        timings[i] = clock() - start
+    return timings
+
+
+def summarize(timings: np.ndarray) -> str:
+    us = timings * 1e6
+    return (f"{len(us)} ticks, total {us.sum() / 1e6:.3f}s, mean {us.mean():.1f}us, "
+            f"p50 {np.percentile(us, 50):.1f}us, p99 {np.percentile(us, 99):.1f}us, max {us.max():.1f}us")
+
+
+def compare(old: np.ndarray, new: np.ndarray, worst: int = 10) -> str:
+    """
+    :return: A report of both timing series and the ticks which slowed down the most
+    """
+    if len(old) != len(new):
+        raise ValueError(f"Timings of different traces: {len(old)} and {len(new)} ticks")
+    lines = [f"old: {summarize(old)}", f"new: {summarize(new)}",
+             f"total time ratio new/old: {new.sum() / old.sum():.3f}", f"ticks slowed down the most:"]
+    slowdown = new - old
+    for tick in np.argsort(slowdown)[::-1][:worst].tolist():
+        lines.append(f"  tick {tick + 1}: {old[tick] * 1e6:.1f}us -> {new[tick] * 1e6:.1f}us")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded play sessions and compare their timings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="Replay a trace headlessly")
+    replay_parser.add_argument("trace")
+    replay_parser.add_argument("--timings", help="Save per-tick durations to this .npy file")
+    compare_parser = commands.add_parser("compare", help="Compare two per-tick timing files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        print(compare(np.load(args.old), np.load(args.new)))
+        return
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    trace = Trace(args.trace)
+    timings = replay(trace)
+    print(f"{trace.level_name}: {summarize(timings)}, {len(timings) / timings.sum():.0f} ticks/s")
+    print("final state matches the recording" if state_digest() == trace.digest
+          else "final state DIFFERS from the recording")
+    if args.timings:
+        np.save(args.timings, timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Saves the state of the world to disk and loads it back.
+
+A save file is a journal of frames. A full frame holds the whole world, a delta frame only what has changed
+since the previous save, so saving during play appends a few bytes instead of rewriting the file.
+Loading decodes the last full frame and the deltas after it. Large files are memory-mapped,
+so frames before the last full one are never read.
+
+Entities are stored under their load-order index, the order in which the level has created them.
+Loading a save loads its level with the stored random seed first, then brings every entity up to date.
+
+Besides the position, size, image and properties of an entity only what its save_attributes returns is stored,
+and it is restored through restore_attributes, e.g. a door is opened rather than flagged as open.
+Pending timers are not stored, the ones a level's entities set up in their constructors, such as
+the firing schedule of a LaserEmitter, start over from the load, others, such as the release of
+a clicked HackableDoorButton, are lost. Entities created during play must be constructible from a position alone.
+"""
+import json
+import mmap
+import os
+import struct
+
+from entities.base import Entity
+from grid.grid import Grid
+from grid.position import Position
+from hacking.hackable_method import HackableMethod
+from levels.base import Level
+from utils import surface_cache, surface_from_key
+
+grid = Grid()
+
+MAGIC = b"TGKS"
+VERSION = 1
+# magic, version
+FILE_HEADER = struct.Struct("<4sB")
+# frame kind, payload length
+FRAME_HEADER = struct.Struct("<BI")
+FULL_FRAME = 1
+DELTA_FRAME = 2
+# tick, random seed of the level, number of strings in the string table. The level name is string 0.
+PAYLOAD_HEADER = struct.Struct("<IIH")
+# load-order index, class name string, x, y, width, height, length of the JSON encoded rest
+ENTITY = struct.Struct("<IHddHHI")
+STRING = struct.Struct("<H")
+COUNT = struct.Struct("<I")
+# class name string, code length
+CODE = struct.Struct("<HI")
+
+# class name, x, y, width, height, JSON encoded attributes, properties and image
+EntityRecord = tuple[str, float, float, int, int, bytes]
+
+
+class SaveJournal:
+    """
+    Writes the world to a save file, appending deltas to what this journal has saved or loaded before
+    """
+    # A full frame is written instead of another delta once this many have been appended, bounding load times
+    MAX_DELTAS = 50
+    # Files at least this large are memory-mapped instead of read
+    MMAP_THRESHOLD = 1024 * 1024
+
+    def __init__(self, path: str):
+        self.path = path
+        self._started = False
+        self._level: str = None
+        self._seed: int = None
+        self._records: dict[int, EntityRecord] = {}
+        self._code: dict[str, list[str]] = {}
+        self._deltas = 0
+
+    def save(self, tick: int) -> int:
+        """
+        Saves the current world
+        :param tick: The current tick, returned by load
+        :return: Number of bytes written
+        """
+        level = Level._active_level.__name__
+        records = {grid.get_entity_order(entity): _encode_entity(entity) for entity in grid.entities}
+        code = {class_name: list(sources) for class_name, sources in HackableMethod.applied_code.items() if sources}
+
+        full = (not self._started or level != self._level or Level.seed != self._seed
+                or self._deltas >= self.MAX_DELTAS
+                or any(code.get(class_name, [])[:len(sources)] != sources
+                       for class_name, sources in self._code.items()))
+        if full:
+            changed, removed, new_code = records, [], code
+        else:
+            changed = {index: record for index, record in records.items() if self._records.get(index) != record}
+            removed = [index for index in self._records if index not in records]
+            new_code = {class_name: sources[len(self._code.get(class_name, [])):]
+                        for class_name, sources in code.items()
+                        if len(sources) > len(self._code.get(class_name, []))}
+
+        payload = _encode_frame(level, Level.seed, tick, changed, removed, new_code)
+        with open(self.path, "ab" if self._started else "wb") as file:
+            if not self._started:
+                file.write(FILE_HEADER.pack(MAGIC, VERSION))
+            file.write(FRAME_HEADER.pack(FULL_FRAME if full else DELTA_FRAME, len(payload)))
+            file.write(payload)
+
+        written = FRAME_HEADER.size + len(payload) + (0 if self._started else FILE_HEADER.size)
+        self._started = True
+        self._level, self._seed, self._records, self._code = level, Level.seed, records, code
+        self._deltas = 0 if full else self._deltas + 1
+        return written
+
+    def load(self) -> int:
+        """
+        Replaces the world with the one stored in the save file. Later saves are appended to the file.
+        :return: The tick the world was saved at
+        """
+        with open(self.path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size >= self.MMAP_THRESHOLD:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    state = _read_journal(data, self.path)
+            else:
+                state = _read_journal(file.read(), self.path)
+
+        level, seed, tick, records, code = state
+        _apply(level, seed, records, code)
+
+        self._started = True
+        self._level, self._seed, self._records, self._code = level, seed, records, code
+        # Whatever has been lost in the round trip makes it into the next delta
+        self._deltas = 0
+        return tick
+
+
+def _encode_entity(entity: Entity) -> EntityRecord:
+    extra = {"attributes": entity.save_attributes(), "properties": _jsonable(entity.properties)}
+    image_key = surface_cache.key_of(entity.sprite.image)
+    if image_key is not None:
+        extra["image"] = image_key
+    return (type(entity).__name__, float(entity.position.x), float(entity.position.y),
+            entity.width, entity.height, json.dumps(extra, sort_keys=True, separators=(",", ":")).encode())
+
+
+def _jsonable(values: dict) -> dict:
+    """
+    Drops the values which can't be stored as JSON
+    """
+    kept = {}
+    for key, value in values.items():
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        kept[str(key)] = value
+    return kept
+
+
+def _encode_frame(level: str, seed: int, tick: int, records: dict[int, EntityRecord], removed: list[int],
+                  code: dict[str, list[str]]) -> bytes:
+    strings = {level: 0}
+    for class_name, *_ in records.values():
+        strings.setdefault(class_name, len(strings))
+    for class_name in code:
+        strings.setdefault(class_name, len(strings))
+
+    parts = [PAYLOAD_HEADER.pack(tick, seed, len(strings))]
+    for string in strings:
+        encoded = string.encode()
+        parts += [STRING.pack(len(encoded)), encoded]
+
+    parts.append(COUNT.pack(len(records)))
+    for index, (class_name, x, y, width, height, extra) in records.items():
+        parts += [ENTITY.pack(index, strings[class_name], x, y, width, height, len(extra)), extra]
+
+    parts.append(COUNT.pack(len(removed)))
+    parts += [COUNT.pack(index) for index in removed]
+
+    parts.append(COUNT.pack(sum(len(sources) for sources in code.values())))
+    for class_name, sources in code.items():
+        for source in sources:
+            encoded = source.encode()
+            parts += [CODE.pack(strings[class_name], len(encoded)), encoded]
+    return b"".join(parts)
+
+
+def _read_journal(data, path: str):
+    """
+    :param data: Contents of a save file, bytes or a memory map
+    :return: Level name, seed, tick, entity records by load-order index and applied code by class name
+    """
+    if len(data) < FILE_HEADER.size or FILE_HEADER.unpack_from(data) != (MAGIC, VERSION):
+        raise ValueError(f"'{path}' is not a version {VERSION} save file")
+
+    # Only the frame headers are read to find the last full frame
+    frames = []
+    offset = FILE_HEADER.size
+    while offset + FRAME_HEADER.size <= len(data):
+        kind, length = FRAME_HEADER.unpack_from(data, offset)
+        offset += FRAME_HEADER.size
+        if offset + length > len(data):
+            # The last save has been cut short, e.g. by a crash while writing it
+            break
+        if kind == FULL_FRAME:
+            frames = []
+        frames.append(offset)
+        offset += length
+    if not frames:
+        raise ValueError(f"'{path}' contains no complete save")
+
+    records: dict[int, EntityRecord] = {}
+    code: dict[str, list[str]] = {}
+    level = seed = tick = None
+    for offset in frames:
+        level, seed, tick = _read_frame(data, offset, records, code)
+    return level, seed, tick, records, code
+
+
+def _read_frame(data, offset: int, records: dict[int, EntityRecord], code: dict[str, list[str]]):
+    """
+    Applies one frame onto the records and code decoded so far
+    :return: Level name, seed and tick of the frame
+    """
+    tick, seed, string_count = PAYLOAD_HEADER.unpack_from(data, offset)
+    offset += PAYLOAD_HEADER.size
+    strings = []
+    for _ in range(string_count):
+        (length,) = STRING.unpack_from(data, offset)
+        offset += STRING.size
+        strings.append(bytes(data[offset:offset + length]).decode())
+        offset += length
+
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        index, name, x, y, width, height, length = ENTITY.unpack_from(data, offset)
+        offset += ENTITY.size
+        records[index] = (strings[name], x, y, width, height, bytes(data[offset:offset + length]))
+        offset += length
+
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        (index,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        records.pop(index, None)
+
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        name, length = CODE.unpack_from(data, offset)
+        offset += CODE.size
+        code.setdefault(strings[name], []).append(bytes(data[offset:offset + length]).decode())
+        offset += length
+    return strings[0], seed, tick
+
+
+def _apply(level_name: str, seed: int, records: dict[int, EntityRecord], code: dict[str, list[str]]):
+    Level.by_name(level_name).load(seed=seed)
+
+    loaded = {grid.get_entity_order(entity): entity for entity in grid.entities}
+    for index, entity in loaded.items():
+        if index not in records:
+            entity.destroy()
+
+    for index, (class_name, x, y, width, height, extra) in sorted(records.items()):
+        entity = loaded.get(index)
+        if entity is None:
+            # Created during play, only entities constructible from a position can be brought back
+            try:
+                entity = grid.place_entity_by_name(class_name, position=Position(x, y))
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"Can't restore entity {index}, {class_name} can't be created "
+                                 f"from a position: {e!r}") from e
+        elif type(entity).__name__ != class_name:
+            raise ValueError(f"The save does not match {level_name}: "
+                             f"entity {index} is {type(entity).__name__} instead of {class_name}")
+        _apply_entity(entity, x, y, width, height, json.loads(extra))
+
+    for class_name, sources in code.items():
+        owner = next((entity for entity in grid.entities if type(entity).__name__ == class_name), None)
+        if owner is None:
+            print(f"Can't apply hacked code of {class_name}, there is no such entity")
+            continue
+        for source in sources:
+            HackableMethod.apply_code(source, owner)
+
+    # Dying from now on goes back to the loaded state, not to the start of the level
+    grid.capture_snapshot()
+
+
+def _apply_entity(entity: Entity, x: float, y: float, width: int, height: int, extra: dict):
+    dx, dy = x - entity.position.x, y - entity.position.y
+    if dx or dy:
+        # Level code may share one Position between several entities, so it is replaced rather than updated
+        entity.position = Position(x, y)
+        for hitbox in entity.get_hitboxes():
+            hitbox.move_ip(dx, dy)
+        entity.sprite.update_position(entity.position)
+
+    entity.restore_attributes(extra["attributes"])
+    entity.properties.update(extra["properties"])
+
+    # Restoring the attributes may have resized the entity already, e.g. by opening a door
+    image_key = extra.get("image")
+    image = surface_from_key(_as_tuple(image_key)) if image_key is not None else None
+    if (width, height) != (entity.width, entity.height) or (image is not None and image is not entity.sprite.image):
+        entity.set_size(width, height, image)
+
+
+def _as_tuple(value):
+    """
+    Turns JSON arrays back into the tuples cache keys are made of
+    """
+    if isinstance(value, list):
+        return tuple(_as_tuple(item) for item in value)
+    return value
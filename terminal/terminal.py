@@ -70,6 +70,30 @@ class Terminal(TextEditor):
         Terminal.initialized = True
 
 
+    def get_screen_rect(self) -> pygame.Rect:
+        """
+        :return: The screen area the terminal draws to, including its border and button
+        """
+        return self.rect.union(pygame.Rect(self.button.position, self.button.size))
+
+    def visible_state(self) -> tuple:
+        """
+        What the terminal shows, compared between frames to tell whether the display has to be updated where it is.
+        The caret and the selection only count while the terminal is enabled.
+        """
+        state = (self.enabled, tuple(self.editor_lines), self.num_read_only_lines, self.first_showable_line_index)
+        if not self.enabled:
+            return state
+        # render_caret draws the caret once the counter has passed half the blink period and wraps it to 0 at the end
+        half_period = self.FPS / self.caret_display_intervals_per_second
+        caret_shown = self.caret_display_counter == 0 or self.caret_display_counter > half_period
+        selection = (self.dragged_active, self.dragged_finished,
+                     self.drag_chosen_line_index_start, self.drag_chosen_letter_index_start,
+                     self.drag_chosen_line_index_end, self.drag_chosen_letter_index_end)
+        # A selection being dragged follows the mouse
+        mouse = self.input.currentMousePosition if self.dragged_active and not self.dragged_finished else None
+        return state + (self.caret_x, self.caret_y, caret_shown, selection, mouse)
+
     def on_tick(self):
         self.create_visual_effects()
 
@@ -0,0 +1,22 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import pytest
+
+pygame.init()
+pygame.display.set_mode((1, 1))
+
+from grid.grid import Grid
+
+
+@pytest.fixture
+def grid() -> Grid:
+    """
+    The grid singleton, emptied before and after the test
+    """
+    grid = Grid()
+    grid.clear()
+    yield grid
+    grid.clear()
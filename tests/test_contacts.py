@@ -0,0 +1,87 @@
+from entities.types import HitboxType
+from grid.contacts import ContactTracker
+
+
+class FakeGrid:
+    generation = 0
+
+    def __init__(self):
+        self.removed = set()
+
+    def is_registered(self, entity) -> bool:
+        return id(entity) not in self.removed
+
+
+class Recorder:
+    def __init__(self, name: str, events: list):
+        self.name = name
+        self.events = events
+
+    def on_collision_enter(self, other):
+        self.events.append((self.name, "enter", other.name))
+
+    def on_collision_stay(self, other):
+        self.events.append((self.name, "stay", other.name))
+
+    def on_collision_exit(self, other):
+        self.events.append((self.name, "exit", other.name))
+
+
+class Hitbox(Recorder):
+    def __init__(self, owner: Recorder, events: list):
+        super().__init__(f"{owner.name} hitbox", events)
+        self.owner = owner
+        self.type = HitboxType.MAIN
+
+
+def make_world():
+    events = []
+    mover = Recorder("mover", events)
+    wall = Recorder("wall", events)
+    return events, mover, wall, Hitbox(wall, events), FakeGrid()
+
+
+def test_enter_stay_exit():
+    events, mover, wall, hitbox, grid = make_world()
+    contacts = ContactTracker()
+
+    contacts.report(mover, [hitbox])
+    contacts.dispatch(grid)
+    assert events == [("wall hitbox", "enter", "mover"), ("mover", "enter", "wall")]
+
+    events.clear()
+    contacts.report(mover, [hitbox])
+    contacts.dispatch(grid)
+    assert events == [("wall hitbox", "stay", "mover"), ("mover", "stay", "wall")]
+
+    events.clear()
+    contacts.report(mover, [])
+    contacts.dispatch(grid)
+    assert events == [("wall hitbox", "exit", "mover"), ("mover", "exit", "wall")]
+    assert len(contacts) == 0
+
+
+def test_contacts_of_movers_which_did_not_move_go_on_silently():
+    events, mover, wall, hitbox, grid = make_world()
+    contacts = ContactTracker()
+    contacts.report(mover, [hitbox])
+    contacts.dispatch(grid)
+
+    events.clear()
+    contacts.dispatch(grid)
+    assert events == []
+    assert len(contacts) == 1
+
+
+def test_contacts_of_removed_entities_end_without_events():
+    events, mover, wall, hitbox, grid = make_world()
+    contacts = ContactTracker()
+    contacts.report(mover, [hitbox])
+    contacts.dispatch(grid)
+
+    events.clear()
+    grid.removed.add(id(wall))
+    contacts.report(mover, [])
+    contacts.dispatch(grid)
+    assert events == []
+    assert len(contacts) == 0
@@ -0,0 +1,54 @@
+import pytest
+
+from entities.doors import BasicDoor, HackableDoorButton
+from entities.types import TickData
+from grid.position import Position
+from hacking.hackable_method import HackableMethod
+
+
+@pytest.fixture
+def button(grid) -> HackableDoorButton:
+    button = HackableDoorButton(Position(100, 100))
+    button.set_target_door(BasicDoor(Position(300, 100)))
+    return button
+
+
+def run_ticks(grid, button: HackableDoorButton, first: int, last: int, press: int) -> list[tuple[int, bool]]:
+    """
+    Steps the grid the way main does, pressing E at the given tick
+    :return: (tick, is_open) of every tick the door has opened or closed in
+    """
+    door = button.door.get()
+    changes = []
+    was_open = door.is_open
+    for tick in range(first, last + 1):
+        tick_data = TickData(tick)
+        if tick == press:
+            button.interact(tick_data)
+        grid.process_dynamic_entities(tick_data)
+        if door.is_open != was_open:
+            was_open = door.is_open
+            changes.append((tick, was_open))
+    return changes
+
+
+def test_releases_fifty_ticks_after_the_click(grid, button):
+    assert run_ticks(grid, button, 1, 100, press=10) == [(10, True), (60, False)]
+
+
+def test_release_follows_the_tick_numbers_of_the_game(grid, button):
+    # After loading a save or a level the game tick and the timer clock differ
+    assert run_ticks(grid, button, 1000, 1100, press=1009) == [(1009, True), (1059, False)]
+
+
+def test_release_follows_hacked_code(grid, button):
+    methods = {class_name: dict(methods) for class_name, methods in HackableMethod.meth_info.items()}
+    HackableMethod.apply_code("def on_player_interaction(self, tick_data):\n"
+                              "    self.release_tick = tick_data.tick + 5\n"
+                              "    self.click()\n", button)
+    try:
+        assert run_ticks(grid, button, 1, 100, press=10) == [(10, True), (15, False)]
+    finally:
+        HackableMethod.meth_info.clear()
+        HackableMethod.meth_info.update(methods)
+        HackableMethod.applied_code.clear()
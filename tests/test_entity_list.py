@@ -0,0 +1,49 @@
+from grid.entity_list import EntityList
+
+
+class Item:
+    pass
+
+
+def test_iterates_in_insertion_order_skipping_removed():
+    items = [Item() for _ in range(6)]
+    entities = EntityList()
+    for item in items:
+        entities.append(item)
+    entities.remove(items[1])
+    entities.remove(items[4])
+
+    assert list(entities) == [items[0], items[2], items[3], items[5]]
+    assert len(entities) == 4
+    assert items[1] not in entities and items[2] in entities
+
+
+def test_compacts_once_half_are_holes():
+    items = [Item() for _ in range(8)]
+    entities = EntityList()
+    for item in items:
+        entities.append(item)
+    for item in items[:3]:
+        entities.remove(item)
+    entities.compact()
+    assert len(entities._items) == 8
+
+    entities.remove(items[3])
+    entities.compact()
+    assert entities._items == items[4:]
+    # The index points into the compacted storage
+    entities.remove(items[6])
+    assert list(entities) == [items[4], items[5], items[7]]
+
+
+def test_visits_entities_appended_while_iterating():
+    first, second = Item(), Item()
+    entities = EntityList()
+    entities.append(first)
+    visited = []
+    for item in entities:
+        visited.append(item)
+        if item is first:
+            entities.remove(first)
+            entities.append(second)
+    assert visited == [first, second]
@@ -0,0 +1,41 @@
+from entities.blocks import WallSegment
+from entities.doors import BasicDoor
+from entities.laser import Zombie
+from entities.player import Player
+from grid.position import Position
+
+
+def is_blocked(grid, zombie, x: float, y: float) -> bool:
+    nav_map = grid.navigation._get_map(zombie)
+    return bool(nav_map.blocked[nav_map.cell_of(x, y)])
+
+
+def test_walls_and_closed_doors_are_obstacles(grid):
+    player = Player(Position(100, 300))
+    zombie = Zombie(Position(500, 300))
+    WallSegment(Position(300, 100), Position(300, 250))
+    door = BasicDoor(Position(300, 300))
+    grid.navigation.direction(zombie, player)
+
+    assert is_blocked(grid, zombie, 300, 200)
+    assert is_blocked(grid, zombie, 305, 345)
+    assert not is_blocked(grid, zombie, 400, 400)
+
+    searches = grid.navigation.searches
+    door.open()
+    # The lower end of the door has swung away
+    assert not is_blocked(grid, zombie, 305, 345)
+    assert is_blocked(grid, zombie, 345, 305)
+    grid.navigation.direction(zombie, player)
+    assert grid.navigation.searches == searches + 1
+
+    door.close()
+    assert is_blocked(grid, zombie, 305, 345)
+
+
+def test_chasers_are_not_obstacles(grid):
+    player = Player(Position(100, 300))
+    zombie = Zombie(Position(500, 300))
+    Zombie(Position(300, 300))
+    grid.navigation.direction(zombie, player)
+    assert not is_blocked(grid, zombie, 305, 305)
@@ -0,0 +1,71 @@
+import math
+import random
+
+import pytest
+
+from entities.blocks import WallSegment
+from entities.laser import Zombie
+from entities.types import EntityType
+from grid import queries
+from grid.position import Position, Vector
+
+WORLD_WIDTH = 1200
+WORLD_HEIGHT = 720
+
+
+@pytest.fixture
+def world(grid):
+    rng = random.Random(7)
+    for x in range(100, WORLD_WIDTH, 200):
+        WallSegment(Position(x, 100), Position(x, WORLD_HEIGHT - 100))
+    for _ in range(150):
+        Zombie(Position(rng.randrange(WORLD_WIDTH), rng.randrange(WORLD_HEIGHT)))
+    return grid
+
+
+def brute_force_raycast(grid, origin: Position, direction: Vector, max_distance: float) -> float | None:
+    length = math.hypot(direction.x, direction.y)
+    dx, dy = direction.x / length, direction.y / length
+    width, height = grid.world_size
+    max_distance = min(max_distance, queries._ray_span(origin.x, origin.y, dx, dy, 0, 0, width, height)[1])
+    distances = [distance for entity in grid.entities
+                 if (distance := queries._ray_enters_rect(origin.x, origin.y, dx, dy, entity.main_hitbox)) is not None
+                 and distance <= max_distance]
+    return min(distances, default=None)
+
+
+def test_raycast_matches_brute_force(world):
+    rng = random.Random(8)
+    for _ in range(300):
+        angle = rng.uniform(0, 2 * math.pi)
+        origin = Position(rng.uniform(0, WORLD_WIDTH), rng.uniform(0, WORLD_HEIGHT))
+        direction = Vector(math.cos(angle), math.sin(angle))
+        max_distance = rng.choice([20, 150, 800])
+
+        hit = world.raycast(origin, direction, max_distance)
+        expected = brute_force_raycast(world, origin, direction, max_distance)
+        if expected is None:
+            assert hit is None
+        else:
+            assert hit is not None and hit.distance == pytest.approx(expected)
+            assert queries._ray_enters_rect(origin.x, origin.y, *_unit(direction),
+                                            hit.entity.main_hitbox) == pytest.approx(expected)
+
+
+def test_nearest_matches_brute_force(world):
+    rng = random.Random(9)
+    points = [Position(rng.uniform(0, WORLD_WIDTH), rng.uniform(0, WORLD_HEIGHT)) for _ in range(100)]
+    # Far outside the world the search falls back to a scan
+    points.append(Position(-5000, -5000))
+    for point in points:
+        for type_filter, k in ((None, 1), (EntityType.KILLABLE, 3), (WallSegment, 2)):
+            found = world.nearest(point, k=k, type_filter=type_filter)
+            expected = sorted(queries._distance_to_rect(point.x, point.y, entity.main_hitbox)
+                              for entity in world.entities if queries.matches(entity, type_filter))[:k]
+            assert [queries._distance_to_rect(point.x, point.y, entity.main_hitbox)
+                    for entity in found] == pytest.approx(expected)
+
+
+def _unit(direction: Vector) -> tuple[float, float]:
+    length = math.hypot(direction.x, direction.y)
+    return direction.x / length, direction.y / length
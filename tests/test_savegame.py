@@ -0,0 +1,94 @@
+import pytest
+
+# Imported for the levels it defines, which register themselves by name
+import levels.level
+from entities.doors import BasicDoor
+from entities.types import EntityType
+from grid.position import Position, Vector
+from levels.base import Level
+from savegame import SaveJournal, FILE_HEADER, FRAME_HEADER, FULL_FRAME, DELTA_FRAME
+
+
+def world_state(grid) -> list:
+    return sorted((grid.get_entity_order(entity), type(entity).__name__, entity.position.x, entity.position.y,
+                   entity.width, entity.height, tuple(entity.main_hitbox), entity.save_attributes(),
+                   dict(entity.properties)) for entity in grid.entities)
+
+
+def frame_kinds(path) -> list[int]:
+    data = path.read_bytes()
+    kinds = []
+    offset = FILE_HEADER.size
+    while offset < len(data):
+        kind, length = FRAME_HEADER.unpack_from(data, offset)
+        kinds.append(kind)
+        offset += FRAME_HEADER.size + length
+    return kinds
+
+
+def play(grid):
+    """
+    Changes the world the way playing would
+    """
+    door = next(entity for entity in grid.entities if isinstance(entity, BasicDoor))
+    door.open()
+    player = next(iter(grid.entities_of_type(EntityType.PLAYER)))
+    player.move(Vector(0, -4))
+    player.set_property("coins", 3)
+
+
+@pytest.fixture
+def journal(grid, tmp_path) -> SaveJournal:
+    Level.by_name("LevelTestDoor").load()
+    return SaveJournal(str(tmp_path / "game.sav"))
+
+
+def test_full_and_delta_frames_round_trip(grid, journal, tmp_path):
+    full = journal.save(1)
+    play(grid)
+    delta = journal.save(2)
+    expected = world_state(grid)
+
+    assert frame_kinds(tmp_path / "game.sav") == [FULL_FRAME, DELTA_FRAME]
+    assert delta < full
+
+    Level.by_name("LevelTestDoor").load()
+    assert SaveJournal(journal.path).load() == 2
+    assert world_state(grid) == expected
+
+
+def test_restores_through_the_entities(grid, journal):
+    play(grid)
+    journal.save(1)
+    SaveJournal(journal.path).load()
+
+    door = next(entity for entity in grid.entities if isinstance(entity, BasicDoor))
+    assert door.is_open
+    # The door has been resized by opening it, so its hitbox is indexed where it is now
+    assert door in grid.query_rect(door.main_hitbox)
+
+
+def test_truncated_frames_are_ignored(grid, journal, tmp_path):
+    journal.save(1)
+    expected = world_state(grid)
+    play(grid)
+    journal.save(2)
+
+    path = tmp_path / "game.sav"
+    path.write_bytes(path.read_bytes()[:-3])
+    assert SaveJournal(journal.path).load() == 1
+    assert world_state(grid) == expected
+
+
+def test_unrestorable_entities_fail_the_load(grid, journal):
+    grid.place_entity_by_name("HackableTeleporter", position=Position(5, 5), targets=[], teleporters=[])
+    journal.save(1)
+    with pytest.raises(ValueError, match="HackableTeleporter"):
+        SaveJournal(journal.path).load()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.sav"
+    path.write_bytes(b"not a save")
+    with pytest.raises(ValueError):
+        SaveJournal(str(path)).load()
@@ -0,0 +1,106 @@
+import random
+
+import numpy as np
+import pygame
+
+from grid.spatial_hash import SpatialHash, StaticIndex, overlap_matrix, overlap_pairs
+
+
+class Box(pygame.Rect):
+    """
+    Stands in for a hitbox, owning itself
+    """
+
+    def __init__(self, x, y, width, height):
+        super().__init__(x, y, width, height)
+        self.owner = self
+        self.collision_layer = 1
+        self.collision_mask = 1
+
+
+def random_rect(rng: random.Random) -> tuple[int, int, int, int]:
+    # Negative coordinates, empty rectangles and ones spanning many cells included
+    return rng.randrange(-100, 500), rng.randrange(-100, 500), rng.choice([0, 1, 5, 20, 70, 200]), rng.randrange(0, 90)
+
+
+def brute_force(entries, rect) -> list:
+    return sorted((entry for entry in entries if rect.colliderect(entry[1])), key=lambda entry: entry[0])
+
+
+def test_spatial_hash_query_matches_brute_force():
+    rng = random.Random(1)
+    index = SpatialHash()
+    entries = {}
+    for i in range(300):
+        box = Box(*random_rect(rng))
+        entries[id(box)] = ((i, 0), box)
+        index.insert(box, (i, 0))
+    for _ in range(200):
+        _, box = rng.choice(list(entries.values()))
+        box.update(*random_rect(rng))
+        index.update(box)
+    for _ in range(100):
+        _, box = entries.pop(rng.choice(list(entries)))
+        index.remove(box)
+
+    for _ in range(300):
+        rect = pygame.Rect(random_rect(rng))
+        assert index.query(rect) == brute_force(entries.values(), rect)
+
+    # The slot arrays follow the hitboxes
+    for _, box in entries.values():
+        slot = index.slots([box])[0]
+        assert index.slot_entries[slot][1] is box
+        assert tuple(index.rects[slot]) == tuple(box)
+    assert index.slots([Box(0, 0, 1, 1)]).tolist() == [-1]
+
+
+def test_spatial_hash_near_finds_every_overlap():
+    rng = random.Random(2)
+    index = SpatialHash()
+    entries = []
+    for i in range(300):
+        box = Box(*random_rect(rng))
+        entries.append(((i, 0), box))
+        index.insert(box, (i, 0))
+
+    rects = [random_rect(rng) for _ in range(50)]
+    near = {id(hitbox) for _, hitbox in index.near(np.array(rects, dtype=np.int64))}
+    for rect in map(pygame.Rect, rects):
+        assert {id(hitbox) for _, hitbox in brute_force(entries, rect)} <= near
+    assert index.near(np.zeros((0, 4), dtype=np.int64)) == []
+
+
+def test_static_index_matches_brute_force():
+    rng = random.Random(3)
+    index = StaticIndex()
+    entries = {}
+    for i in range(300):
+        box = Box(*random_rect(rng))
+        entries[id(box)] = ((i, 0), box)
+        index.insert(box, (i, 0))
+    for _ in range(50):
+        index.remove(entries.pop(rng.choice(list(entries)))[1])
+
+    rects = [random_rect(rng) for _ in range(300)]
+    for rect in map(pygame.Rect, rects):
+        assert index.query(rect) == brute_force(entries.values(), rect)
+
+    i, j = index.overlap_pairs(np.array(rects, dtype=np.int64))
+    expected = np.nonzero(overlap_matrix(np.array(rects, dtype=np.int64), index.rects))
+    assert i.tolist() == expected[0].tolist() and j.tolist() == expected[1].tolist()
+    assert [hitbox for _, hitbox in index.entries] == [box for _, box in sorted(entries.values(),
+                                                                               key=lambda entry: entry[0])]
+
+
+def test_overlap_pairs_matches_the_overlap_matrix():
+    rng = random.Random(4)
+    rects = np.array([random_rect(rng) for _ in range(200)], dtype=np.int64)
+    others = np.array([random_rect(rng) for _ in range(150)], dtype=np.int64)
+    for cell_size in (16, 64, 256):
+        i, j = overlap_pairs(rects, others, cell_size)
+        expected = np.nonzero(overlap_matrix(rects, others))
+        assert i.tolist() == expected[0].tolist() and j.tolist() == expected[1].tolist()
+
+    i, j = overlap_pairs(rects[:0], others, 64)
+    assert len(i) == len(j) == 0
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from grid.timers import Timer, TimerWheel, SLOTS
+
+
+def advance(wheel: TimerWheel, ticks: int):
+    for _ in range(ticks):
+        wheel.advance()
+
+
+# Delays around the slot boundaries of the first three wheels
+DELAYS = [1, 2, SLOTS - 1, SLOTS, SLOTS + 1, SLOTS ** 2 - 1, SLOTS ** 2, SLOTS ** 2 + 1,
+          SLOTS ** 3 - 1, SLOTS ** 3, SLOTS ** 3 + 1]
+
+
+@pytest.mark.parametrize("start", [0, 37])
+@pytest.mark.parametrize("delay", DELAYS)
+def test_fires_on_its_tick_after_cascading(start, delay):
+    wheel = TimerWheel()
+    advance(wheel, start)
+    fired = []
+    wheel.add(Timer(lambda: fired.append(wheel.now), start + delay))
+
+    advance(wheel, delay - 1)
+    assert fired == []
+    advance(wheel, 2)
+    assert fired == [start + delay]
+    assert len(wheel) == 0
+
+
+def test_fires_many_timers_in_tick_order():
+    rng = random.Random(3)
+    wheel = TimerWheel()
+    ticks = [rng.randrange(1, 3 * SLOTS ** 2) for _ in range(500)]
+    fired = []
+    for tick in ticks:
+        wheel.add(Timer(lambda tick=tick: fired.append((wheel.now, tick)), tick))
+
+    advance(wheel, max(ticks))
+    assert [now for now, _ in fired] == sorted(ticks)
+    assert all(now == tick for now, tick in fired)
+
+
+def test_periodic_timers_keep_their_phase():
+    wheel = TimerWheel()
+    advance(wheel, 20)
+    fired = []
+    wheel.add(Timer(lambda: fired.append(wheel.now), 5, period=7))
+
+    advance(wheel, 30)
+    assert fired == [26, 33, 40, 47]
+    assert len(wheel) == 1
+
+
+def test_past_ticks_fire_on_the_next_tick():
+    wheel = TimerWheel()
+    advance(wheel, 10)
+    fired = []
+    wheel.add(Timer(lambda: fired.append(wheel.now), 3))
+    advance(wheel, 1)
+    assert fired == [11]
+
+
+def test_cancelled_timers_never_fire():
+    wheel = TimerWheel()
+    fired = []
+    timer = Timer(lambda: fired.append(wheel.now), SLOTS + 3)
+    wheel.add(timer)
+    wheel.cancel(timer)
+    advance(wheel, 2 * SLOTS)
+    assert fired == []
+
+    # A timer added again fires once, its old entry is skipped
+    timer = Timer(lambda: fired.append(wheel.now), wheel.now + 5)
+    wheel.add(timer)
+    wheel.add(timer)
+    advance(wheel, 10)
+    assert fired == [2 * SLOTS + 5]
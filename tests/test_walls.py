@@ -0,0 +1,28 @@
+import pytest
+
+from levels.walls import merge_wall_segments
+
+
+def test_joins_overlapping_and_touching_segments():
+    segments = [((0, 0), (10, 0)), ((10, 0), (20, 0)), ((15, 0), (30, 0)), ((40, 0), (50, 0))]
+    assert merge_wall_segments(segments) == [((0, 0), (30, 0)), ((40, 0), (50, 0))]
+
+
+def test_keeps_lines_apart():
+    segments = [((0, 0), (10, 0)), ((0, 5), (10, 5)), ((0, 0), (0, 10)), ((0, 10), (0, 20))]
+    assert merge_wall_segments(segments) == [((0, 0), (10, 0)), ((0, 5), (10, 5)), ((0, 0), (0, 20))]
+
+
+def test_orders_reversed_segments():
+    assert merge_wall_segments([((0, 20), (0, 10)), ((0, 10), (0, 0))]) == [((0, 0), (0, 20))]
+
+
+def test_joins_segments_within_the_gap():
+    segments = [((0, 0), (10, 0)), ((15, 0), (20, 0))]
+    assert merge_wall_segments(segments, gap=4) == segments
+    assert merge_wall_segments(segments, gap=5) == [((0, 0), (20, 0))]
+
+
+def test_rejects_diagonal_segments():
+    with pytest.raises(NotImplementedError):
+        merge_wall_segments([((0, 0), (10, 10))])
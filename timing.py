@@ -0,0 +1,86 @@
+import time
+
+import pygamepal as pp
+
+
+class FixedTimestep:
+    """
+    Splits elapsed real time into logic ticks of a fixed length, independent of the frame rate.
+    Frames may run any number of ticks, including none; the part of a tick left over is exposed as alpha,
+    so the frame can be drawn in between the last two ticks.
+    """
+
+    def __init__(self, tick_rate: int = 30, max_ticks_per_frame: int = 5):
+        """
+        :param tick_rate: Logic ticks per second
+        :param max_ticks_per_frame: Upper bound on the ticks run to catch up after a slow frame.
+        Any time beyond it is dropped, so the game slows down instead of stalling.
+        """
+        self.tick_duration = 1 / tick_rate
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.dropped_ticks = 0
+        self._accumulator = 0.0
+        self._last_time = time.perf_counter()
+
+    def reset(self):
+        """
+        Forgets time elapsed so far, e.g. after a long blocking load
+        """
+        self._accumulator = 0.0
+        self._last_time = time.perf_counter()
+
+    def advance(self) -> int:
+        """
+        Accounts for the time elapsed since the previous call
+        :return: Number of logic ticks to run in this frame
+        """
+        now = time.perf_counter()
+        self._accumulator += now - self._last_time
+        self._last_time = now
+
+        ticks = int(self._accumulator // self.tick_duration)
+        self._accumulator -= ticks * self.tick_duration
+        if ticks > self.max_ticks_per_frame:
+            self.dropped_ticks += ticks - self.max_ticks_per_frame
+            ticks = self.max_ticks_per_frame
+        return ticks
+
+    @property
+    def alpha(self) -> float:
+        """
+        Fraction of a tick elapsed since the last tick, between 0 and 1
+        """
+        return min(self._accumulator / self.tick_duration, 1.0)
+
+
+class TickInput:
+    """
+    Wraps pp.Input for logic ticks running at a different rate than frames.
+    Key presses are remembered until the next tick, so they are not lost in frames which run no tick,
+    and are reported in one tick only when a frame runs several of them.
+    Everything other than isKeyPressed is forwarded to the wrapped input.
+    """
+
+    def __init__(self, pp_input: pp.Input):
+        self.pp_input = pp_input
+        self._pressed: set[int] = set()
+
+    def __getattr__(self, name):
+        return getattr(self.pp_input, name)
+
+    def latch(self):
+        """
+        Collects keys pressed in the current frame. Call once per frame, after the wrapped input is updated.
+        """
+        current, previous = self.pp_input.currentKeyStates, self.pp_input.previousKeyStates
+        self._pressed.update(key for key, (down, was_down) in enumerate(zip(current, previous))
+                             if down and not was_down)
+
+    def consume(self):
+        """
+        Forgets collected key presses. Call after every tick.
+        """
+        self._pressed.clear()
+
+    def isKeyPressed(self, key: int) -> bool:
+        return key in self._pressed
@@ -49,8 +49,12 @@ class GameHintRenderer:
         return combined_surface
 
     def show_hint(self, owner_type: EntityType):
+        """
+        Prepares the hint for interactions available with an entity of the given type.
+        Does nothing until initialized with a screen, so the game can run headless.
+        """
         if not self._screen:
-            raise RuntimeError("GameHintRenderer not initialized. Call initialize(screen) first.")
+            return
 
         if self._hint_surface is not None and self._hint_rect is not None:
             return
@@ -82,6 +86,12 @@ class GameHintRenderer:
         grid.current_interactable_entity = None
 
 
+    def get_rect(self) -> pygame.Rect | None:
+        """
+        :return: The screen area covered by the current hint
+        """
+        return self._hint_rect
+
     def render(self):
         if not self._screen:
             raise RuntimeError("GameHintRenderer not initialized. Call initialize(screen) first.")
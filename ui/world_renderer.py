@@ -0,0 +1,112 @@
+import pygame
+
+from entities.types import TypeMask
+from grid.grid import Grid
+
+grid = Grid()
+
+
+class WorldRenderer:
+    """
+    Draws the world onto the screen, redrawing only what has changed since the previous frame.
+    The background and all static entities are baked into one cached layer, which is rebuilt whenever
+    the static geometry changes. Dynamic sprites and projectiles are drawn over it using dirty rectangles.
+    """
+
+    def __init__(self, screen: pygame.Surface, background: pygame.Surface):
+        self._screen = screen
+        self._background = background
+        self._static_layer: pygame.Surface = None
+        self._static_version = None
+
+        # id(sprite) -> (rect, image) as drawn in the previous frame
+        self._sprite_states: dict[int, tuple[tuple[int, int, int, int], pygame.Surface]] = {}
+        self._projectile_rects: list[pygame.Rect] = []
+        self._overlay_rects: list[pygame.Rect] = []
+
+        # When enabled, the share of the screen redrawn every frame is shown in the window caption
+        self.debug = False
+        self.redrawn_fraction = 0.0
+
+    def invalidate(self):
+        """
+        Forces the static layer to be rebuilt and the whole screen to be redrawn in the next frame
+        """
+        self._static_layer = None
+
+    def _bake_static_layer(self):
+        layer = self._background.copy()
+        for entity in grid.entities:
+            if not entity.type_mask & TypeMask.DYNAMIC:
+                layer.blit(entity.sprite.image, entity.sprite.rect)
+        self._static_layer = layer
+        self._static_version = grid.static_version
+
+    def render(self, overlay_rects: list[pygame.Rect] = ()) -> list[pygame.Rect]:
+        """
+        Draws the world for the current frame.
+        :param overlay_rects: Screen areas which are going to be drawn over after the world, e.g. by UI elements
+        :return: Screen areas which have to be passed to pygame.display.update
+        """
+        screen = self._screen
+        full_redraw = self._static_layer is None or self._static_version != grid.static_version
+        if full_redraw:
+            self._bake_static_layer()
+
+        sprites = [entity.sprite for entity in grid.dynamic_entities]
+        sprite_states = {id(sprite): (tuple(sprite.rect), sprite.image) for sprite in sprites}
+        overlay_rects = [pygame.Rect(rect) for rect in overlay_rects if rect is not None]
+
+        dirty = self._projectile_rects + self._overlay_rects + overlay_rects
+        for key, state in sprite_states.items():
+            previous = self._sprite_states.pop(key, None)
+            if previous != state:
+                if previous is not None:
+                    dirty.append(pygame.Rect(previous[0]))
+                dirty.append(pygame.Rect(state[0]))
+        for previous in self._sprite_states.values():
+            dirty.append(pygame.Rect(previous[0]))
+
+        self._sprite_states = sprite_states
+        self._overlay_rects = overlay_rects
+
+        if full_redraw:
+            screen.blit(self._static_layer, (0, 0))
+            screen.blits([(sprite.image, sprite.rect) for sprite in sprites], doreturn=False)
+            self._projectile_rects = grid.draw_projectiles(screen)
+            dirty = [screen.get_rect()]
+        else:
+            dirty = _merge_rects(dirty)
+            layer = self._static_layer
+            for rect in dirty:
+                # Sprites are clipped, so redrawing one cannot cover an untouched sprite drawn above it
+                screen.set_clip(rect)
+                screen.blit(layer, rect, rect)
+                screen.blits([(sprite.image, sprite.rect) for sprite in sprites if sprite.rect.colliderect(rect)],
+                             doreturn=False)
+            screen.set_clip(None)
+            self._projectile_rects = grid.draw_projectiles(screen)
+            dirty = _merge_rects(dirty + self._projectile_rects)
+
+        screen_rect = screen.get_rect()
+        redrawn_area = sum(rect.clip(screen_rect).width * rect.clip(screen_rect).height for rect in dirty)
+        self.redrawn_fraction = redrawn_area / (screen_rect.width * screen_rect.height)
+        if self.debug:
+            pygame.display.set_caption(f"redrawn {100 * self.redrawn_fraction:.1f}% of the screen")
+
+        return dirty
+
+
+def _merge_rects(rects: list[pygame.Rect]) -> list[pygame.Rect]:
+    """
+    Replaces overlapping rectangles with their bounding boxes, so no area is redrawn twice
+    """
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
@@ -1,27 +1,135 @@
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+
+import numpy as np
 import pygame
 
 
+class SurfaceCache:
+    """
+    A process-wide LRU cache of loaded and generated surfaces.
+    Cached surfaces are shared between all users and must not be drawn on.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._surfaces: OrderedDict[Hashable, pygame.Surface] = OrderedDict()
+        # id(surface) -> key, for surfaces currently in the cache
+        self._keys: dict[int, Hashable] = {}
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def __contains__(self, key: Hashable):
+        return key in self._surfaces
+
+    @staticmethod
+    def _surface_bytes(surface: pygame.Surface) -> int:
+        return surface.get_bytesize() * surface.get_width() * surface.get_height()
+
+    def get(self, key: Hashable, factory: Callable[[], pygame.Surface]) -> pygame.Surface:
+        """
+        Returns the surface cached under the given key, creating it with the factory on a miss
+        """
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = factory()
+        if surface is None:
+            return None
+        self._surfaces[key] = surface
+        self._keys[id(surface)] = key
+        self.size_bytes += self._surface_bytes(surface)
+        while self.size_bytes > self.max_bytes and len(self._surfaces) > 1:
+            _, evicted = self._surfaces.popitem(last=False)
+            del self._keys[id(evicted)]
+            self.size_bytes -= self._surface_bytes(evicted)
+            self.evictions += 1
+        return surface
+
+    def preload(self, icons: Iterable[tuple]):
+        """
+        Loads icons ahead of time
+        :param icons: (width, height, path, color) tuples, as passed to load_icon
+        """
+        for icon in icons:
+            load_icon(*icon)
+
+    def key_of(self, surface: pygame.Surface) -> Hashable | None:
+        """
+        :return: The key a surface is cached under, or None if it is not cached
+        """
+        return self._keys.get(id(surface))
+
+    def clear(self):
+        self._surfaces.clear()
+        self._keys.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> str:
+        return (f"{len(self._surfaces)} surfaces, {self.size_bytes // 1024} KiB, "
+                f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions")
+
+
+surface_cache = SurfaceCache()
+
+
+def _color_key(color):
+    if color is None or isinstance(color, str):
+        return color
+    return tuple(color)
+
+
 def tint_image(image: pygame.Surface, tint_color: str | tuple[int, int, int]) -> pygame.Surface:
+    """
+    Paints every visible pixel of the image with the given color, keeping its alpha.
+    Fully transparent pixels become (0, 0, 0, 0).
+    """
     if isinstance(tint_color, str):
         rgb_color = pygame.Color(tint_color)
     else:
         rgb_color = pygame.Color(*tint_color)
 
+    if image.get_flags() & pygame.SRCALPHA:
+        alpha = pygame.surfarray.array_alpha(image)
+    else:
+        # Surface.get_at reports an opaque alpha for surfaces without per-pixel alpha
+        alpha = np.full(image.get_size(), 255, dtype=np.uint8)
+
     tinted = pygame.Surface(image.get_size(), pygame.SRCALPHA)
-    for x in range(image.get_width()):
-        for y in range(image.get_height()):
-            color = image.get_at((x, y))
-            if color.a > 0:
-                tinted.set_at((x, y), pygame.Color(rgb_color.r, rgb_color.g, rgb_color.b, color.a))
+    tinted.fill((rgb_color.r, rgb_color.g, rgb_color.b, 0))
+    tinted_alpha = pygame.surfarray.pixels_alpha(tinted)
+    tinted_alpha[:] = alpha
+    del tinted_alpha
+    if not alpha.all():
+        tinted_rgb = pygame.surfarray.pixels3d(tinted)
+        tinted_rgb[alpha == 0] = 0
+        del tinted_rgb
 
     return tinted
 
 def load_icon(width, height, path, color=None):
+    return surface_cache.get(("icon", path, (width, height), _color_key(color)),
+                             lambda: _load_icon(width, height, path, color))
+
+def _load_icon(width, height, path, color):
     try:
-        image = pygame.image.load(path).convert_alpha()
+        image = pygame.image.load(path)
     except pygame.error as e:
         raise FileNotFoundError(f"Failed to load image from '{path}': {e}")
 
+    # Converting needs a display mode, which headless runs never set
+    if pygame.display.get_surface() is not None:
+        image = image.convert_alpha()
+
     image = pygame.transform.scale(image, (width, height))
 
     if color:
@@ -29,7 +137,23 @@ def load_icon(width, height, path, color=None):
 
     return image
 
+def surface_from_key(key: tuple) -> pygame.Surface:
+    """
+    Returns the surface for a key of the surface cache, recreating it if it has been evicted
+    :param key: A key as returned by SurfaceCache.key_of
+    """
+    kind, path, (width, height), *rest = key
+    if kind == "icon":
+        return load_icon(width, height, path, *rest)
+    if kind == "tiled":
+        return create_surface(width, height, path, *rest)
+    raise ValueError(f"Unknown surface cache key: {key}")
+
 def create_surface(width, height, tile_path, tile_size=10, color=None):
+    return surface_cache.get(("tiled", tile_path, (width, height), tile_size, _color_key(color)),
+                             lambda: _create_surface(width, height, tile_path, tile_size, color))
+
+def _create_surface(width, height, tile_path, tile_size, color):
     try:
         tile_icon = load_icon(tile_size, tile_size, tile_path, color)
     except FileNotFoundError: